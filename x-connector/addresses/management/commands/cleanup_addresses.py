@@ -7,12 +7,39 @@ class Command(BaseCommand):
     args = ""
     help = "Remove unused addresses without customer or order"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            action="store",
+            dest="batch_size",
+            type=int,
+            default=1000,
+            help="Amount of addresses which are removed at once",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            dest="dry_run",
+            default=False,
+            help="Only count the addresses which would be removed",
+        )
+
     def handle(self, *args, **options):
         from lfs.addresses.models import BaseAddress
+        from lfs.addresses.utils import delete_addresses
+        from lfs.core.utils import get_pk_batches
 
         cnt = 0
         ten_days_ago = datetime.date.today() - datetime.timedelta(days=10)
-        for address in BaseAddress.objects.filter(order__isnull=True, customer__isnull=True, created__lt=ten_days_ago):
-            address.delete()
-            cnt += 1
-        print("Removed %s addresses" % cnt)
+        addresses = BaseAddress.objects.filter(order__isnull=True, customer__isnull=True, created__lt=ten_days_ago)
+        for pks in get_pk_batches(addresses, options["batch_size"]):
+            if options["dry_run"]:
+                cnt += len(pks)
+            else:
+                cnt += delete_addresses(pks)
+                print("Removed %s addresses so far" % cnt)
+
+        if options["dry_run"]:
+            print("Would remove %s addresses" % cnt)
+        else:
+            print("Removed %s addresses" % cnt)
@@ -3,6 +3,7 @@ from django.template.loader import select_template
 
 # lfs imports
 import lfs.core.utils
+from lfs.addresses.models import BaseAddress
 from lfs.addresses.settings import INVOICE_ADDRESS_FORM, SHIPPING_ADDRESS_FORM, CHECKOUT_NOT_REQUIRED_ADDRESS
 from lfs.core.models import Country
 
@@ -149,3 +150,15 @@ class AddressManagement(object):
                 data=self.data, instance=self.address, initial=self.initial, prefix=self.type
             )
             address_form.save()
+
+
+def delete_addresses(pks):
+    """
+    Deletes the addresses with passed primary keys with one DELETE statement
+    per table. Returns the amount of deleted addresses.
+    """
+    # This bypasses the post_delete receiver of Address, which invalidates the
+    # visitor facts of the address's customer. Only addresses without
+    # customer are cleaned up, see the cleanup_addresses command.
+    amount = lfs.core.utils.delete_without_signals(BaseAddress.objects.filter(pk__in=pks))
+    return amount
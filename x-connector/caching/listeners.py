@@ -1,3 +1,5 @@
+import hashlib
+
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.core.cache import cache
@@ -6,14 +8,22 @@ from django.db.models.signals import pre_save
 from django.db.models.signals import pre_delete
 from django.dispatch import receiver
 
-from lfs.caching.utils import clear_cache, delete_cache, invalidate_cache_group_id
+from lfs.addresses.models import Address
+from lfs.caching.utils import clear_cache, delete_cache, get_cache_group_id, invalidate_cache_group_id
 from lfs.cart.models import Cart
+from lfs.cart.models import CartItem
+from lfs.cart.models import CartItemPropertyValue
 from lfs.catalog.models import Category
 from lfs.catalog.models import Product
+from lfs.catalog.models import ProductPropertyValue
+from lfs.catalog.models import PropertyOption
 from lfs.catalog.models import StaticBlock
 from lfs.core.models import Shop
 from lfs.core.signals import cart_changed
+from lfs.criteria.facts import invalidate_visitor_facts
 from lfs.core.signals import product_changed
+from lfs.core.signals import product_stock_changed
+from lfs.core.signals import products_changed
 from lfs.core.signals import category_changed
 from lfs.core.signals import shop_changed
 from lfs.core.signals import topseller_changed
@@ -29,9 +39,9 @@ from lfs.criteria.models import (
     CombinedLengthAndGirthCriterion,
     CartPriceCriterion,
 )
+from lfs.customer.models import Customer
 from lfs.customer_tax.models import CustomerTax
 from lfs.marketing.models import Topseller
-from lfs.order.models import OrderItem
 from lfs.page.models import Page
 from lfs.shipping.models import ShippingMethod
 from lfs.tax.models import Tax
@@ -51,11 +61,56 @@ def cart_changed_listener(sender, **kwargs):
     update_cart_cache(sender)
 
 
+@receiver(post_save, sender=Cart)
+def cart_saved_listener(sender, instance, **kwargs):
+    invalidate_visitor_facts(instance.user_id, instance.session)
+
+
 @receiver(pre_delete, sender=Cart)
 def cart_deleted_listener(sender, instance, **kwargs):
     update_cart_cache(instance)
 
 
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def cart_item_changed_listener(sender, instance, **kwargs):
+    invalidate_cache_group_id("cart-%s" % instance.cart_id)
+    invalidate_cache_group_id("stock-%s" % instance.product_id)
+    try:
+        cart = instance.cart
+    except Cart.DoesNotExist:
+        pass
+    else:
+        invalidate_visitor_facts(cart.user_id, cart.session)
+
+
+@receiver(post_save, sender=CartItemPropertyValue)
+@receiver(post_delete, sender=CartItemPropertyValue)
+def cart_item_property_value_changed_listener(sender, instance, **kwargs):
+    try:
+        cart = instance.cart_item.cart
+    except (CartItem.DoesNotExist, Cart.DoesNotExist):
+        pass
+    else:
+        invalidate_cache_group_id("cart-%s" % cart.id)
+        invalidate_visitor_facts(cart.user_id, cart.session)
+
+
+# Customer
+@receiver(post_save, sender=Customer)
+def customer_saved_listener(sender, instance, **kwargs):
+    invalidate_visitor_facts(instance.user_id, instance.session)
+
+
+@receiver(post_save, sender=Address)
+@receiver(post_delete, sender=Address)
+def address_changed_listener(sender, instance, **kwargs):
+    # Addresses of orders don't belong to a customer
+    if instance.customer_id:
+        for user_id, session in Customer.objects.filter(pk=instance.customer_id).values_list("user_id", "session"):
+            invalidate_visitor_facts(user_id, session)
+
+
 # Category
 @receiver(pre_delete, sender=Category)
 def category_deleted_listener(sender, instance, **kwargs):
@@ -80,42 +135,31 @@ def product_categories_changed_listener(sender, **kwargs):
 
     if reverse:
         product = instance
-        delete_cache("%s-product-categories-%s-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, product.id, True))
-        delete_cache("%s-product-categories-%s-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, product.id, False))
+        delete_product_categories_cache(product)
+        # pk_set is None if all categories of the product are cleared
+        if pk_set:
+            categories = Category.objects.filter(pk__in=pk_set)
+        else:
+            categories = product.categories.all()
+        for category in categories:
+            update_category_products_cache(category)
     else:
+        category = instance
+        update_category_products_cache(category)
         if pk_set:
             for product in Product.objects.filter(pk__in=pk_set):
-                delete_cache("%s-product-categories-%s-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, product.id, True))
-                delete_cache("%s-product-categories-%s-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, product.id, False))
+                delete_product_categories_cache(product)
 
 
 # Manufacturer
 @receiver(manufacturer_changed)
 def manufacturer_changed_listener(sender, **kwargs):
     # filtered lists of products assigned to manufacturer used at manufacturer page
-    delete_cache("%s-manufacturer-products-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, sender.slug))
-    # list of all manufacturer products
-    delete_cache("%s-manufacturer-all-products-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, sender.pk))
+    invalidate_cache_group_id("manufacturer-%s" % sender.pk)
     # if manufacturer assignment was changed then product navigation might be different too
     invalidate_cache_group_id("product_navigation")
 
 
-# OrderItem
-@receiver(pre_delete, sender=OrderItem)
-@receiver(post_save, sender=OrderItem)
-def order_item_listener(sender, instance, **kwargs):
-    """Deletes topseller after an OrderItem has been updated. Topseller are
-    calculated automatically on base of OrderItems, hence we have to take of
-    that.
-    """
-    delete_cache("%s-topseller" % settings.CACHE_MIDDLEWARE_KEY_PREFIX)
-    try:
-        for category in instance.product.get_categories(with_parents=True):
-            delete_cache("%s-topseller-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, category.id))
-    except:
-        pass  # fail silently
-
-
 # Page
 @receiver(post_save, sender=Page)
 def page_saved_listener(sender, instance, **kwargs):
@@ -125,14 +169,48 @@ def page_saved_listener(sender, instance, **kwargs):
 
 # Product
 @receiver(product_changed)
+@receiver(product_stock_changed)
 def product_changed_listener(sender, **kwargs):
     update_product_cache(sender)
 
 
+@receiver(products_changed)
+def products_changed_listener(sender, products, **kwargs):
+    update_products_cache(products)
+
+
+@receiver(post_save, sender=ProductPropertyValue)
+@receiver(post_delete, sender=ProductPropertyValue)
+def product_property_value_changed_listener(sender, instance, **kwargs):
+    # filter values are used by the facet index of categories
+    invalidate_cache_group_id("facet-index")
+
+    # variant values are used by the variant index of the parent product
+    try:
+        parent_id = instance.product.parent_id
+    except Product.DoesNotExist:
+        parent_id = None
+    if parent_id:
+        invalidate_cache_group_id("variants-%s" % parent_id)
+
+
+@receiver(post_save, sender=PropertyOption)
+@receiver(post_delete, sender=PropertyOption)
+def property_option_changed_listener(sender, instance, **kwargs):
+    # option names and prices are used by all property related caches
+    invalidate_cache_group_id("global-properties-version")
+
+
 @receiver(post_save, sender=Product)
 def product_saved_listener(sender, instance, **kwargs):
-    # update_product_cache(instance)
-    update_category_cache(instance)
+    update_product_cache(instance)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted_listener(sender, instance, **kwargs):
+    if instance.is_variant() and instance.parent_id:
+        invalidate_cache_group_id("variant-prices-%s" % instance.parent_id)
+        invalidate_cache_group_id("variants-%s" % instance.parent_id)
 
 
 @receiver(post_save, sender=Product)
@@ -161,17 +239,20 @@ def shipping_method_saved_listener(sender, instance, **kwargs):
     delete_cache("%s-shipping-delivery-time" % settings.CACHE_MIDDLEWARE_KEY_PREFIX)
     delete_cache("%s-shipping-delivery-time-cart" % settings.CACHE_MIDDLEWARE_KEY_PREFIX)
     delete_cache("all_active_shipping_methods")
+    invalidate_cache_group_id("criteria-facts")
 
 
 @receiver(post_delete, sender=ShippingMethod)
 def shipping_method_deleted_listener(sender, instance, **kwargs):
     delete_cache("all_active_shipping_methods")
+    invalidate_cache_group_id("criteria-facts")
 
 
 # Shop
 @receiver(post_save, sender=Shop)
 def shop_saved_listener(sender, instance, **kwargs):
     delete_cache("%s-shop-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, instance.id))
+    invalidate_cache_group_id("variant-prices")
 
 
 # Static blocks
@@ -187,6 +268,7 @@ def topseller_changed_listener(sender, **kwargs):
 
 
 @receiver(post_save, sender=Topseller)
+@receiver(post_delete, sender=Topseller)
 def topseller_saved_listener(sender, instance, **kwargs):
     update_topseller_cache(instance)
 
@@ -206,6 +288,7 @@ def criterion_countries_changed(sender, instance, action, reverse, model, pk_set
         else:
             for pk in pk_set:
                 delete_cache("country_values_{}".format(pk))
+        invalidate_cache_group_id("criteria-facts")
 
 
 @receiver(post_save, sender=CustomerTax)
@@ -222,45 +305,61 @@ def customer_tax_deleted_listener(sender, instance, **kwargs):
 @receiver(post_save, sender=Tax)
 def tax_rate_created_listener(sender, instance, created, **kwargs):
     delete_cache("tax_rate_{}".format(instance.pk))
+    invalidate_cache_group_id("variant-prices")
 
 
 @receiver(post_delete, sender=Tax)
 def tax_rate_deleted_listener(sender, instance, **kwargs):
     delete_cache("tax_rate_{}".format(instance.pk))
+    invalidate_cache_group_id("variant-prices")
 
 
 #####
 def update_category_cache(instance):
-    # NOTE: ATM, we clear the whole cache if a category has been changed.
-    # Otherwise is lasts to long when the a category has a lot of products
-    # (1000s) and the shop admin changes a category.
-    clear_cache()
-    return
-    delete_cache("%s-category-breadcrumbs-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, instance.slug))
-    delete_cache("%s-category-products-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, instance.slug))
-    delete_cache("%s-category-all-products-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, instance.slug))
-    delete_cache("%s-category-categories-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, instance.slug))
+    """Deletes all category relevant caches.
 
-    for category in Category.objects.all():
-        delete_cache("%s-categories-portlet-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, category.slug))
-
-    delete_cache("%s-category-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, instance.id))
+    Category related cache entries contain the versions of the cache groups
+    "category-tree" (structure of the categories) and "category-<id>"
+    (products of the category) within their cache keys. Hence invalidating
+    these groups evicts just the affected entries, independent of the amount
+    of products within the category.
+    """
+    invalidate_cache_group_id("category-tree")
     delete_cache("%s-category-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, instance.slug))
 
-    delete_cache("%s-category-all-children-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, instance.id))
-    delete_cache("%s-category-children-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, instance.id))
-    delete_cache("%s-category-parents-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, instance.id))
-    delete_cache("%s-category-products-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, instance.id))
-    delete_cache("%s-category-all-products-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, instance.id))
+    if instance.pk:
+        update_category_products_cache(instance)
+        delete_cache("%s-category-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, instance.id))
 
-    # Note: As this is called "pre-saved" newly created categories don't have
-    # the many-to-many attribute "products", hence we have to take care of it
-    # here.
-    try:
-        for product in instance.products.all():
-            update_product_cache(product)
-    except ValueError:
-        pass
+        # If the slug or the parent has been changed the old values are still
+        # within the cache.
+        try:
+            old_category = Category.objects.get(pk=instance.pk)
+        except Category.DoesNotExist:
+            pass
+        else:
+            delete_cache("%s-category-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, old_category.slug))
+            if old_category.parent_id != instance.parent_id and old_category.parent_id:
+                update_category_products_cache(old_category.parent)
+
+
+def update_category_products_cache(instance):
+    """Deletes all caches which depend on the products of the passed category.
+    As categories display the products of their sub categories, the caches of
+    all parent categories are deleted, too.
+    """
+    invalidate_cache_group_id("category-%s" % instance.id)
+    for category in instance.get_parents():
+        invalidate_cache_group_id("category-%s" % category.id)
+
+
+def delete_product_categories_cache(instance):
+    """Deletes the cached categories of the passed product."""
+    tree_version = get_cache_group_id("category-tree")
+    delete_cache(
+        "%s-%s-product-categories-%s-False" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, tree_version, instance.id)
+    )
+    delete_cache("%s-%s-product-categories-%s-True" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, tree_version, instance.id))
 
 
 def update_product_cache(instance):
@@ -274,16 +373,24 @@ def update_product_cache(instance):
     # if product was changed then we have to clear all product_navigation caches
     invalidate_cache_group_id("product_navigation")
     invalidate_cache_group_id("properties-%s" % parent.id)
+    invalidate_cache_group_id("variant-prices-%s" % parent.id)
+    invalidate_cache_group_id("variants-%s" % parent.id)
+    invalidate_cache_group_id("criteria-facts")
+    if instance.manage_stock_amount:
+        invalidate_cache_group_id("stock")
+
+    # the product is displayed within its categories and their parents
+    for category_id in set([category.id for category in parent.get_categories(with_parents=True)]):
+        invalidate_cache_group_id("category-%s" % category_id)
+
     delete_cache("%s-product-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, parent.id))
     delete_cache("%s-product-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, parent.slug))
     delete_cache("%s-product-images-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, parent.id))
     delete_cache("%s-related-products-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, parent.id))
-    delete_cache("%s-product-categories-%s-False" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, parent.id))
-    delete_cache("%s-product-categories-%s-True" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, parent.id))
+    delete_product_categories_cache(parent)
     delete_cache("%s-default-variant-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, parent.id))
-    if parent.manufacturer:
-        delete_cache("%s-manufacturer-all-products-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, parent.manufacturer.pk))
-        delete_cache("%s-manufacturer-products-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, parent.manufacturer.slug))
+    if parent.manufacturer_id:
+        invalidate_cache_group_id("manufacturer-%s" % parent.manufacturer_id)
 
     try:
         c = cache.get("%s-shipping-delivery-time" % settings.CACHE_MIDDLEWARE_KEY_PREFIX)
@@ -294,14 +401,76 @@ def update_product_cache(instance):
 
     for variant in parent.get_variants():
         delete_cache("%s-product-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, variant.id))
-        delete_cache("%s-product-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, parent.slug))
+        delete_cache("%s-product-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, variant.slug))
         delete_cache("%s-product-images-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, variant.id))
         delete_cache("%s-related-products-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, variant.id))
-        delete_cache("%s-product-categories-%s-False" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, variant.id))
-        delete_cache("%s-product-categories-%s-True" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, variant.id))
+        delete_product_categories_cache(variant)
         delete_cache("%s-product-shipping-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, variant.slug))
 
 
+def update_products_cache(products):
+    """Deletes the caches of all passed products at once, which are bulk
+    updated, see update_product_cache.
+    """
+    parent_ids = set()
+    for product in products:
+        parent_ids.add(product.parent_id if product.is_variant() and product.parent_id else product.id)
+    if not parent_ids:
+        return
+
+    parents = Product.objects.in_bulk(parent_ids).values()
+    variants = Product.objects.filter(parent__in=parent_ids).values_list("id", "slug")
+
+    invalidate_cache_group_id("product_navigation")
+    invalidate_cache_group_id("criteria-facts")
+    if [product for product in products if product.manage_stock_amount]:
+        invalidate_cache_group_id("stock")
+
+    # the products are displayed within their categories and their parents
+    category_ids = set()
+    for category in Category.objects.filter(products__in=parent_ids).only("id", "path"):
+        category_ids.add(category.id)
+        category_ids.update(category.get_path_ids())
+    for category_id in category_ids:
+        invalidate_cache_group_id("category-%s" % category_id)
+
+    for manufacturer_id in set([parent.manufacturer_id for parent in parents if parent.manufacturer_id]):
+        invalidate_cache_group_id("manufacturer-%s" % manufacturer_id)
+
+    prefix = settings.CACHE_MIDDLEWARE_KEY_PREFIX
+    tree_version = get_cache_group_id("category-tree")
+    cache_keys = []
+    for product_id, slug in [(parent.id, parent.slug) for parent in parents] + list(variants):
+        cache_keys.extend(
+            [
+                "%s-product-%s" % (prefix, product_id),
+                "%s-product-%s" % (prefix, slug),
+                "%s-product-images-%s" % (prefix, product_id),
+                "%s-related-products-%s" % (prefix, product_id),
+                "%s-%s-product-categories-%s-False" % (prefix, tree_version, product_id),
+                "%s-%s-product-categories-%s-True" % (prefix, tree_version, product_id),
+                "%s-product-shipping-%s" % (prefix, slug),
+            ]
+        )
+
+    for parent in parents:
+        invalidate_cache_group_id("properties-%s" % parent.id)
+        invalidate_cache_group_id("variant-prices-%s" % parent.id)
+        invalidate_cache_group_id("variants-%s" % parent.id)
+        cache_keys.append("%s-default-variant-%s" % (prefix, parent.id))
+
+    # see delete_cache
+    cache.delete_many(cache_keys + [hashlib.md5(key.encode("utf-8")).hexdigest() for key in cache_keys])
+
+    try:
+        c = cache.get("%s-shipping-delivery-time" % prefix)
+        for parent in parents:
+            c.pop("%s-product-%s" % (prefix, parent.slug), None)
+        cache.set("%s-shipping-delivery-time" % prefix, c)
+    except (AttributeError, TypeError):
+        pass
+
+
 def update_cart_cache(instance):
     """Deletes all cart relevant caches."""
     if instance.user:
@@ -311,6 +480,8 @@ def update_cart_cache(instance):
     delete_cache("%s-cart-items-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, instance.id))
     delete_cache("%s-cart-costs-True-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, instance.id))
     delete_cache("%s-cart-costs-False-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, instance.id))
+    invalidate_cache_group_id("cart-%s" % instance.id)
+    invalidate_visitor_facts(instance.user_id, instance.session)
     delete_cache("%s-shipping-delivery-time-cart" % settings.CACHE_MIDDLEWARE_KEY_PREFIX)
     delete_cache("%s-shipping-delivery-time" % settings.CACHE_MIDDLEWARE_KEY_PREFIX)
 
@@ -320,15 +491,16 @@ def update_static_block_cache(instance):
     delete_cache("%s-static-block-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, instance.id))
 
     for category in instance.categories.all():
-        delete_cache("%s-category-inline-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, category.slug))
+        invalidate_cache_group_id("category-%s" % category.id)
 
 
 def update_topseller_cache(topseller):
-    """Deletes all topseller relevant caches."""
-    delete_cache("%s-topseller" % settings.CACHE_MIDDLEWARE_KEY_PREFIX)
-    product = topseller.product
-    for category in product.get_categories(with_parents=True):
-        delete_cache("%s-topseller-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, category.id))
+    """Deletes all topseller relevant caches.
+
+    Topseller related cache entries contain the version of the cache group
+    "topseller" within their cache keys, see lfs.marketing.utils.
+    """
+    invalidate_cache_group_id("topseller")
 
 
 @receiver(post_save, sender=WeightCriterion)
@@ -352,3 +524,4 @@ def update_topseller_cache(topseller):
 def clear_criterion_cache(sender, instance, **kwargs):
     cache_key = "criteria_for_model_{}_{}".format(instance.content_id, instance.content_type.pk)
     cache.delete(cache_key)
+    invalidate_cache_group_id("criteria-facts")
@@ -1,8 +1,11 @@
 # coding: utf-8
 
+from django.core.cache import cache
 from django.http import Http404
 from django.test import TestCase
-from lfs.caching.utils import lfs_get_object, lfs_get_object_or_404
+import lfs.core.utils
+from lfs.caching.utils import BoundedCache, get_cache_group_id, lfs_get_object, lfs_get_object_or_404
+from lfs.catalog.models import Category
 from lfs.catalog.models import Product
 
 
@@ -14,3 +17,107 @@ class CachingTestCase(TestCase):
 
     def test_lfs_get_object_or_404(self):
         self.assertRaises(Http404, lfs_get_object_or_404, Product, slug="zażółćgęśląjaźń")
+
+    def test_bounded_cache(self):
+        bounded_cache = BoundedCache("test-bounded", "1", max_entries=2, stats=True)
+        self.assertEqual(bounded_cache.get("a"), None)
+
+        bounded_cache.set("a", 1)
+        bounded_cache.set("b", 2)
+        self.assertEqual(bounded_cache.get("a"), 1)
+        self.assertEqual(bounded_cache.get("b"), 2)
+
+        # The oldest entry is deleted
+        bounded_cache.set("c", 3)
+        self.assertEqual(bounded_cache.get("a"), None)
+        self.assertEqual(bounded_cache.get("c"), 3)
+
+        # Entries of another namespace are independent
+        self.assertEqual(BoundedCache("test-bounded", "2", stats=True).get("c"), None)
+
+        self.assertEqual(bounded_cache.get_stats(), {"hits": 3, "misses": 3})
+
+        # Reading an entry doesn't change the order in which entries are deleted
+        bounded_cache.get("b")
+        bounded_cache.set("d", 4)
+        self.assertEqual(bounded_cache.get("b"), None)
+        self.assertEqual(bounded_cache.get("c"), 3)
+
+        # Without stats nothing is counted
+        BoundedCache("test-bounded", "1").get("c")
+        self.assertEqual(bounded_cache.get_stats(), {"hits": 5, "misses": 4})
+
+
+class CategoryCacheTestCase(TestCase):
+    fixtures = ["lfs_shop.xml", "lfs_user.xml"]
+
+    def setUp(self):
+        self.p1 = Product.objects.create(name="Product 1", slug="product-1", active=True)
+        self.p2 = Product.objects.create(name="Product 2", slug="product-2", active=True)
+
+        self.c1 = Category.objects.create(name="Category 1", slug="category-1")
+        self.c11 = Category.objects.create(name="Category 11", slug="category-11", parent=self.c1)
+        self.c2 = Category.objects.create(name="Category 2", slug="category-2")
+
+        self.c11.products.set([self.p1])
+        self.c2.products.set([self.p2])
+
+    def test_category_saved(self):
+        """Saving a category must not clear unrelated cache entries."""
+        cache.set("unrelated-key", 42)
+
+        self.c1.name = "Category 1.1"
+        self.c1.save()
+
+        self.assertEqual(cache.get("unrelated-key"), 42)
+
+    def test_category_children(self):
+        self.assertEqual(list(self.c1.get_all_children()), [self.c11])
+
+        c111 = Category.objects.create(name="Category 111", slug="category-111", parent=self.c11)
+        self.assertEqual(list(self.c1.get_all_children()), [self.c11, c111])
+
+    def test_product_saved(self):
+        """Saving a product evicts the products of its categories and their parents only."""
+        self.assertEqual(list(self.c1.get_all_products()), [self.p1])
+        self.assertEqual(list(self.c2.get_products()), [self.p2])
+
+        version_c1 = get_cache_group_id("category-%s" % self.c1.id)
+        version_c11 = get_cache_group_id("category-%s" % self.c11.id)
+        version_c2 = get_cache_group_id("category-%s" % self.c2.id)
+
+        self.p1.active = False
+        self.p1.save()
+
+        self.assertNotEqual(get_cache_group_id("category-%s" % self.c1.id), version_c1)
+        self.assertNotEqual(get_cache_group_id("category-%s" % self.c11.id), version_c11)
+        self.assertEqual(get_cache_group_id("category-%s" % self.c2.id), version_c2)
+        self.assertEqual(list(self.c1.get_all_products()), [])
+
+    def test_product_categories_changed(self):
+        self.assertEqual(list(self.c2.get_products()), [self.p2])
+
+        self.c2.products.add(self.p1)
+        self.assertEqual(set(self.c2.get_products()), set([self.p1, self.p2]))
+        self.assertEqual(set(self.p1.get_categories()), set([self.c11, self.c2]))
+
+    def test_category_tree(self):
+        categories = lfs.core.utils.CategoryTree([], 1, 0).get_category_tree()
+        self.assertEqual(set([c["category"] for c in categories]), set([self.c1, self.c2]))
+        self.assertEqual([c["children"] for c in categories], [[], []])
+
+        # The tree is built from the cached skeleton, current categories are expanded
+        with self.assertNumQueries(0):
+            categories = lfs.core.utils.CategoryTree([self.c11, self.c1], 1, 0).get_category_tree()
+
+        c1 = [c for c in categories if c["category"] == self.c1][0]
+        self.assertEqual(c1["is_current"], True)
+        self.assertEqual([c["category"] for c in c1["children"]], [self.c11])
+        self.assertEqual(c1["children"][0]["level"], 1)
+
+        # Changing a category rebuilds the skeleton
+        self.c11.exclude_from_navigation = True
+        self.c11.save()
+        categories = lfs.core.utils.CategoryTree([self.c1], 1, 0).get_category_tree()
+        c1 = [c for c in categories if c["category"] == self.c1][0]
+        self.assertEqual(c1["children"], [])
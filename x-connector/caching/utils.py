@@ -151,3 +151,96 @@ def invalidate_cache_group_id(group_code):
         cache.incr(cache_group_key)
     except ValueError:
         pass
+
+
+class BoundedCache(object):
+    """A set of cache entries with one cache key per entry. At most
+    ``max_entries`` entries are kept per namespace; if more entries are added
+    the entries which have been added first are deleted (FIFO), regardless of
+    how often they are read. Reading an entry doesn't write to the cache.
+
+    The keys of the entries are kept in an index per namespace, which is
+    updated without a lock. Concurrent ``set`` calls might drop each other's
+    keys from the index, which leaves these entries in the cache until the
+    namespace changes or the cache evicts them.
+
+    If ``stats`` is True, hits and misses are counted per name, see
+    ``get_stats``. This costs one cache write per ``get``.
+
+    **Parameters:**
+
+    name
+        The name of the cache, e.g. "category-products".
+
+    namespace
+        The namespace of the entries, e.g. the id of a category together with
+        the versions of the relevant cache groups. Changing the versions
+        invalidates all entries of the namespace.
+
+    max_entries
+        The maximal amount of entries per namespace.
+
+    stats
+        Whether hits and misses are counted.
+    """
+
+    def __init__(self, name, namespace, max_entries=100, stats=False):
+        self.name = name
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.stats = stats
+
+    def _get_cache_key(self, key):
+        return "%s-%s-%s-%s" % (
+            settings.CACHE_MIDDLEWARE_KEY_PREFIX,
+            self.name,
+            self.namespace,
+            hashlib.md5(force_str(key).encode("utf-8")).hexdigest(),
+        )
+
+    def _get_index_key(self):
+        return "%s-%s-%s-index" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, self.name, self.namespace)
+
+    def _get_stats_key(self, counter):
+        return "%s-%s-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, self.name, counter)
+
+    def _count(self, counter):
+        stats_key = self._get_stats_key(counter)
+        try:
+            cache.incr(stats_key)
+        except ValueError:
+            cache.set(stats_key, 1, None)
+
+    def get(self, key):
+        """Returns the value for the given key or None."""
+        value = cache.get(self._get_cache_key(key))
+        if self.stats:
+            self._count("hits" if value is not None else "misses")
+        return value
+
+    def set(self, key, value):
+        """Sets the value for the given key and deletes the oldest entries of
+        the namespace if there are more than max_entries.
+        """
+        cache_key = self._get_cache_key(key)
+        index_key = self._get_index_key()
+
+        index = cache.get(index_key) or []
+        if cache_key in index:
+            index.remove(cache_key)
+        index.append(cache_key)
+
+        expired = index[: -self.max_entries]
+        if expired:
+            cache.delete_many(expired)
+
+        cache.set_many({cache_key: value, index_key: index[-self.max_entries :]})
+
+    def get_stats(self):
+        """Returns the hits and misses of all caches with the same name, which
+        count stats.
+        """
+        return {
+            "hits": cache.get(self._get_stats_key("hits"), 0),
+            "misses": cache.get(self._get_stats_key("misses"), 0),
+        }
@@ -13,15 +13,42 @@ class Command(BaseCommand):
             default=7,
             help="Remove carts modified before specified number of days",
         )
+        parser.add_argument(
+            "--batch-size",
+            action="store",
+            dest="batch_size",
+            type=int,
+            default=1000,
+            help="Amount of carts which are removed at once",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            dest="dry_run",
+            default=False,
+            help="Only count the carts which would be removed",
+        )
 
     def handle(self, *args, **options):
         """ """
         from lfs.cart.models import Cart
+        from lfs.cart.utils import delete_carts
+        from lfs.core.utils import get_pk_batches
 
         days = int(options["days"])
         today = datetime.date.today()
         dt = today - datetime.timedelta(days=days)
         qs = Cart.objects.filter(modification_date__lt=dt)
-        carts_count = qs.count()
-        qs.delete()
-        print("Removed %s carts" % carts_count)
+
+        carts_count = 0
+        for pks in get_pk_batches(qs, options["batch_size"]):
+            if options["dry_run"]:
+                carts_count += len(pks)
+            else:
+                carts_count += delete_carts(pks)
+                print("Removed %s carts so far" % carts_count)
+
+        if options["dry_run"]:
+            print("Would remove %s carts" % carts_count)
+        else:
+            print("Removed %s carts" % carts_count)
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cart", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cartitem",
+            name="reserved_until",
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name="Reserved until"),
+        ),
+    ]
@@ -1,16 +1,21 @@
-import re
 import locale
 import logging
+from datetime import timedelta
 
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.cache import cache
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+import lfs.catalog.utils
+from lfs.caching.utils import get_cache_group_id
+from lfs.caching.utils import invalidate_cache_group_id
 from lfs.catalog.models import Product, PropertyGroup
 from lfs.catalog.models import Property
 from lfs.catalog.models import PropertyOption
+from lfs.catalog.settings import STOCK_RESERVATION_TIME
 
 
 logger = logging.getLogger(__name__)
@@ -102,6 +107,7 @@ class Cart(models.Model):
 
         cache_key = "%s-cart-items-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, self.id)
         cache.delete(cache_key)
+        invalidate_cache_group_id("cart-%s" % self.id)
 
         return cart_item
 
@@ -142,11 +148,28 @@ class Cart(models.Model):
         """
         Returns the items of the cart.
         """
-        self._update_product_amounts()
+        # The amounts only need to be checked if the stock amounts or the cart
+        # have been changed since the last check.
+        stock_version = get_cache_group_id("stock")
+        cart_version = get_cache_group_id("cart-%s" % self.id)
+        cache_key = "%s-%s-%s-cart-stock-checked-%s" % (
+            settings.CACHE_MIDDLEWARE_KEY_PREFIX,
+            stock_version,
+            cart_version,
+            self.id,
+        )
+        if cache.get(cache_key) is None:
+            self._update_product_amounts()
+            cache.set(cache_key, True)
+
         cache_key = "%s-cart-items-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, self.id)
         items = cache.get(cache_key)
         if items is None:
-            items = CartItem.objects.select_related().filter(cart=self, product__active=True)
+            items = (
+                CartItem.objects.select_related()
+                .prefetch_related("properties__property")
+                .filter(cart=self, product__active=True)
+            )
             # items = CartItem.objects.filter(cart=self)
             cache.set(cache_key, items)
         return items
@@ -165,34 +188,53 @@ class Cart(models.Model):
                 max_delivery_time = delivery_time
         return max_delivery_time
 
+    def get_totals(self, request):
+        """
+        Returns the items and prices of the cart, see CartTotals. These are
+        calculated once per request and shared by all callers until the cart
+        or its items are changed.
+        """
+        cache_key = "cached_cart_totals_%s" % self.id
+        if request is not None:
+            cached = getattr(request, cache_key, None)
+            if cached is not None and cached[0] == get_cache_group_id("cart-%s" % self.id):
+                return cached[1]
+
+        totals = CartTotals(request, self)
+        if request is not None:
+            setattr(request, cache_key, (get_cache_group_id("cart-%s" % self.id), totals))
+        return totals
+
     def get_price_gross(self, request, total=False):
         """
         Returns the total gross price of all items.
         """
-        price = 0
-        for item in self.get_items():
-            price += item.get_price_gross(request)
-        return price
+        return self.get_totals(request).price_gross
 
     def get_price_net(self, request):
         """
         Returns the total net price of all items.
         """
-        price = 0
-        for item in self.get_items():
-            price += item.get_price_net(request)
-
-        return price
+        return self.get_totals(request).price_net
 
     def get_tax(self, request):
         """
         Returns the total tax of all items
         """
-        tax = 0
-        for item in self.get_items():
-            tax += item.get_tax(request)
+        return self.get_totals(request).tax
 
-        return tax
+    def get_out_of_stock_items(self):
+        """
+        Returns the items with a higher amount than the available stock amount
+        of their product, see ``lfs.catalog.models.Product.get_available_stock_amount``.
+        """
+        return [
+            item
+            for item in self.get_items()
+            if item.product.manage_stock_amount
+            and not item.product.order_time
+            and item.amount > item.product.get_available_stock_amount(self)
+        ]
 
     def _update_product_amounts(self):
         items = CartItem.objects.select_related("product").filter(
@@ -215,6 +257,53 @@ class Cart(models.Model):
         app_label = "cart"
 
 
+class CartTotals(object):
+    """
+    Loads the items of a cart together with their products once and calculates
+    the prices of every item a single time. An instance is shared by the cart,
+    its items, criteria, discounts, vouchers and the order creation within a
+    request, see Cart.get_totals.
+
+    **Attributes**
+
+    items
+        The active items of the cart.
+
+    price_gross
+        The total gross price of all items.
+
+    price_net
+        The total net price of all items.
+
+    tax
+        The total tax of all items.
+    """
+
+    def __init__(self, request, cart):
+        self.items = list(cart.get_items())
+        self.price_gross = 0
+        self.price_net = 0
+        self.tax = 0
+        self._item_prices = {}
+
+        for item in self.items:
+            prices = item.calculate_prices(request)
+            self._item_prices[item.id] = prices
+            self.price_gross += prices["price_gross"]
+            self.price_net += prices["price_net"]
+            self.tax += prices["tax"]
+
+    def get_item_prices(self, item):
+        """
+        Returns the calculated prices of passed item or None if the item has
+        not been calculated with its current product and amount.
+        """
+        prices = self._item_prices.get(item.id)
+        if prices is None or prices["product_id"] != item.product_id or prices["amount"] != item.amount:
+            return None
+        return prices
+
+
 class CartItem(models.Model):
     """
     A cart item belongs to a cart. It stores the product and the amount of the
@@ -236,6 +325,11 @@ class CartItem(models.Model):
 
     modification_date
         The modification date of the cart item.
+
+    reserved_until
+        Until then the amount of the product is reserved for the cart, if the
+        stock amount of the product is managed. The reservation is renewed
+        with every change of the cart item.
     """
 
     cart = models.ForeignKey(Cart, models.CASCADE, verbose_name=_("Cart"))
@@ -243,11 +337,19 @@ class CartItem(models.Model):
     amount = models.FloatField(_("Quantity"), blank=True, null=True)
     creation_date = models.DateTimeField(_("Creation date"), auto_now_add=True)
     modification_date = models.DateTimeField(_("Modification date"), auto_now=True)
+    reserved_until = models.DateTimeField(_("Reserved until"), blank=True, null=True, db_index=True)
 
     class Meta:
         ordering = ["id"]
         app_label = "cart"
 
+    def save(self, *args, **kwargs):
+        if self.product.manage_stock_amount:
+            self.reserved_until = timezone.now() + timedelta(minutes=STOCK_RESERVATION_TIME)
+        else:
+            self.reserved_until = None
+        super(CartItem, self).save(*args, **kwargs)
+
     def __str__(self):
         return "Product: %(product)s, Quantity: %(amount)f, Cart: %(cart)s" % {
             "product": self.product,
@@ -260,18 +362,51 @@ class CartItem(models.Model):
         Returns the total price of the cart item, which is just the multiplication
         of the product's price and the amount of the product within in the cart.
         """
-        return self.get_price_gross(request) - self.get_tax(request)
+        return self.get_prices(request)["price_net"]
 
     def get_price_gross(self, request):
         """
         Returns the gross item price.
         """
-        return self.get_product_price_gross(request) * self.amount
+        return self.get_prices(request)["price_gross"]
 
     def get_product_price_gross(self, request):
         """
         Returns the product item price. Based on selected properties, etc.
         """
+        return self.get_prices(request)["product_price_gross"]
+
+    def get_prices(self, request):
+        """
+        Returns the prices of the item. Takes them from the totals of the cart
+        of the current request if they have been calculated already.
+        """
+        if request is not None:
+            prices = self.cart.get_totals(request).get_item_prices(self)
+            if prices is not None:
+                return prices
+        return self.calculate_prices(request)
+
+    def calculate_prices(self, request):
+        """
+        Calculates the prices of the item: product_price_gross, price_gross,
+        price_net and tax.
+        """
+        product_price_gross = self._calculate_product_price_gross(request)
+        price_gross = product_price_gross * self.amount
+        rate = self.product.get_tax_rate(request)
+        tax = price_gross * (rate / (rate + 100))
+
+        return {
+            "product_id": self.product_id,
+            "amount": self.amount,
+            "product_price_gross": product_price_gross,
+            "price_gross": price_gross,
+            "price_net": price_gross - tax,
+            "tax": tax,
+        }
+
+    def _calculate_product_price_gross(self, request):
         if not self.product.is_configurable_product():
             price = self.product.get_price_gross(request, amount=self.amount)
         else:
@@ -304,35 +439,25 @@ class CartItem(models.Model):
         Returns the calculated gross price of the product based on property
         values and the price calculation field of the product.
         """
-        pc = self.product.price_calculation
-        tokens = self.product.price_calculation.split(" ")
+        expression = lfs.catalog.utils.get_price_calculation(self.product.price_calculation)
 
-        for token in tokens:
-            if token.startswith("property"):
-                mo = re.match("property\((\d+)\)", token)
-                ppv = self.properties.filter(property__id=mo.groups()[0])[0]
-                if ppv.property.is_select_field:
-                    po = PropertyOption.objects.get(pk=ppv.value)
-                    value = po.price
-                else:
-                    value = float(ppv.value)
-                pc = pc.replace(token, str(value))
-            elif token.startswith("number"):
-                mo = re.match("number\((\d+)\)", token)
-                pc = pc.replace(token, mo.groups()[0])
-            elif token.startswith("product"):
-                mo = re.match("product\((.+)\)", token)
-                value = getattr(self.product, mo.groups()[0])
-                pc = pc.replace(token, str(value))
-
-        return eval(pc)
+        option_prices = lfs.catalog.utils.get_option_prices()
+        property_values = {}
+        for ppv in self.properties.all():
+            if ppv.property_id in property_values:
+                continue
+            if ppv.property.is_select_field:
+                property_values[ppv.property_id] = option_prices[int(ppv.value)]
+            else:
+                property_values[ppv.property_id] = ppv.value
+
+        return lfs.catalog.utils.evaluate_price_calculation(expression, self.product, property_values)
 
     def get_tax(self, request):
         """
         Returns the absolute tax of the item.
         """
-        rate = self.product.get_tax_rate(request)
-        return self.get_price_gross(request) * (rate / (rate + 100))
+        return self.get_prices(request)["tax"]
 
     def get_properties(self):
         """
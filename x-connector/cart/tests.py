@@ -10,10 +10,13 @@ from django.urls import reverse
 from django.http import Http404
 from django.test import TestCase
 from django.test import Client
+from django.utils import timezone
 
 import lfs.cart.utils
+from lfs.caching.utils import invalidate_cache_group_id
 from lfs.cart.models import Cart
 from lfs.cart.models import CartItem
+from lfs.cart.models import CartItemPropertyValue
 from lfs.cart.utils import get_cart
 from lfs.cart.views import add_to_cart
 from lfs.cart.views import added_to_cart_items
@@ -23,9 +26,12 @@ from lfs.catalog.models import Product
 from lfs.catalog.models import GroupsPropertiesRelation
 from lfs.catalog.models import Property
 from lfs.catalog.models import PropertyGroup
+from lfs.catalog.models import PropertyOption
 from lfs.catalog.settings import CONFIGURABLE_PRODUCT
 from lfs.catalog.settings import STANDARD_PRODUCT
 from lfs.catalog.settings import DELIVERY_TIME_UNIT_DAYS
+from lfs.catalog.settings import PROPERTY_NUMBER_FIELD
+from lfs.catalog.settings import PROPERTY_SELECT_FIELD
 from lfs.catalog.settings import PROPERTY_TEXT_FIELD
 from lfs.tests.utils import RequestFactory
 from lfs.tax.models import Tax
@@ -232,6 +238,27 @@ class CartModelsTestCase(TestCase):
         items = self.cart.get_items()
         self.assertEqual(len(items), 2)
 
+    def test_get_totals(self):
+        """ """
+        totals = self.cart.get_totals(self.request)
+        self.assertEqual(len(totals.items), 2)
+        self.assertEqual(totals.price_gross, 110.0)
+        self.assertEqual("%.2f" % totals.price_net, "%.2f" % 92.44)
+        self.assertEqual("%.2f" % totals.tax, "%.2f" % 17.56)
+
+        # The totals are calculated once per request
+        self.assertTrue(self.cart.get_totals(self.request) is totals)
+        self.assertEqual(totals.items[0].get_price_gross(self.request), 10.0)
+
+        # Changing an item recalculates the totals
+        item = CartItem.objects.get(cart=self.cart, product=self.p1)
+        item.amount = 2
+        item.save()
+
+        totals = self.cart.get_totals(self.request)
+        self.assertEqual(totals.price_gross, 120.0)
+        self.assertEqual(item.get_price_gross(self.request), 20.0)
+
 
 class CartItemTestCase(TestCase):
     """ """
@@ -252,6 +279,30 @@ class CartItemTestCase(TestCase):
         result = self.item.get_properties()
         self.assertEqual(result, [])
 
+    def test_get_calculated_price(self):
+        """Tests the price calculation of configurable products."""
+        width = Property.objects.create(name="Width", type=PROPERTY_NUMBER_FIELD)
+        color = Property.objects.create(name="Color", type=PROPERTY_SELECT_FIELD)
+        red = PropertyOption.objects.create(name="Red", property=color, price=5.0)
+
+        self.p1.sub_type = CONFIGURABLE_PRODUCT
+        self.p1.active_price_calculation = True
+        self.p1.price_calculation = "property(%s) * product(price) + property(%s)" % (width.id, color.id)
+        self.p1.save()
+
+        CartItemPropertyValue.objects.create(cart_item=self.item, property=width, value="3")
+        CartItemPropertyValue.objects.create(cart_item=self.item, property=color, value=str(red.id))
+
+        self.assertEqual(self.item.get_calculated_price(None), 35.0)
+
+        # Anything else than arithmetic with properties, numbers and product
+        # attributes is rejected
+        self.p1.price_calculation = "__import__('os').getcwd()"
+        self.assertRaises(ValueError, self.item.get_calculated_price, None)
+
+        self.p1.price_calculation = "product(__class__)"
+        self.assertRaises(ValueError, self.item.get_calculated_price, None)
+
     def test_get_items(self):
         """If product that is in the cart is out of stock then cart.get_items should update cart_items."""
         self.assertFalse(self.p1.manage_stock_amount)
@@ -266,6 +317,34 @@ class CartItemTestCase(TestCase):
         self.p1.save()
         self.assertEqual(len(list(self.cart.get_items())), 0)
 
+    def test_stock_reservation(self):
+        """The amount of a product within a cart is reserved for the cart."""
+        self.p1.manage_stock_amount = True
+        self.p1.stock_amount = 3
+        self.p1.save()
+
+        cart = Cart.objects.create()
+        self.assertEqual(self.p1.get_available_stock_amount(cart), 3)
+
+        # The item has been created before the stock amount was managed
+        item = self.cart.get_items().get(product=self.p1)
+        self.assertEqual(item.reserved_until, None)
+
+        item.amount = 2
+        item.save()
+        self.assertEqual(self.p1.get_reserved_amount(), 2)
+        self.assertEqual(self.p1.get_available_stock_amount(cart), 1)
+        self.assertEqual(self.p1.get_available_stock_amount(self.cart), 3)
+
+        cart.add(self.p1, amount=2)
+        self.assertEqual([item.product for item in cart.get_out_of_stock_items()], [self.p1])
+
+        # Expired reservations don't count
+        CartItem.objects.filter(cart=self.cart).update(reserved_until=timezone.now() - datetime.timedelta(minutes=1))
+        invalidate_cache_group_id("stock-%s" % self.p1.id)
+        self.assertEqual(self.p1.get_available_stock_amount(cart), 3)
+        self.assertEqual(cart.get_out_of_stock_items(), [])
+
 
 class AddToCartTestCase(TestCase):
     """Test case for add_to_cart view."""
@@ -2,10 +2,17 @@
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.cache import cache
+from django.db import transaction
 from django.urls import reverse
+from django.utils import timezone
 
 # lfs imports
+from lfs.caching.utils import invalidate_cache_group_id
 from lfs.cart.models import Cart
+from lfs.cart.models import CartItem
+from lfs.cart.models import CartItemPropertyValue
+from lfs.core.utils import delete_without_signals
+from lfs.criteria.facts import invalidate_visitor_facts
 
 # Load logger
 import logging
@@ -134,3 +141,43 @@ def update_cart_after_login(request):
             session_cart.delete()
     except ObjectDoesNotExist:
         pass
+
+
+def delete_carts(pks):
+    """
+    Deletes the carts with passed primary keys together with their items. This
+    takes one DELETE statement per table instead of loading every cart and
+    sending its signals. The caches the caching listeners would have
+    invalidated are invalidated here. Returns the amount of deleted carts.
+    """
+    carts = Cart.objects.filter(pk__in=pks)
+
+    cache_keys = []
+    visitors = []
+    for session, user_id in carts.values_list("session", "user_id"):
+        visitors.append((user_id, session))
+        cache_keys.append("%s-cart-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, session))
+        if user_id:
+            cache_keys.append("%s-cart-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, user_id))
+
+    # Products with reservations which are still valid, see
+    # lfs.catalog.models.Product.get_reserved_amount
+    cart_items = CartItem.objects.filter(cart__in=pks, reserved_until__gt=timezone.now())
+    product_ids = set(cart_items.values_list("product_id", flat=True))
+
+    # This bypasses the delete receivers of Cart, CartItem and
+    # CartItemPropertyValue in lfs.caching.listeners. Their caches are
+    # invalidated below instead, except of the "cart-<id>" groups, which are
+    # never used again for the deleted carts.
+    with transaction.atomic():
+        delete_without_signals(CartItemPropertyValue.objects.filter(cart_item__cart__in=pks))
+        delete_without_signals(CartItem.objects.filter(cart__in=pks))
+        amount = delete_without_signals(carts)
+
+    cache.delete_many(cache_keys)
+    for user_id, session in visitors:
+        invalidate_visitor_facts(user_id, session)
+    for product_id in product_ids:
+        invalidate_cache_group_id("stock-%s" % product_id)
+
+    return amount
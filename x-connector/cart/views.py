@@ -121,7 +121,7 @@ def cart_inline(request, template_name="lfs/cart/cart_inline.html"):
     max_delivery_time = cart.get_delivery_time(request)
 
     cart_items = []
-    for cart_item in cart.get_items():
+    for cart_item in cart.get_totals(request).items:
         product = cart_item.product
         quantity = product.get_clean_quantity(cart_item.amount)
         cart_items.append(
@@ -342,20 +342,23 @@ def add_to_cart(request, product_id=None):
     cart_item = cart.add(product, properties_dict, quantity)
     cart_items = [cart_item]
 
-    # Check stock amount
+    # Check stock amount. The amount which is reserved by other carts is not
+    # available.
     message = ""
-    if product.manage_stock_amount and cart_item.amount > product.stock_amount and not product.order_time:
-        if product.stock_amount == 0:
-            message = _("Sorry, but '%(product)s' is not available anymore.") % {"product": product.name}
-        elif product.stock_amount == 1:
-            message = _("Sorry, but '%(product)s' is only one time available.") % {"product": product.name}
-        else:
-            message = _("Sorry, but '%(product)s' is only %(amount)s times available.") % {
-                "product": product.name,
-                "amount": product.stock_amount,
-            }
-        cart_item.amount = product.stock_amount
-        cart_item.save()
+    if product.manage_stock_amount and not product.order_time:
+        stock_amount = product.get_available_stock_amount(cart)
+        if cart_item.amount > stock_amount:
+            if stock_amount == 0:
+                message = _("Sorry, but '%(product)s' is not available anymore.") % {"product": product.name}
+            elif stock_amount == 1:
+                message = _("Sorry, but '%(product)s' is only one time available.") % {"product": product.name}
+            else:
+                message = _("Sorry, but '%(product)s' is only %(amount)s times available.") % {
+                    "product": product.name,
+                    "amount": stock_amount,
+                }
+            cart_item.amount = stock_amount
+            cart_item.save()
 
     # Add selected accessories to cart
     for key, value in request.POST.items():
@@ -386,7 +389,7 @@ def add_to_cart(request, product_id=None):
     cart_changed.send(cart, request=request)
 
     # Update the customer's shipping method (if appropriate)
-    customer = customer_utils.get_or_create_customer(request)
+    customer = customer_utils.get_or_create_session_customer(request)
     shipping_utils.update_to_valid_shipping_method(request, customer, save=True)
 
     # Update the customer's payment method (if appropriate)
@@ -432,7 +435,7 @@ def refresh_cart(request):
     cart = cart_utils.get_cart(request)
     if not cart:
         raise Http404
-    customer = customer_utils.get_or_create_customer(request)
+    customer = customer_utils.get_or_create_session_customer(request)
 
     # Update country
     country_iso = request.POST.get("country")
@@ -458,8 +461,14 @@ def refresh_cart(request):
         amount = request.POST.get("amount-cart-item_%s" % item.id, "0.0")
         amount = item.product.get_clean_quantity_value(amount, allow_zero=True)
 
-        if item.product.manage_stock_amount and amount > item.product.stock_amount and not item.product.order_time:
-            amount = item.product.stock_amount
+        # The amount which is reserved by other carts is not available.
+        if item.product.manage_stock_amount and not item.product.order_time:
+            stock_amount = item.product.get_available_stock_amount(cart)
+        else:
+            stock_amount = None
+
+        if stock_amount is not None and amount > stock_amount:
+            amount = stock_amount
             if amount < 0:
                 amount = 0
 
@@ -4,6 +4,7 @@ from django.db.models.signals import post_delete, post_save
 from django.db.models.signals import pre_delete
 from django.dispatch import receiver
 
+from lfs.catalog.models import Category
 from lfs.catalog.models import File, Property
 from lfs.catalog.models import Image
 from lfs.catalog.models import ProductAttachment
@@ -11,6 +12,7 @@ from lfs.catalog.models import PropertyGroup
 from lfs.catalog.models import ProductPropertyValue
 from lfs.catalog.models import PropertyOption
 from lfs.catalog.models import GroupsPropertiesRelation
+from lfs.catalog.models import update_category_paths
 from lfs.catalog.settings import DELETE_FILES, PROPERTY_VALUE_TYPE_FILTER
 from lfs.catalog.settings import DELETE_IMAGES
 from lfs.catalog.settings import THUMBNAIL_SIZES
@@ -18,6 +20,15 @@ from lfs.core.signals import property_type_changed
 from lfs.core.signals import product_removed_property_group
 
 
+@receiver(post_delete, sender=Category)
+def category_deleted_listener(sender, instance, **kwargs):
+    """The children of a deleted category become top level categories, hence
+    the paths of all descendants are updated.
+    """
+    if instance.path:
+        update_category_paths(instance.path, "/")
+
+
 @receiver(pre_delete, sender=PropertyOption)
 def property_option_deleted_listener(sender, instance, **kwargs):
     """
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Creates variants of a product for all combinations of its variant properties"
+
+    def add_arguments(self, parser):
+        parser.add_argument("product_id", type=int, help="Id of the product with variants")
+        parser.add_argument(
+            "--slug",
+            action="store",
+            dest="slug",
+            default="",
+            help="Added to the slug of the product, followed by the names of the options",
+        )
+        parser.add_argument("--name", action="store", dest="name", default="", help="Name of the variants")
+        parser.add_argument(
+            "--price", action="store", dest="price", type=float, default=0.0, help="Price of the variants"
+        )
+        parser.add_argument(
+            "--batch-size",
+            action="store",
+            dest="batch_size",
+            type=int,
+            default=1000,
+            help="Amount of objects which are inserted per query",
+        )
+
+    def handle(self, *args, **options):
+        """ """
+        from lfs.catalog.models import Product
+        from lfs.catalog.utils import create_variants
+        from lfs.manage.utils import cartesian_product
+
+        try:
+            product = Product.objects.get(pk=options["product_id"])
+        except Product.DoesNotExist:
+            raise CommandError("Product with id %s does not exist" % options["product_id"])
+
+        if not product.is_product_with_variants():
+            raise CommandError("Product with id %s is not a product with variants" % product.id)
+
+        properties = []
+        for prop_dict in product.get_variants_properties():
+            property_group_id = prop_dict["property_group"].id if prop_dict["property_group"] else 0
+            prop = prop_dict["property"]
+            prop_options = [
+                "%s|%s|%s" % (property_group_id, prop.id, option_id)
+                for option_id in prop.options.values_list("id", flat=True)
+            ]
+            if prop_options:
+                properties.append(prop_options)
+
+        variants = create_variants(
+            product,
+            cartesian_product(*properties),
+            slug=options["slug"],
+            name=options["name"],
+            price=options["price"],
+            batch_size=options["batch_size"],
+        )
+        print("Created %s variants" % len(variants))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the paths and levels of all categories"
+
+    def handle(self, *args, **options):
+        """ """
+        import lfs.catalog.utils
+
+        amount = lfs.catalog.utils.rebuild_category_paths()
+        print("Updated %s categories" % amount)
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+
+def set_category_paths(apps, schema_editor):
+    Category = apps.get_model("catalog", "Category")
+    categories = dict((category.id, category) for category in Category.objects.all())
+
+    def get_path(category, seen):
+        parent = categories.get(category.parent_id)
+        if parent is None or parent.id in seen:
+            return "/%s/" % category.id
+        seen.add(category.id)
+        return "%s%s/" % (get_path(parent, seen), category.id)
+
+    for category in categories.values():
+        category.path = get_path(category, set())
+        category.level = category.path.count("/") - 1
+
+    Category.objects.bulk_update(categories.values(), ["path", "level"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0004_auto_20170216_0455"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="path",
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(set_category_paths, migrations.RunPython.noop),
+    ]
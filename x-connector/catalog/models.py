@@ -10,8 +10,12 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.core.cache import cache
 from django.urls import reverse
 from django.db.models import F
+from django.db.models import Sum
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
 from django.db import models
 from django.template.defaultfilters import striptags
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 
@@ -158,6 +162,12 @@ class Category(models.Model):
        The level of the category within the category hierachie, e.g. if it
        is a top level category the level is 1.
 
+    path
+       The materialized path of the category, i.e. the ids of all parent
+       categories and of the category itself, e.g. "/1/5/12/". It is updated
+       on save and used to query all children or parents of the category
+       with a single query.
+
     template
        Sets the template which renders the category view. If left to None, default template is used.
     """
@@ -198,6 +208,7 @@ class Category(models.Model):
     meta_description = models.TextField(_("Meta description"), blank=True)
 
     level = models.PositiveSmallIntegerField(default=1)
+    path = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
     uid = models.CharField(max_length=50, editable=False, unique=True, default=get_unique_id_str)
 
     class Meta:
@@ -209,6 +220,33 @@ class Category(models.Model):
     def __str__(self):
         return "%s (%s)" % (self.name, self.slug)
 
+    def save(self, *args, **kwargs):
+        super(Category, self).save(*args, **kwargs)
+        self.update_path()
+
+    def update_path(self):
+        """
+        Updates the path and the level of the category based on the path of
+        the parent category. If the category has been moved the paths and
+        levels of all child categories are updated, too.
+        """
+        parent_path = "/"
+        if self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list("path", flat=True).first() or "/"
+
+        path = "%s%s/" % (parent_path, self.id)
+        level = path.count("/") - 1
+        if path == self.path and level == self.level:
+            return
+
+        old_path = self.path
+        Category.objects.filter(pk=self.pk).update(path=path, level=level)
+        self.path = path
+        self.level = level
+
+        if old_path and old_path != path:
+            update_category_paths(old_path, path)
+
     def get_absolute_url(self):
         """
         Returns the absolute_url.
@@ -228,19 +266,27 @@ class Category(models.Model):
         """
 
         def _get_all_children(category, children):
-            for category in Category.objects.filter(parent=category.id):
+            for category in children_by_parent.get(category.id, []):
                 children.append(category)
                 _get_all_children(category, children)
 
-        cache_key = "%s-category-all-children-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, self.id)
+        from lfs.caching.utils import get_cache_group_id
+
+        tree_version = get_cache_group_id("category-tree")
+        cache_key = "%s-%s-category-all-children-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, tree_version, self.id)
         children = cache.get(cache_key)
         if children is not None:
             return children
 
+        # All descendants are loaded with one query via the path. The order
+        # (depth-first, by position) is established in memory.
+        children_by_parent = {}
+        if self.path:
+            for category in Category.objects.filter(path__startswith=self.path).exclude(pk=self.pk):
+                children_by_parent.setdefault(category.parent_id, []).append(category)
+
         children = []
-        for category in Category.objects.filter(parent=self.id):
-            children.append(category)
-            _get_all_children(category, children)
+        _get_all_children(self, children)
 
         cache.set(cache_key, children)
         return children
@@ -249,7 +295,10 @@ class Category(models.Model):
         """
         Returns the first level child categories.
         """
-        cache_key = "%s-category-children-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, self.id)
+        from lfs.caching.utils import get_cache_group_id
+
+        tree_version = get_cache_group_id("category-tree")
+        cache_key = "%s-%s-category-children-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, tree_version, self.id)
 
         categories = cache.get(cache_key)
         if categories is not None:
@@ -330,20 +379,30 @@ class Category(models.Model):
 
         return None
 
+    def get_path_ids(self):
+        """
+        Returns the ids of all categories from the top level category down to
+        the category itself, based on the materialized path.
+        """
+        return [int(id) for id in self.path.strip("/").split("/") if id]
+
     def get_parents(self):
         """
         Returns all parent categories.
         """
-        cache_key = "%s-category-parents-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, self.id)
+        from lfs.caching.utils import get_cache_group_id
+
+        tree_version = get_cache_group_id("category-tree")
+        cache_key = "%s-%s-category-parents-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, tree_version, self.id)
         parents = cache.get(cache_key)
         if parents is not None:
             return parents
 
-        parents = []
-        category = self.parent
-        while category is not None:
-            parents.append(category)
-            category = category.parent
+        # The ids of all parents are part of the path, hence they are loaded
+        # with one query.
+        parent_ids = self.get_path_ids()[:-1]
+        categories = Category.objects.in_bulk(parent_ids)
+        parents = [categories[id] for id in reversed(parent_ids) if id in categories]
 
         cache.set(cache_key, parents)
         return parents
@@ -352,7 +411,10 @@ class Category(models.Model):
         """
         Returns the direct products of the category.
         """
-        cache_key = "%s-category-products-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, self.id)
+        from lfs.caching.utils import get_cache_group_id
+
+        category_version = get_cache_group_id("category-%s" % self.id)
+        cache_key = "%s-%s-category-products-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, category_version, self.id)
         products = cache.get(cache_key)
         if products is not None:
             return products
@@ -369,9 +431,11 @@ class Category(models.Model):
         from lfs.caching.utils import get_cache_group_id
 
         properties_version = get_cache_group_id("global-properties-version")
-        cache_key = "%s-%s-category-property-groups-%s" % (
+        category_version = get_cache_group_id("category-%s" % self.id)
+        cache_key = "%s-%s-%s-category-property-groups-%s" % (
             settings.CACHE_MIDDLEWARE_KEY_PREFIX,
             properties_version,
+            category_version,
             self.id,
         )
         pgs = cache.get(cache_key)
@@ -387,7 +451,12 @@ class Category(models.Model):
         """
         Returns the direct products and all products of the sub categories
         """
-        cache_key = "%s-category-all-products-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, self.id)
+        from lfs.caching.utils import get_cache_group_id
+
+        # The products of sub categories are included, hence the category tree
+        # is a dependency, too.
+        group_id = "%s-%s" % (get_cache_group_id("category-tree"), get_cache_group_id("category-%s" % self.id))
+        cache_key = "%s-%s-category-all-products-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, group_id, self.id)
         products = cache.get(cache_key)
         if products is not None:
             return products
@@ -416,13 +485,16 @@ class Category(models.Model):
         """
         Returns the static block of the category.
         """
-        cache_key = "%s-static-block-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, self.id)
-        blocks = cache.get(cache_key)
-        if blocks is not None:
-            return blocks
+        from lfs.caching.utils import get_cache_group_id
+
+        category_version = get_cache_group_id("category-%s" % self.id)
+        cache_key = "%s-%s-category-static-block-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, category_version, self.id)
+        block = cache.get(cache_key)
+        if block is not None:
+            return block
 
         block = self.static_block
-        cache.set(cache_key, blocks)
+        cache.set(cache_key, block)
 
         return block
 
@@ -457,6 +529,18 @@ class Category(models.Model):
         return CONTENT_PRODUCTS
 
 
+def update_category_paths(old_path, new_path):
+    """
+    Replaces the passed old path prefix of all categories with the passed new
+    one and updates their levels accordingly, e.g. after a category has been
+    moved or deleted.
+    """
+    Category.objects.filter(path__startswith=old_path).update(
+        path=Concat(Value(new_path), Substr("path", len(old_path) + 1)),
+        level=F("level") + new_path.count("/") - old_path.count("/"),
+    )
+
+
 class Product(models.Model):
     """
     A product is sold within a shop.
@@ -811,6 +895,41 @@ class Product(models.Model):
             self.stock_amount = F("stock_amount") - amount
         self.save()
 
+    def get_reserved_amount(self):
+        """
+        Returns the amount of the product which is reserved by carts, see
+        ``lfs.cart.models.CartItem.reserved_until``.
+
+        The amount is cached until a cart item of the product is changed. As
+        reservations expire on their own, it is cached for one minute at most.
+        """
+        from lfs.caching.utils import get_cache_group_id
+        from lfs.cart.models import CartItem
+
+        stock_version = get_cache_group_id("stock-%s" % self.id)
+        cache_key = "%s-%s-product-reserved-amount-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, stock_version, self.id)
+        reserved_amount = cache.get(cache_key)
+        if reserved_amount is not None:
+            return reserved_amount
+
+        cart_items = CartItem.objects.filter(product=self, reserved_until__gt=timezone.now())
+        reserved_amount = cart_items.aggregate(amount=Sum("amount"))["amount"] or 0
+        cache.set(cache_key, reserved_amount, 60)
+        return reserved_amount
+
+    def get_available_stock_amount(self, cart=None):
+        """
+        Returns the stock amount, which is not reserved by other carts than
+        the passed one.
+        """
+        from lfs.cart.models import CartItem
+
+        reserved_amount = self.get_reserved_amount()
+        if cart is not None:
+            cart_items = CartItem.objects.filter(cart=cart, product=self, reserved_until__gt=timezone.now())
+            reserved_amount -= sum(cart_items.values_list("amount", flat=True))
+        return max(self.stock_amount - reserved_amount, 0)
+
     def get_accessories(self):
         """
         Returns the ProductAccessories relationship objects - not the accessory
@@ -862,7 +981,15 @@ class Product(models.Model):
         """
         Returns the categories of the product.
         """
-        cache_key = "%s-product-categories-%s-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, self.id, with_parents)
+        from lfs.caching.utils import get_cache_group_id
+
+        tree_version = get_cache_group_id("category-tree")
+        cache_key = "%s-%s-product-categories-%s-%s" % (
+            settings.CACHE_MIDDLEWARE_KEY_PREFIX,
+            tree_version,
+            self.id,
+            with_parents,
+        )
         categories = cache.get(cache_key)
 
         if categories is not None:
@@ -1241,33 +1368,94 @@ class Product(models.Model):
     def is_list_display_type(self):
         return self.variants_display_type == LIST
 
+    def get_variant_option_matrix(self):
+        """
+        Returns the options of the product's variants as dict:
+
+        variants_count
+            The amount of active variants.
+
+        option_counts
+            The amount of active variants per option. The keys are
+            ``(property_group_id, property_id)`` tuples, the values are dicts
+            with the option ids (as strings) as keys and the amounts as values.
+
+        variant_options
+            The options of every variant. The keys are the variant ids, the
+            values are dicts with ``(property_group_id, property_id)`` tuples
+            as keys and the option ids (as strings) as values.
+
+        The matrix is built with one query for all property values of the
+        variants and cached until the properties or variants are changed.
+        """
+        from lfs.caching.utils import get_cache_group_id
+
+        group_id = "%s-%s-%s" % (
+            get_cache_group_id("global-properties-version"),
+            get_cache_group_id("properties-%s" % self.id),
+            get_cache_group_id("variants-%s" % self.id),
+        )
+        cache_key = "%s-%s-variant-option-matrix-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, group_id, self.id)
+        matrix = cache.get(cache_key)
+        if matrix is not None:
+            return matrix
+
+        matrix = {
+            "variants_count": self.get_variants().count(),
+            "option_counts": {},
+            "variant_options": {},
+        }
+
+        property_values = ProductPropertyValue.objects.filter(
+            parent_id=self.pk, type=PROPERTY_VALUE_TYPE_VARIANT
+        ).values_list("product_id", "product__active", "property_group_id", "property_id", "value")
+        for product_id, active, property_group_id, property_id, value in property_values:
+            key = (property_group_id, property_id)
+            matrix["variant_options"].setdefault(product_id, {})[key] = value
+            if active:
+                option_counts = matrix["option_counts"].setdefault(key, {})
+                option_counts[value] = option_counts.get(value, 0) + 1
+
+        cache.set(cache_key, matrix)
+        return matrix
+
     def get_all_properties(self, variant=None):
         """Return all properties for current product
         if variant is passed then select fields for it
         """
         if not self.is_product_with_variants():
             return []
+
+        variants_properties = self.get_variants_properties()
+
+        # Load the options of all properties at once
+        property_options = {}
+        for property_option in PropertyOption.objects.filter(
+            property__in=[prop_dict["property"] for prop_dict in variants_properties]
+        ):
+            property_options.setdefault(property_option.property_id, []).append(property_option)
+
+        matrix = self.get_variant_option_matrix()
+        if variant:
+            variant_options = matrix["variant_options"].get(variant.id, {})
+        else:
+            variant_options = {}
+
         properties = []
         if self.variants_display_type == SELECT:
             # Get all properties (sorted). We need to traverse through all
             # property/options to select the options of the current variant.
-            for prop_dict in self.get_variants_properties():
+            for prop_dict in variants_properties:
                 options = []
                 selected_option_value = ""
                 prop = prop_dict["property"]
                 property_group = prop_dict["property_group"]
-                for property_option in prop.options.all():
+                key = (property_group.id if property_group else None, prop.id)
+                option_counts = matrix["option_counts"].get(key, {})
+                for property_option in property_options.get(prop.id, []):
                     # check if option exists in any variant
-                    option_used = ProductPropertyValue.objects.filter(
-                        parent_id=self.pk,
-                        product__active=True,
-                        property=prop,
-                        property_group=property_group,
-                        type=PROPERTY_VALUE_TYPE_VARIANT,
-                        value=property_option.pk,
-                    ).exists()
-                    if option_used:
-                        if variant and variant.has_option(property_group, prop, property_option):
+                    if str(property_option.pk) in option_counts:
+                        if variant and variant_options.get(key) == str(property_option.pk):
                             selected = True
                             selected_option_value = property_option.pk
                         else:
@@ -1281,14 +1469,7 @@ class Product(models.Model):
                         )
 
                 # check for variants that do not have such property and if such variants exists add empty option
-                ppv_count = ProductPropertyValue.objects.filter(
-                    parent_id=self.pk,
-                    product__active=True,
-                    type=PROPERTY_VALUE_TYPE_VARIANT,
-                    property=prop,
-                    property_group=property_group,
-                ).count()
-                if ppv_count != self.get_variants().count():
+                if sum(option_counts.values()) != matrix["variants_count"]:
                     selected = False
                     if variant and selected_option_value == "":
                         selected = True
@@ -1306,23 +1487,17 @@ class Product(models.Model):
                         }
                     )
         else:
-            for prop_dict in self.get_variants_properties():
+            for prop_dict in variants_properties:
                 selected_option_name = ""
                 selected_option_value = ""
                 prop = prop_dict["property"]
                 property_group = prop_dict["property_group"]
-                if variant:
-                    try:
-                        ppv = ProductPropertyValue.objects.get(
-                            product=variant,
-                            type=PROPERTY_VALUE_TYPE_VARIANT,
-                            property=prop,
-                            property_group=property_group,
-                        )
-                        selected_option_value = ppv.value
-                        selected_option_name = prop.options.get(pk=ppv.value).name
-                    except (ProductPropertyValue.DoesNotExist, PropertyOption.DoesNotExist):
-                        pass
+                value = variant_options.get((property_group.id if property_group else None, prop.id))
+                if value is not None:
+                    selected_option_value = value
+                    for property_option in property_options.get(prop.id, []):
+                        if str(property_option.pk) == value:
+                            selected_option_name = property_option.name
                 properties.append(
                     {
                         "id": prop.id,
@@ -1346,7 +1521,11 @@ class Product(models.Model):
 
         pid = self.get_parent().pk
         properties_version = get_cache_group_id("global-properties-version")
-        group_id = "%s-%s" % (properties_version, get_cache_group_id("properties-%s" % pid))
+        group_id = "%s-%s-%s" % (
+            properties_version,
+            get_cache_group_id("properties-%s" % pid),
+            get_cache_group_id("variants-%s" % pid),
+        )
         cache_key = "%s-variant-properties-for-parent-%s-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, group_id, self.id)
 
         properties = cache.get(cache_key)
@@ -1362,24 +1541,8 @@ class Product(models.Model):
         """
         Returns True if the variant has the given property / option combination.
         """
-        from lfs.caching.utils import get_cache_group_id
-
-        pid = self.get_parent().pk
-        properties_version = get_cache_group_id("global-properties-version")
-        group_id = "%s-%s" % (properties_version, get_cache_group_id("properties-%s" % pid))
-        options = cache.get("%s-%s-productpropertyvalue%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, group_id, self.id))
-        if options is None:
-            options = {}
-            for pvo in self.property_values.filter(property_group=property_group):
-                options[pvo.property_id] = pvo.value
-            cache.set(
-                "%s-%s-productpropertyvalue%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, group_id, self.id), options
-            )
-
-        try:
-            return options[prop.id] == str(option.id)
-        except KeyError:
-            return False
+        options = self.get_parent().get_variant_option_matrix()["variant_options"].get(self.id, {})
+        return options.get((property_group.id if property_group else None, prop.id)) == str(option.id)
 
     def get_default_properties_price(self):
         """
@@ -1417,10 +1580,12 @@ class Product(models.Model):
 
         return price
 
-    def get_price_calculator(self, request):
+    def get_price_calculator(self, request, **kwargs):
         """
         Returns the price calculator class as defined in LFS_PRICE_CALCULATORS
         in settings.
+
+        All keyword arguments are passed to the price calculator.
         """
         if self.is_variant() and (self.price_calculator is None):
             obj = self.get_parent()
@@ -1433,7 +1598,7 @@ class Product(models.Model):
             price_calculator = lfs.core.utils.get_default_shop(request).price_calculator
 
         price_calculator_class = lfs.core.utils.import_symbol(price_calculator)
-        return price_calculator_class(request, self)
+        return price_calculator_class(request, self, **kwargs)
 
     def get_price(self, request, with_properties=True, amount=1):
         """
@@ -1707,6 +1872,97 @@ class Product(models.Model):
         cache.set(cache_key, default_variant)
         return default_variant
 
+    def get_variant_price_summary(self, request):
+        """
+        Returns a summary of the prices of the product's variants as dict:
+
+        count
+            The amount of active variants.
+
+        prices
+            The min and max of the effective, standard, sale and base prices
+            of all active variants, e.g. ``prices["price_gross"]["min"]``.
+            Empty if there are no active variants.
+
+        cheapest_variant_id, cheapest_variant_by_base_price_id
+            The id of the variant with the cheapest gross price resp. gross
+            base price, see ``get_cheapest_variant``.
+
+        The prices of all variants are calculated at once, see
+        ``lfs.plugins.PriceCalculator.get_prices_for``. The summary is cached
+        as long as there are no customer taxes, which may be different per
+        request.
+        """
+        from lfs.customer_tax.utils import get_customer_taxes
+        from lfs.plugins import PriceCalculator
+
+        request_cache_key = "cached_variant_price_summary_%s" % self.id
+        if request and hasattr(request, request_cache_key):
+            return getattr(request, request_cache_key)
+
+        use_cache = not get_customer_taxes()
+        if use_cache:
+            from lfs.caching.utils import get_cache_group_id
+
+            cache_key = "%s-%s-%s-variant-price-summary-%s" % (
+                settings.CACHE_MIDDLEWARE_KEY_PREFIX,
+                get_cache_group_id("variant-prices"),
+                get_cache_group_id("variant-prices-%s" % self.id),
+                self.id,
+            )
+            summary = cache.get(cache_key)
+            if summary is not None:
+                if request:
+                    setattr(request, request_cache_key, summary)
+                return summary
+
+        variants = list(Product.objects.filter(parent=self))
+        for variant in variants:
+            variant.parent = self
+        prefetched = PriceCalculator.prefetch(variants, request)
+
+        summary = {
+            "count": 0,
+            "prices": {},
+            "cheapest_variant_id": None,
+            "cheapest_variant_by_base_price_id": None,
+        }
+
+        min_price = min_base_price = None
+        for variant in variants:
+            price_calculator = variant.get_price_calculator(request, **prefetched[variant.id])
+
+            price = price_calculator.get_price_gross()
+            if price != 0 and ((min_price is None) or (price < min_price)):
+                summary["cheapest_variant_id"] = variant.id
+                min_price = price
+
+            prices = price_calculator.get_prices(amount=sys.maxsize)
+            base_price = prices["base_price_gross"]
+            if base_price != 0 and ((min_base_price is None) or (base_price < min_base_price)):
+                summary["cheapest_variant_by_base_price_id"] = variant.id
+                min_base_price = base_price
+
+            if not variant.active:
+                continue
+
+            summary["count"] += 1
+            prices["effective_price"] = variant.effective_price
+            for name in ("base_price", "base_price_net", "base_price_gross"):
+                prices[name] = float("%.2f" % prices[name])
+
+            for name, price in prices.items():
+                info = summary["prices"].setdefault(name, {"min": price, "max": price})
+                info["min"] = min(info["min"], price)
+                info["max"] = max(info["max"], price)
+
+        if use_cache:
+            cache.set(cache_key, summary)
+        if request:
+            setattr(request, request_cache_key, summary)
+
+        return summary
+
     def get_variant_for_category(self, request):
         """
         Returns the variant which is supposed to be displayed within category
@@ -1735,114 +1991,126 @@ class Product(models.Model):
         """
         Returns the cheapest variant by gross price.
         """
-        cheapest_variant = None
-        min_price = None
-        for variant in Product.objects.filter(parent=self):
-            price = variant.get_price_gross(request)
-            if price == 0:
-                continue
-            if (min_price is None) or (price < min_price):
-                cheapest_variant = variant
-                min_price = price
+        from lfs.caching.utils import lfs_get_object
 
-        return cheapest_variant
+        variant_id = self.get_variant_price_summary(request)["cheapest_variant_id"]
+        if variant_id is None:
+            return None
+        return lfs_get_object(Product, pk=variant_id)
 
     def get_cheapest_variant_by_base_price(self, request):
         """
         Returns the cheapest variant by base gross price.
         """
-        cheapest_variant = None
-        min_price = None
-        for variant in Product.objects.filter(parent=self):
-            price = variant.get_base_price_gross(request, amount=sys.maxsize)
-            if price == 0:
-                continue
-            if (min_price is None) or (price < min_price):
-                cheapest_variant = variant
-                min_price = price
+        from lfs.caching.utils import lfs_get_object
 
-        return cheapest_variant
+        variant_id = self.get_variant_price_summary(request)["cheapest_variant_by_base_price_id"]
+        if variant_id is None:
+            return None
+        return lfs_get_object(Product, pk=variant_id)
 
-    def get_cheapest_for_sale_price_gross(self, request):
+    def _get_cheapest_price(self, request, name):
         """
-        Returns the min price and min base price as dict.
+        Returns the min price with passed name of all active variants and
+        whether the prices of the variants differ as dict, see
+        ``get_variant_price_summary``.
         """
-        product = self.get_parent()
-
-        prices = []
-        for variant in Product.objects.filter(parent=product, active=True):
-            price = variant.get_for_sale_price_gross(request, amount=sys.maxsize)
-            if price not in prices:
-                prices.append(price)
-
         try:
-            price = min(prices)
-        except ValueError:
-            price = 0
+            info = self.get_variant_price_summary(request)["prices"][name]
+        except KeyError:
+            return {
+                "price": 0,
+                "starting_from": False,
+            }
 
         return {
-            "price": price,
-            "starting_from": len(prices) > 1,
+            "price": info["min"],
+            "starting_from": info["min"] != info["max"],
         }
 
+    def get_cheapest_for_sale_price(self, request):
+        """
+        Returns the min sale price and whether the variants have different
+        sale prices as dict.
+        """
+        return self.get_parent()._get_cheapest_price(request, "for_sale_price")
+
+    def get_cheapest_for_sale_price_net(self, request):
+        """
+        Returns the min net sale price and whether the variants have different
+        net sale prices as dict.
+        """
+        return self.get_parent()._get_cheapest_price(request, "for_sale_price_net")
+
+    def get_cheapest_for_sale_price_gross(self, request):
+        """
+        Returns the min gross sale price and whether the variants have
+        different gross sale prices as dict.
+        """
+        return self.get_parent()._get_cheapest_price(request, "for_sale_price_gross")
+
+    def get_cheapest_standard_price(self, request):
+        """
+        Returns the min standard price and whether the variants have different
+        standard prices as dict.
+        """
+        return self._get_cheapest_price(request, "standard_price")
+
+    def get_cheapest_standard_price_net(self, request):
+        """
+        Returns the min net standard price and whether the variants have
+        different net standard prices as dict.
+        """
+        return self._get_cheapest_price(request, "standard_price_net")
+
     def get_cheapest_standard_price_gross(self, request):
         """
-        Returns the min price and min base price as dict.
+        Returns the min gross standard price and whether the variants have
+        different gross standard prices as dict.
         """
-        prices = []
-        for variant in Product.objects.filter(parent=self, active=True):
-            price = variant.get_standard_price_gross(request, amount=sys.maxsize)
-            if price not in prices:
-                prices.append(price)
+        return self._get_cheapest_price(request, "standard_price_gross")
 
-        try:
-            price = min(prices)
-        except ValueError:
-            price = 0
+    def get_cheapest_price(self, request):
+        """
+        Returns the min price and whether the variants have different prices
+        as dict.
+        """
+        return self._get_cheapest_price(request, "price")
 
-        return {
-            "price": price,
-            "starting_from": len(prices) > 1,
-        }
+    def get_cheapest_price_net(self, request):
+        """
+        Returns the min net price and whether the variants have different net
+        prices as dict.
+        """
+        return self._get_cheapest_price(request, "price_net")
 
     def get_cheapest_price_gross(self, request):
         """
-        Returns the min price and min base price as dict.
+        Returns the min gross price and whether the variants have different
+        gross prices as dict.
         """
-        prices = []
-        for variant in Product.objects.filter(parent=self, active=True):
-            price = variant.get_price_gross(request, amount=sys.maxsize)
-            if price not in prices:
-                prices.append(price)
+        return self._get_cheapest_price(request, "price_gross")
 
-        try:
-            price = min(prices)
-        except ValueError:
-            price = 0
+    def get_cheapest_base_price(self, request):
+        """
+        Returns the min base price and whether the variants have different
+        base prices as dict.
+        """
+        return self._get_cheapest_price(request, "base_price")
 
-        return {
-            "price": price,
-            "starting_from": len(prices) > 1,
-        }
+    def get_cheapest_base_price_net(self, request):
+        """
+        Returns the min net base price and whether the variants have different
+        net base prices as dict.
+        """
+        return self._get_cheapest_price(request, "base_price_net")
 
     def get_cheapest_base_price_gross(self, request):
         """
-        Returns the min price and min base price as dict.
+        Returns the min gross base price and whether the variants have
+        different gross base prices as dict.
         """
-        prices = []
-        for variant in Product.objects.filter(parent=self, active=True):
-            price = float("%.2f" % variant.get_base_price_gross(request, amount=sys.maxsize))
-            if price not in prices:
-                prices.append(price)
-        try:
-            price = min(prices)
-        except ValueError:
-            price = 0
-
-        return {
-            "price": price,
-            "starting_from": len(prices) > 1,
-        }
+        return self._get_cheapest_price(request, "base_price_gross")
 
     def get_static_block(self):
         """
@@ -1875,54 +2143,75 @@ class Product(models.Model):
         """
         return len(self.get_variants()) > 0
 
+    def get_variant_index(self, only_active=True):
+        """
+        Returns a dict with the signatures of the variant options as keys and
+        the ids of the variants as values, see
+        ``lfs.catalog.utils.get_variant_signature``.
+
+        The index is built with one query for all variants and cached until
+        a variant or one of its property values is changed.
+        """
+        from lfs.caching.utils import get_cache_group_id
+
+        cache_key = "%s-%s-variant-index-%s-%s" % (
+            settings.CACHE_MIDDLEWARE_KEY_PREFIX,
+            get_cache_group_id("variants-%s" % self.id),
+            self.id,
+            only_active,
+        )
+        index = cache.get(cache_key)
+        if index is not None:
+            return index
+
+        variants = self.variants.all()
+        if only_active:
+            variants = variants.filter(active=True)
+
+        options = dict((variant_id, []) for variant_id in variants.values_list("id", flat=True))
+        property_values = ProductPropertyValue.objects.filter(
+            product__parent=self, type=PROPERTY_VALUE_TYPE_VARIANT
+        ).values_list("product_id", "property_group_id", "property_id", "value")
+        for product_id, property_group_id, property_id, value in property_values:
+            if product_id in options:
+                options[product_id].append("%s|%s|%s" % (property_group_id or 0, property_id, value))
+
+        # Like the former lookup the first variant wins if several variants
+        # have the same options.
+        index = {}
+        for variant_id, variant_options in options.items():
+            index.setdefault("".join(sorted(variant_options)), variant_id)
+
+        cache.set(cache_key, index)
+        return index
+
     def get_variant(self, options, only_active=True):
         """
         Returns the variant with the given options or None.
 
         The format of the passed properties/options must be tuple as following:
 
-            [property.id|option.id]
-            [property.id|option.id]
+            [property_group.id|property.id|option.id]
+            [property_group.id|property.id|option.id]
             ...
 
         NOTE: These are strings as we get the properties/options pairs out of
         the request and it wouldn't make a lot of sense to convert them to
         objects and back to strings.
         """
-        options.sort()
-        parsed_options = []
-        # remove option with empty option_id (this means that variant doesn't have such property)
-        for option in options:
-            if option.find("|") == len(option) - 1:
-                continue
-            parsed_options.append(option)
-        options = "".join(parsed_options)
+        from lfs.caching.utils import lfs_get_object
 
-        variants = self.variants.all()
-        if only_active:
-            variants = variants.filter(active=True)
-
-        for variant in variants:
-            temp = variant.property_values.filter(type=PROPERTY_VALUE_TYPE_VARIANT)
-            temp = [
-                "%s|%s|%s" % (x.property_group_id if x.property_group_id else 0, x.property_id, x.value) for x in temp
-            ]
-            temp.sort()
-            temp = "".join(temp)
-
-            if temp == options:
-                return variant
-
-        return None
+        signature = lfs.catalog.utils.get_variant_signature(options)
+        variant_id = self.get_variant_index(only_active).get(signature)
+        if variant_id is None:
+            return None
+        return lfs_get_object(Product, pk=variant_id)
 
     def has_variant(self, options, only_active=True):
         """
         Returns true if a variant with given options already exists.
         """
-        if self.get_variant(options, only_active=only_active) is None:
-            return False
-        else:
-            return True
+        return lfs.catalog.utils.get_variant_signature(options) in self.get_variant_index(only_active)
 
     # Dimensions
     def get_weight(self):
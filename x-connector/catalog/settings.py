@@ -156,6 +156,14 @@ THUMBNAIL_SIZES = getattr(
 )
 DELETE_FILES = getattr(settings, "LFS_DELETE_FILES", True)
 DELETE_IMAGES = getattr(settings, "LFS_DELETE_IMAGES", True)
+CATEGORY_PRODUCTS_CACHE_SIZE = getattr(settings, "LFS_CATEGORY_PRODUCTS_CACHE_SIZE", 100)
+MANUFACTURER_PRODUCTS_CACHE_SIZE = getattr(settings, "LFS_MANUFACTURER_PRODUCTS_CACHE_SIZE", 100)
+# Amount of product navigations whose positions are kept in memory per process.
+PRODUCT_NAVIGATION_POSITIONS_SIZE = getattr(settings, "LFS_PRODUCT_NAVIGATION_POSITIONS_SIZE", 100)
+# Whether the hits and misses of the product caches above are counted.
+PRODUCTS_CACHE_STATS = getattr(settings, "LFS_PRODUCTS_CACHE_STATS", False)
+# Minutes the amount of a product within a cart is reserved for the cart.
+STOCK_RESERVATION_TIME = getattr(settings, "LFS_STOCK_RESERVATION_TIME", 15)
 if getattr(settings, "SOLR_ENABLED", False):
     SORTING_MAP = (
         {"default": "effective_price", "ftx": "price asc", "title": _("Price ascending")},
@@ -8,7 +8,11 @@ from django.contrib.auth.models import AnonymousUser
 from django.urls import reverse
 from django.test import TestCase
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.files.base import ContentFile
+from django.db import connection
+from django.template import Context, Template
+from django.test.utils import CaptureQueriesContext
 
 from django.utils.encoding import force_str
 import lfs.catalog.utils
@@ -33,6 +37,7 @@ from lfs.catalog.settings import QUANTITY_FIELD_DECIMAL_2
 from lfs.catalog.settings import STANDARD_PRODUCT
 from lfs.catalog.settings import THUMBNAIL_SIZES
 from lfs.catalog.settings import LIST
+from lfs.catalog.settings import SELECT
 from lfs.catalog.models import Category
 from lfs.catalog.models import DeliveryTime
 from lfs.catalog.models import File
@@ -691,6 +696,46 @@ class PropertiesTestCase(TestCase):
         products = lfs.catalog.utils.get_filtered_products_for_category(self.c1, filters, None, sorting)
         self.assertEqual(len(products), 0)
 
+    def test_facet_index(self):
+        """Tests that the facet index returns the same products as the filter query."""
+        facet_index = lfs.catalog.utils.FacetIndex(self.c1)
+        self.assertEqual(facet_index.product_ids, set([self.p1.id, self.p2.id, self.p3.id]))
+
+        ids = facet_index.get_option_ids(self.pg.pk, self.pp1.pk, "S")
+        self.assertEqual(facet_index.get_parent_ids(ids), set([self.p1.id]))
+
+        key1 = "{0}_{1}".format(self.pg.pk, self.pp1.pk)
+        key2 = "{0}_{1}".format(self.pg.pk, self.pp2.pk)
+        key3 = "{0}_{1}".format(self.pg.pk, self.pp3.pk)
+        select_filter = {
+            key1: {"value": "S|M", "property_id": self.pp1.pk, "property_group_id": self.pg.pk},
+            key2: {"value": "2", "property_id": self.pp2.pk, "property_group_id": self.pg.pk},
+        }
+        number_filter = {key3: {"value": [15, 25], "property_id": self.pp3.pk, "property_group_id": self.pg.pk}}
+
+        for filters in (
+            {"select-filter": select_filter},
+            {"number-filter": number_filter},
+            {"select-filter": select_filter, "number-filter": number_filter},
+        ):
+            ids = facet_index.get_matching_ids(filters.get("select-filter", {}), filters.get("number-filter", {}))
+            products = lfs.catalog.utils.get_filtered_products_for_category(self.c1, filters, None, None)
+            self.assertEqual(facet_index.get_parent_ids(ids), set([p.id for p in products]))
+
+        self.assertEqual(facet_index.get_price_filtered_ids(None), None)
+        self.assertEqual(facet_index.get_price_filtered_ids({"min": 2, "max": 5}), set([self.p1.id, self.p2.id]))
+
+    def test_facet_index_cache(self):
+        """Tests that the cached facet index is renewed after a filter value has been changed."""
+        facet_index = lfs.catalog.utils.get_facet_index(self.c1)
+        self.assertEqual(facet_index.get_option_ids(self.pg.pk, self.pp1.pk, "L"), set())
+
+        self.ppv11.value = "L"
+        self.ppv11.save()
+
+        facet_index = lfs.catalog.utils.get_facet_index(self.c1)
+        self.assertEqual(facet_index.get_option_ids(self.pg.pk, self.pp1.pk, "L"), set([self.p1.id]))
+
 
 class PropertiesTestCaseWithoutProperties(TestCase):
     """Test the filter methods without added properties."""
@@ -864,6 +909,38 @@ class CategoryTestCase(TestCase):
         self.assertEqual(len(product_ids), 2)
         self.assertEqual(product_ids, [self.p2.id, self.p3.id])
 
+    def test_get_product_navigation(self):
+        """Tests the cached product navigation of a category."""
+        slugs, positions = lfs.catalog.utils.get_product_navigation_index("price", self.c1)
+        self.assertEqual(slugs, ("product-3", "product-2", "product-1"))
+        self.assertEqual(positions["product-1"], 2)
+
+        # The positions are reused as long as the cached slugs are the same
+        self.assertTrue(lfs.catalog.utils.get_product_navigation_index("price", self.c1)[1] is positions)
+        cache.clear()
+        self.assertFalse(lfs.catalog.utils.get_product_navigation_index("price", self.c1)[1] is positions)
+
+        result = lfs.catalog.utils.get_product_navigation("product-2", "price", self.c1)
+        self.assertEqual(
+            result, {"display": True, "previous": "product-3", "next": "product-1", "current": 2, "total": 3}
+        )
+
+        # Non active products are only taken into account for superusers
+        self.p3.active = False
+        self.p3.save()
+
+        result = lfs.catalog.utils.get_product_navigation("product-2", "price", self.c1)
+        self.assertEqual(result["previous"], None)
+        self.assertEqual(result["total"], 2)
+        self.assertEqual(lfs.catalog.utils.get_product_navigation("product-3", "price", self.c1), None)
+
+        result = lfs.catalog.utils.get_product_navigation("product-2", "price", self.c1, with_inactive=True)
+        self.assertEqual(result["previous"], "product-3")
+
+        # Sub categories have their own navigation
+        result = lfs.catalog.utils.get_product_navigation("product-2", "-price", self.c111)
+        self.assertEqual(result, {"display": True, "previous": "product-1", "next": None, "current": 2, "total": 2})
+
     def test_get_all_children(self):
         """ """
         children_names = [c.name for c in self.c1.get_all_children()]
@@ -1012,6 +1089,33 @@ class CategoryTestCase(TestCase):
         parent_names = [c.name for c in self.c111.get_parents()]
         self.assertEqual(parent_names, ["Category 11", "Category 1"])
 
+    def test_path(self):
+        """Tests the materialized path of categories."""
+        self.assertEqual(self.c111.path, "/%s/%s/%s/" % (self.c1.id, self.c11.id, self.c111.id))
+        self.assertEqual(self.c111.level, 3)
+
+        # Moving a category updates the paths and levels of its children
+        self.c11.parent = None
+        self.c11.save()
+
+        c111 = Category.objects.get(pk=self.c111.id)
+        self.assertEqual(c111.path, "/%s/%s/" % (self.c11.id, self.c111.id))
+        self.assertEqual(c111.level, 2)
+        self.assertEqual([c.name for c in c111.get_parents()], ["Category 11"])
+        self.assertEqual([c.name for c in self.c1.get_all_children()], ["Category 12"])
+
+        # The children of a deleted category become top level categories
+        self.c11.delete()
+        c111 = Category.objects.get(pk=self.c111.id)
+        self.assertEqual(c111.path, "/%s/" % self.c111.id)
+        self.assertEqual(c111.level, 1)
+
+        # Broken paths are rebuilt
+        Category.objects.update(path="", level=1)
+        self.assertEqual(lfs.catalog.utils.rebuild_category_paths(), 3)
+        self.assertEqual(Category.objects.get(pk=self.c12.id).path, "/%s/%s/" % (self.c1.id, self.c12.id))
+        self.assertEqual(Category.objects.get(pk=self.c12.id).level, 2)
+
     def test_get_static_block(self):
         """ """
         result = self.c1.get_static_block()
@@ -1138,6 +1242,53 @@ class ViewsTestCase(TestCase):
 
         locale.setlocale(locale.LC_ALL, "en_US.UTF-8")
 
+    def test_category_products_queries(self):
+        """The prices of a category page are calculated at once and are not
+        loaded again by the price tags of the template.
+        """
+        from lfs.catalog.views import category_products
+
+        products = []
+        for i in range(3):
+            products.append(
+                Product.objects.create(name="Price %s" % i, slug="price-%s" % i, price=i + 1.0, active=True)
+            )
+        self.c1.products.set(products)
+        cache.clear()
+
+        request = RequestFactory().get("/")
+        request.session = SessionStore()
+        request.user = AnonymousUser()
+
+        with CaptureQueriesContext(connection) as queries:
+            category_products(request, self.c1.slug)
+
+        for product in products:
+            product_queries = [
+                query["sql"]
+                for query in queries.captured_queries
+                if '"catalog_product"."id" = %s ' % product.id in query["sql"] and "LIMIT 21" in query["sql"]
+            ]
+            self.assertEqual(product_queries, [])
+
+    def test_category_product_prices_tag(self):
+        """The price tags take the prefetched prices of the row."""
+        from lfs.plugins import PriceCalculator
+
+        product = Product.objects.create(name="Price", slug="price", price=10.0, active=True)
+        request = RequestFactory().get("/")
+        request.session = SessionStore()
+        request.user = AnonymousUser()
+
+        prices = PriceCalculator.get_prices_for([product], request)
+        row = {"obj": product, "prices": prices[product.id]}
+        context = Context({"request": request, "product": row, "category_products_by_id": {product.id: row}})
+        template = Template("{% load lfs_tags %}{% category_product_prices product.obj.id %}")
+
+        with self.assertNumQueries(0):
+            template.render(context)
+        self.assertEqual(context["price"], prices[product.id]["price"])
+
     def test_file(self):
         request = RequestFactory().get("/")
 
@@ -2288,6 +2439,37 @@ class ProductTestCase(TestCase):
         self.failIf(str(ppv_color_green.value) not in options)
         self.failIf(str(ppv_size_l.value) not in options)
 
+    def test_get_all_properties(self):
+        """Tests the properties of the select-type variant display, which are
+        built from the variant option matrix.
+        """
+        self.p1.variants_display_type = SELECT
+        self.p1.save()
+
+        properties = self.p1.get_all_properties(variant=self.v1)
+        self.assertEqual([p["name"] for p in properties], ["Color", "Size"])
+
+        color_options = dict((o["name"], o["selected"]) for o in properties[0]["options"])
+        self.assertEqual(color_options, {"Red": True, "Green": False})
+
+        size_options = dict((o["name"], o["selected"]) for o in properties[1]["options"])
+        self.assertEqual(size_options, {"L": False, "M": True})
+
+        # Options of inactive variants are not offered
+        self.v2.active = False
+        self.v2.save()
+
+        properties = self.p1.get_all_properties(variant=self.v1)
+        self.assertEqual([o["name"] for o in properties[0]["options"]], ["Red"])
+        self.assertEqual([o["name"] for o in properties[1]["options"]], ["M"])
+
+        # Without any active variant with a size there is nothing to select
+        self.ppv_size_m.delete()
+
+        properties = self.p1.get_all_properties(variant=self.v1)
+        self.assertEqual([o["name"] for o in properties[0]["options"]], ["Red"])
+        self.assertEqual(len(properties), 1)
+
     def test_has_option(self):
         """ """
         # Variant 1 has color/red and size/m
@@ -2670,6 +2852,45 @@ class ProductTestCase(TestCase):
         self.failIf(self.v1 not in variants)
         self.failIf(self.v2 not in variants)
 
+    def test_get_cheapest_prices(self):
+        """Tests the cheapest prices and variants, which are taken from the
+        variant price summary.
+        """
+        self.v1.active_price = True
+        self.v1.save()
+
+        # v2 inherits the price of the parent product
+        self.assertEqual(self.p1.get_cheapest_price_gross(self.request), {"price": 1.0, "starting_from": True})
+        self.assertEqual(self.p1.get_cheapest_variant(self.request), self.v2)
+        self.assertEqual(self.p1.get_variant_price_summary(self.request)["count"], 2)
+
+        self.v2.active_price = True
+        self.v2.price = 3.0
+        self.v2.save()
+
+        # The summary is invalidated when a variant is saved
+        request = RequestFactory().get("/")
+        request.session = SessionStore()
+        request.user = AnonymousUser()
+
+        self.assertEqual(self.p1.get_cheapest_price_gross(request), {"price": 2.0, "starting_from": True})
+        self.assertEqual("%.2f" % self.p1.get_cheapest_price_net(request)["price"], "1.68")
+        self.assertEqual(self.p1.get_cheapest_variant(request), self.v1)
+
+        summary = self.p1.get_variant_price_summary(request)
+        self.assertEqual(summary["prices"]["price_gross"], {"min": 2.0, "max": 3.0})
+
+        # Inactive variants are not taken into account
+        self.v2.active = False
+        self.v2.save()
+
+        request = RequestFactory().get("/")
+        request.session = SessionStore()
+        request.user = AnonymousUser()
+
+        self.assertEqual(self.p1.get_cheapest_price_gross(request), {"price": 2.0, "starting_from": False})
+        self.assertEqual(self.p1.get_variant_price_summary(request)["count"], 1)
+
     def test_get_variant_has_variant(self):
         """Tests the order of passed options doesn't matter and the correct
         bevaviour if no variant exists for given options.
@@ -2734,6 +2955,34 @@ class ProductTestCase(TestCase):
         variant = self.p1.get_variant(options)
         self.failIf(variant is not None)
 
+    def test_get_variant_index(self):
+        """Tests that the variant index is kept current when variants or their
+        property values are changed.
+        """
+        options = [
+            "0|%s|%s" % (self.size.id, self.l.id),
+            "0|%s|%s" % (self.color.id, self.red.id),
+        ]
+        self.failIf(self.p1.has_variant(options))
+
+        # Change v1 from m, red to l, red
+        self.ppv_size_m.value = self.l.id
+        self.ppv_size_m.save()
+
+        self.failUnless(self.p1.has_variant(options))
+        self.assertEqual(self.p1.get_variant(options).id, self.v1.id)
+
+        # Inactive variants are only found on request
+        self.v1.active = False
+        self.v1.save()
+
+        self.failIf(self.p1.has_variant(options))
+        self.failUnless(self.p1.has_variant(options, only_active=False))
+
+        # Deleted variants are removed from the index
+        self.v1.delete()
+        self.failIf(self.p1.has_variant(options, only_active=False))
+
     def test_get_default_variant(self):
         """Tests the default default_variant (which is the first one) and
         explicitly assigned variants
@@ -2872,6 +3121,32 @@ class ProductTestCase(TestCase):
         self.assertEqual(variant.price, 10.00)
         self.assertEqual(variant.parent, product)
 
+    def test_create_variants(self):
+        """Tests the bulk creation of variants for all option combinations."""
+        combinations = [
+            ["0|%s|%s" % (self.color.id, color.id), "0|%s|%s" % (self.size.id, size.id)]
+            for color in (self.red, self.green)
+            for size in (self.l, self.m)
+        ]
+
+        # v1 (red, m) and v2 (green, l) exist already
+        variants = lfs.catalog.utils.create_variants(self.p1, combinations, name="Variant", price=5.0)
+        self.assertEqual(len(variants), 2)
+        self.assertEqual([v.slug for v in variants], ["product-1-red-l", "product-1-green-m"])
+        self.assertEqual(self.p1.variants.count(), 4)
+
+        variant = Product.objects.get(slug="product-1-red-l")
+        self.assertEqual(variant.parent, self.p1)
+        self.assertEqual(variant.price, 5.0)
+        self.assertEqual(variant.effective_price, 1.0)
+        self.assertEqual(variant.sku, "SKU P1-1")
+        self.assertEqual(variant.property_values.filter(type=PROPERTY_VALUE_TYPE_VARIANT).count(), 2)
+        self.failUnless(self.p1.has_variant(combinations[0], only_active=False))
+
+        # Nothing is created twice
+        self.assertEqual(lfs.catalog.utils.create_variants(self.p1, combinations), [])
+        self.assertEqual(self.p1.variants.count(), 4)
+
     def setupAttachments(self):
         # Assign attachments to products
         self.attachment_P1_1_data = dict(title="Attachment P1-1", product=self.p1, position=10)
@@ -3059,6 +3334,34 @@ class ProductAccessoriesTestCase(TestCase):
         self.assertEqual(pa2.get_price(self.request), 6.0)
 
 
+class BulkSaveProductsTestCase(TestCase):
+    """Tests lfs.catalog.utils.bulk_save_products."""
+
+    fixtures = ["lfs_shop.xml"]
+
+    def test_bulk_save_products(self):
+        p1 = Product.objects.create(name="Product 1", slug="p1", price=1.0, active=True)
+        parent = Product.objects.create(name="Parent", slug="parent", sub_type=PRODUCT_WITH_VARIANTS, active=True)
+        variant = Product.objects.create(
+            name="Variant", slug="variant", sub_type=VARIANT, parent=parent, price=2.0, active=True
+        )
+        parent.default_variant = variant
+        parent.save()
+
+        p1.price = 10.0
+        variant.price = 20.0
+        lfs.catalog.utils.bulk_save_products([p1, variant], ["price"])
+
+        self.assertEqual(Product.objects.get(pk=p1.pk).effective_price, 10.0)
+        self.assertEqual(Product.objects.get(pk=variant.pk).effective_price, 20.0)
+
+        # The parent has the same effective price as if it had been saved
+        parent = Product.objects.get(pk=parent.pk)
+        effective_price = parent.effective_price
+        parent.save()
+        self.assertEqual(parent.effective_price, effective_price)
+
+
 class MiscTestCase(TestCase):
     """ """
 
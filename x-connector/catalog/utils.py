@@ -1,15 +1,33 @@
+import ast
+import hashlib
+import json
 import locale
 import logging
+import math
+import os
+import uuid
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db import connection
-from django.core.exceptions import FieldError
+from django.db import transaction
+from django.core.exceptions import FieldDoesNotExist, FieldError, ValidationError
 from django.db.models import Q, Count, Min, Max
+from django.db.models import Case, F, FloatField, Value, When
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 
 import lfs.catalog.models
+import lfs.core.utils
+from lfs.catalog.settings import CATEGORY_PRODUCTS_CACHE_SIZE
 from lfs.catalog.settings import CONFIGURABLE_PRODUCT
+from lfs.catalog.settings import MANUFACTURER_PRODUCTS_CACHE_SIZE
+from lfs.catalog.settings import PRODUCT_NAVIGATION_POSITIONS_SIZE
 from lfs.catalog.settings import PRODUCT_WITH_VARIANTS
+from lfs.catalog.settings import PRODUCTS_CACHE_STATS
 from lfs.catalog.settings import PROPERTY_VALUE_TYPE_FILTER
+from lfs.catalog.settings import PROPERTY_VALUE_TYPE_VARIANT
 from lfs.catalog.settings import STANDARD_PRODUCT
+from lfs.catalog.settings import VARIANT
 from lfs.manufacturer.models import Manufacturer
 
 logger = logging.getLogger(__name__)
@@ -244,36 +262,39 @@ def get_product_filters(category, product_filter, price_filter, manufacturer_fil
                 }
             )
 
-    # Creates the filters to count the existing products per property option,
-    # which is used within the filter portlet
-    new_product_filter = {}
-    if product_filter.get("number-filter"):
-        new_product_filter["number-filter"] = product_filter["number-filter"]
+    # Counts the existing products per property option, which is used within
+    # the filter portlet. The counts are calculated via the facet index of the
+    # category, hence there is no query per option.
+    facet_index = get_facet_index(category)
+    number_filter = product_filter.get("number-filter", {})
+    select_filter = product_filter.get("select-filter", {})
+    price_filtered_ids = facet_index.get_price_filtered_ids(price_filter)
 
     for property_group_id, property_group_dict in select_fields_dict.items():
         properties = property_group_dict["properties"]
 
         for property_id, options in properties.items():
             key = "{0}_{1}".format(property_group_id, property_id)
+
+            # All checked options of all other properties are also used
+            other_filter = dict((f0, f1) for (f0, f1) in select_filter.items() if f0 != key)
+            other_ids = facet_index.get_matching_ids(other_filter, number_filter)
+
             for option in options:
-                # The option in question is used at any rate
-                new_product_filter["select-filter"] = {
-                    key: {"property_id": property_id, "property_group_id": property_group_id, "value": option["value"]}
-                }
+                # Tests if the option is checked
+                if key in select_filter and option["value"] in select_filter[key]["value"].split("|"):
+                    option["checked"] = True
 
-                # All checked options of all other properties is also used
-                for f0, f1 in product_filter.get("select-filter", {}).items():
-                    print(f0, f1, key)
-                    if f0 != key:
-                        new_product_filter["select-filter"][f0] = f1
+                # The option in question is used at any rate
+                option_ids = facet_index.get_option_ids(property_group_id, property_id, option["value"])
+                if other_ids is not None:
+                    option_ids = option_ids & other_ids
 
-                    # Tests if the option is checked
-                    if (f0 == key) and (option["value"] in f1["value"].split("|")):
-                        option["checked"] = True
+                product_ids = facet_index.get_parent_ids(option_ids)
+                if price_filtered_ids is not None:
+                    product_ids &= price_filtered_ids
 
-                option["quantity"] = len(
-                    get_filtered_products_for_category(category, new_product_filter, price_filter, None)
-                )
+                option["quantity"] = len(product_ids)
 
     # Transform the property groups and properties inside into lists to be able to iterate over these in template
     property_groups_list = select_fields_dict.values()
@@ -340,15 +361,34 @@ def get_filtered_products_for_category(category, filters, price_filter, sorting,
     """Returns products for given categories and current filters sorted by
     current sorting.
     """
-    from lfs.catalog.models import Product, ProductPropertyValue
-
     if filters:
         if category.show_all_products:
             products = category.get_all_products()
         else:
             products = category.get_products()
+    else:
+        categories = [category]
+        if category.show_all_products:
+            categories.extend(category.get_all_children())
+        products = lfs.catalog.models.Product.objects.filter(
+            active=True,
+            categories__in=categories,
+            sub_type__in=[STANDARD_PRODUCT, PRODUCT_WITH_VARIANTS, CONFIGURABLE_PRODUCT],
+        ).distinct()
+
+    return get_filtered_products(products, filters, price_filter, sorting, manufacturers_filter)
 
-        # All variants of category products
+
+def get_filtered_products(products, filters, price_filter, sorting, manufacturers_filter=None):
+    """Returns the passed products filtered by the passed property filters,
+    price filter and manufacturers and sorted by passed sorting. Products with
+    variants match if one of their variants matches. This is used by the
+    listings of categories and manufacturers.
+    """
+    from lfs.catalog.models import Product, ProductPropertyValue
+
+    if filters:
+        # All variants of the products
         all_variants = Product.objects.filter(parent__in=products)
 
         # Generate filter
@@ -436,15 +476,6 @@ def get_filtered_products_for_category(category, filters, price_filter, sorting,
         products = Product.objects.filter(
             Q(pk__in=matching_product_ids) | Q(pk__in=variant_products.values_list("parent_id", flat=True))
         ).distinct()
-    else:
-        categories = [category]
-        if category.show_all_products:
-            categories.extend(category.get_all_children())
-        products = lfs.catalog.models.Product.objects.filter(
-            active=True,
-            categories__in=categories,
-            sub_type__in=[STANDARD_PRODUCT, PRODUCT_WITH_VARIANTS, CONFIGURABLE_PRODUCT],
-        ).distinct()
 
     # TODO: It might be more effective to move price filters directly into if/else clause above
     if price_filter:
@@ -488,6 +519,451 @@ def get_filtered_products_for_category(category, filters, price_filter, sorting,
     return products
 
 
+def decrease_stock_amounts(amounts):
+    """Decreases the stock amounts of the passed products with one query.
+    amounts is a list of (product, amount) tuples. Products which don't
+    manage their stock amount are left alone.
+    """
+    from lfs.core.signals import product_stock_changed
+
+    products = {}
+    totals = {}
+    for product, amount in amounts:
+        if product.manage_stock_amount:
+            products[product.id] = product
+            totals[product.id] = totals.get(product.id, 0) + amount
+
+    if not totals:
+        return
+
+    lfs.catalog.models.Product.objects.filter(pk__in=totals.keys()).update(
+        stock_amount=F("stock_amount")
+        - Case(*[When(pk=pk, then=Value(amount)) for pk, amount in totals.items()], output_field=FloatField())
+    )
+
+    # The caches are invalidated as soon as the new stock amounts are
+    # visible, otherwise concurrent requests could cache the old ones again.
+    def send_product_stock_changed():
+        for product in products.values():
+            product_stock_changed.send(product)
+
+    transaction.on_commit(send_product_stock_changed)
+
+
+def bulk_save_products(products, fields, request=None, batch_size=500):
+    """Saves the passed fields of the passed products with bulk updates within
+    one transaction instead of saving them one by one, e.g. for the products
+    grid of the management interface.
+
+    The effective prices of the products and of the parents of passed
+    variants are calculated in bulk, see lfs.plugins.PriceCalculator.prefetch.
+    Instead of one post_save signal per product one products_changed signal is
+    sent for all of them.
+    """
+    from lfs.core.signals import products_changed
+    from lfs.plugins import PriceCalculator
+
+    Product = lfs.catalog.models.Product
+    products = list(products)
+    fields = list(fields) + ["effective_price"]
+
+    def set_effective_prices(products):
+        prefetched = PriceCalculator.prefetch(products, request)
+        for product in products:
+            price_calculator = product.get_price_calculator(request, **prefetched[product.id])
+            product.effective_price = price_calculator.get_effective_price()
+
+    with transaction.atomic():
+        # Products with variants take the price of their default variant,
+        # hence they are calculated after the variants have been written.
+        others = [product for product in products if not product.is_product_with_variants()]
+        set_effective_prices(others)
+        Product.objects.bulk_update(others, fields, batch_size=batch_size)
+
+        with_variants = [product for product in products if product.is_product_with_variants()]
+        parent_ids = set([product.parent_id for product in others if product.is_variant() and product.parent_id])
+        parent_ids -= set([product.id for product in with_variants])
+        parents = list(Product.objects.filter(pk__in=parent_ids))
+
+        set_effective_prices(with_variants + parents)
+        Product.objects.bulk_update(with_variants, fields, batch_size=batch_size)
+        Product.objects.bulk_update(parents, ["effective_price"], batch_size=batch_size)
+
+    products_changed.send(Product, products=products + parents)
+
+
+def rebuild_category_paths():
+    """Rebuilds the paths and levels of all categories based on their parents,
+    e.g. for existing shops or after categories have been imported. Returns
+    the amount of updated categories.
+    """
+    categories = list(lfs.catalog.models.Category.objects.only("id", "parent_id", "path", "level"))
+    categories_by_id = dict((category.id, category) for category in categories)
+
+    paths = {}
+    for category in categories:
+        # Walk up until a category with a known path or the top level
+        chain = []
+        current = category
+        while current is not None and current.id not in paths and current not in chain:
+            chain.append(current)
+            current = categories_by_id.get(current.parent_id)
+
+        if current is None or current in chain:
+            path = "/"
+        else:
+            path = paths[current.id]
+
+        for current in reversed(chain):
+            path = paths[current.id] = "%s%s/" % (path, current.id)
+
+    changed = []
+    for category in categories:
+        path = paths[category.id]
+        level = path.count("/") - 1
+        if category.path != path or category.level != level:
+            category.path = path
+            category.level = level
+            changed.append(category)
+
+    if changed:
+        from lfs.caching.utils import invalidate_cache_group_id
+
+        lfs.catalog.models.Category.objects.bulk_update(changed, ["path", "level"], batch_size=500)
+        invalidate_cache_group_id("category-tree")
+
+    return len(changed)
+
+
+def get_facet_index(category):
+    """Returns the (cached) facet index of the given category. See FacetIndex
+    for more.
+    """
+    from lfs.caching.utils import get_cache_group_id
+
+    group_id = "%s-%s-%s" % (
+        get_cache_group_id("facet-index"),
+        get_cache_group_id("category-tree"),
+        get_cache_group_id("category-%s" % category.id),
+    )
+    cache_key = "%s-%s-facet-index-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, group_id, category.id)
+    facet_index = cache.get(cache_key)
+    if facet_index is not None:
+        return facet_index
+
+    facet_index = FacetIndex(category)
+    cache.set(cache_key, facet_index)
+    return facet_index
+
+
+def get_category_products_cache(category):
+    """Returns the cache for the rendered product pages of the given category,
+    which keeps one entry per page number, sorting and filters. At most
+    CATEGORY_PRODUCTS_CACHE_SIZE entries are kept per category. The entries
+    are invalidated via the "category-tree" and "category-<id>" cache groups.
+    """
+    from lfs.caching.utils import BoundedCache
+    from lfs.caching.utils import get_cache_group_id
+
+    namespace = "%s-%s-%s" % (
+        category.id,
+        get_cache_group_id("category-tree"),
+        get_cache_group_id("category-%s" % category.id),
+    )
+    return BoundedCache("category-products", namespace, CATEGORY_PRODUCTS_CACHE_SIZE, PRODUCTS_CACHE_STATS)
+
+
+def get_category_products_cache_stats():
+    """Returns the hits and misses of the category products caches, see
+    get_category_products_cache. They are only counted if
+    LFS_PRODUCTS_CACHE_STATS is True.
+    """
+    from lfs.caching.utils import BoundedCache
+
+    return BoundedCache("category-products", None).get_stats()
+
+
+def get_manufacturer_products_cache(manufacturer):
+    """Returns the cache for the rendered product pages of the given
+    manufacturer, which keeps one entry per page number, sorting and filters.
+    At most MANUFACTURER_PRODUCTS_CACHE_SIZE entries are kept per
+    manufacturer. The entries are invalidated via the "manufacturer-<id>"
+    cache group.
+    """
+    from lfs.caching.utils import BoundedCache
+    from lfs.caching.utils import get_cache_group_id
+
+    namespace = "%s-%s" % (manufacturer.id, get_cache_group_id("manufacturer-%s" % manufacturer.id))
+    return BoundedCache("manufacturer-products", namespace, MANUFACTURER_PRODUCTS_CACHE_SIZE, PRODUCTS_CACHE_STATS)
+
+
+class ProductPage(object):
+    """
+    A page of a product listing, see get_product_page. Like Django's Page it
+    can be iterated and provides the parts which are used by
+    lfs.core.utils.lfs_pagination.
+
+    **Attributes:**
+
+    object_list
+        The products of the page.
+
+    number
+        The number of the page, starting with 1.
+
+    count
+        The amount of all products of the listing.
+
+    num_pages
+        The amount of pages of the listing.
+
+    next_cursor, previous_cursor
+        The cursors to load the next and the previous page with a keyset
+        query. None if there is no such page or the listing is not sorted by
+        a field which can be used for it.
+    """
+
+    def __init__(self, object_list, number, count, amount, has_next, has_previous):
+        self.object_list = object_list
+        self.number = number
+        self.count = count
+        self.num_pages = max(1, int(math.ceil(count / float(amount))))
+        self.paginator = self
+        self.next_cursor = None
+        self.previous_cursor = None
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+
+def _get_keyset_field(products, sorting):
+    """Returns the field of passed sorting, if it can be used for keyset
+    pagination, otherwise None.
+    """
+    if not sorting:
+        return None
+    try:
+        field = products.model._meta.get_field(sorting.lstrip("-"))
+    except FieldDoesNotExist:
+        return None
+    if not field.concrete or field.is_relation or field.null:
+        return None
+    return field
+
+
+def encode_cursor(product, field):
+    """Returns the cursor of passed product, i.e. its value of the passed sort
+    field and its id.
+    """
+    return urlsafe_base64_encode(json.dumps([field.value_to_string(product), product.pk]).encode("utf-8"))
+
+
+def decode_cursor(cursor, field):
+    """Returns the value of passed sort field and the id of the passed cursor
+    or None if the cursor is invalid.
+    """
+    try:
+        value, pk = json.loads(urlsafe_base64_decode(cursor).decode("utf-8"))
+        return field.to_python(value), int(pk)
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+def get_product_page(products, sorting, amount, count, start=1, after=None, before=None):
+    """Returns the ProductPage with number start of passed products.
+
+    The products are ordered by sorting and their id. If the cursor of the
+    previous page (after) or of the next page (before) is passed, the page is
+    loaded with one keyset query, which seeks to the cursor via the index of
+    the sort field instead of skipping all products of the previous pages.
+    Otherwise the page is loaded with an offset. The total amount of products
+    (count) has to be passed, as it is supposed to be cached by the caller.
+    """
+    try:
+        start = int(start)
+    except (ValueError, TypeError):
+        start = 1
+    start = min(max(start, 1), max(1, int(math.ceil(count / float(amount)))))
+
+    field = _get_keyset_field(products, sorting)
+    if field is None:
+        objects = list(products[(start - 1) * amount : start * amount + 1])
+        return ProductPage(objects[:amount], start, count, amount, len(objects) > amount, start > 1)
+
+    name = field.name
+    descending = sorting.startswith("-")
+    if descending:
+        ordering, reverse_ordering = ("-%s" % name, "-pk"), (name, "pk")
+    else:
+        ordering, reverse_ordering = (name, "pk"), ("-%s" % name, "-pk")
+
+    objects = None
+    if after:
+        cursor = decode_cursor(after, field)
+        if cursor is not None:
+            lookup = "lt" if descending else "gt"
+            query = Q(**{"%s__%s" % (name, lookup): cursor[0]}) | Q(**{name: cursor[0], "pk__%s" % lookup: cursor[1]})
+            objects = list(products.filter(query).order_by(*ordering)[: amount + 1])
+            has_next, has_previous = len(objects) > amount, True
+            objects = objects[:amount]
+    elif before:
+        cursor = decode_cursor(before, field)
+        if cursor is not None:
+            lookup = "gt" if descending else "lt"
+            query = Q(**{"%s__%s" % (name, lookup): cursor[0]}) | Q(**{name: cursor[0], "pk__%s" % lookup: cursor[1]})
+            objects = list(products.filter(query).order_by(*reverse_ordering)[: amount + 1])
+            has_next, has_previous = True, len(objects) > amount
+            objects = objects[:amount][::-1]
+
+    # Invalid or outdated cursors fall back to the page number
+    if not objects:
+        objects = list(products.order_by(*ordering)[(start - 1) * amount : start * amount + 1])
+        has_next, has_previous = len(objects) > amount, start > 1
+        objects = objects[:amount]
+
+    page = ProductPage(objects, start, count, amount, has_next, has_previous)
+    if objects:
+        if has_next:
+            page.next_cursor = encode_cursor(objects[-1], field)
+        if has_previous:
+            page.previous_cursor = encode_cursor(objects[0], field)
+    return page
+
+
+def get_product_pagination(request, page, url):
+    """Returns the pagination data of passed ProductPage, see
+    lfs.core.utils.lfs_pagination. Additionally it contains the urls of the
+    next and previous page (next_url, previous_url) including their cursors,
+    which stay the same as long as the listing doesn't change.
+    """
+    pagination = lfs.core.utils.lfs_pagination(request, page, url=url)
+
+    getvars = request.GET.copy()
+    for param in ("start", "after", "before"):
+        getvars.pop(param, None)
+    pagination["getvars"] = "&%s" % getvars.urlencode() if getvars else ""
+
+    if page.next_cursor:
+        pagination["next_url"] = "%s?start=%s&after=%s%s" % (
+            url,
+            page.number + 1,
+            page.next_cursor,
+            pagination["getvars"],
+        )
+    if page.previous_cursor:
+        pagination["previous_url"] = "%s?start=%s&before=%s%s" % (
+            url,
+            page.number - 1,
+            page.previous_cursor,
+            pagination["getvars"],
+        )
+    return pagination
+
+
+# Cache key -> (stamp, slugs, positions), see get_product_navigation_index
+_product_navigation_positions = {}
+
+
+def get_product_navigation_index(sorting, category=None, manufacturer=None, with_inactive=False):
+    """Returns the slugs of the products of the given category (including the
+    products of its sub categories if the category shows all products) or
+    manufacturer in the given sorting together with a map from slug to the
+    position within the slugs.
+
+    Only the slugs are cached, per category/manufacturer, sorting and
+    with_inactive. The cache key contains the version of the
+    "product_navigation" cache group and for categories the versions of the
+    "category-tree" and "category-<id>" groups. The positions are built from
+    the slugs and kept in memory per process, at most
+    PRODUCT_NAVIGATION_POSITIONS_SIZE of them. The slugs are cached together
+    with a random stamp, so that the positions are only reused for the very
+    same cache entry, also if the cache has been cleared in the meantime.
+    """
+    from lfs.caching.utils import get_cache_group_id
+
+    if manufacturer is not None:
+        group_id = get_cache_group_id("product_navigation")
+        key = "manufacturer-%s" % manufacturer.id
+    else:
+        group_id = "%s-%s-%s" % (
+            get_cache_group_id("product_navigation"),
+            get_cache_group_id("category-tree"),
+            get_cache_group_id("category-%s" % category.id),
+        )
+        key = "category-%s" % category.id
+
+    cache_key = "%s-%s-product-navigation-slugs-%s-%s-%s" % (
+        settings.CACHE_MIDDLEWARE_KEY_PREFIX,
+        group_id,
+        key,
+        sorting,
+        with_inactive,
+    )
+    entry = cache.get(cache_key)
+    if entry is None:
+        if manufacturer is not None:
+            products = lfs.catalog.models.Product.objects.filter(manufacturer=manufacturer)
+        else:
+            categories = [category]
+            if category.show_all_products:
+                categories.extend(category.get_all_children())
+            products = lfs.catalog.models.Product.objects.filter(categories__in=categories)
+
+        if not with_inactive:
+            products = products.filter(active=True)
+        products = products.exclude(sub_type=VARIANT).distinct().order_by(sorting)
+
+        entry = (uuid.uuid4().hex, tuple(products.values_list("slug", flat=True)))
+        cache.set(cache_key, entry)
+
+    stamp, slugs = entry
+    memo = _product_navigation_positions.get(cache_key)
+    if memo is not None and memo[0] == stamp:
+        return memo[1:]
+
+    index = (slugs, dict(zip(slugs, range(len(slugs)))))
+    if len(_product_navigation_positions) >= PRODUCT_NAVIGATION_POSITIONS_SIZE:
+        _product_navigation_positions.pop(next(iter(_product_navigation_positions), None), None)
+    _product_navigation_positions[cache_key] = (stamp,) + index
+    return index
+
+
+def get_product_navigation(slug, sorting, category=None, manufacturer=None, with_inactive=False):
+    """Returns the previous and next product slug as well as the position of
+    the product with the given slug within the products of the given category
+    or manufacturer, see get_product_navigation_index. Returns None if the
+    product is not part of them.
+    """
+    slugs, positions = get_product_navigation_index(sorting, category, manufacturer, with_inactive)
+    try:
+        position = positions[slug]
+    except KeyError:
+        return None
+
+    total = len(slugs)
+    return {
+        "display": True,
+        "previous": slugs[position - 1] if position > 0 else None,
+        "next": slugs[position + 1] if position < total - 1 else None,
+        "current": position + 1,
+        "total": total,
+    }
+
+
 def get_option_mapping():
     """Returns a dictionary with option id to property name."""
     options = {}
@@ -505,6 +981,303 @@ def get_property_mapping():
     return properties
 
 
+def get_option_prices():
+    """Returns a dictionary with option id to option price."""
+    from lfs.caching.utils import get_cache_group_id
+
+    cache_key = "%s-%s-option-prices" % (
+        settings.CACHE_MIDDLEWARE_KEY_PREFIX,
+        get_cache_group_id("global-properties-version"),
+    )
+    option_prices = cache.get(cache_key)
+    if option_prices is None:
+        option_prices = dict(lfs.catalog.models.PropertyOption.objects.values_list("id", "price"))
+        cache.set(cache_key, option_prices)
+    return option_prices
+
+
+PRICE_CALCULATION_OPERATORS = {
+    ast.Add: "+",
+    ast.Sub: "-",
+    ast.Mult: "*",
+    ast.Div: "/",
+}
+
+
+def get_price_calculation(formula):
+    """
+    Returns the (cached) expression tree of the passed price calculation of a
+    product. See compile_price_calculation for more.
+    """
+    cache_key = "%s-price-calculation-%s" % (
+        settings.CACHE_MIDDLEWARE_KEY_PREFIX,
+        hashlib.md5(formula.encode("utf-8")).hexdigest(),
+    )
+    expression = cache.get(cache_key)
+    if expression is None:
+        expression = compile_price_calculation(formula)
+        cache.set(cache_key, expression)
+    return expression
+
+
+def compile_price_calculation(formula):
+    """
+    Compiles the passed price calculation of a product into an expression tree
+    of tuples, which is evaluated by evaluate_price_calculation. Raises a
+    ValueError if the formula contains anything else than numbers, the
+    operators +, -, *, /, parentheses and the following functions:
+
+    property(<id>)
+        The value of the property with the given id. For select fields this
+        is the price of the selected option.
+
+    number(<value>)
+        The given number.
+
+    product(<attribute>)
+        The value of the given attribute of the product, e.g. product(price).
+    """
+    try:
+        node = ast.parse(formula.strip(), mode="eval").body
+    except SyntaxError:
+        raise ValueError("Invalid price calculation: %s" % formula)
+    return _compile_price_calculation_node(node)
+
+
+def _compile_price_calculation_node(node):
+    if isinstance(node, ast.BinOp) and type(node.op) in PRICE_CALCULATION_OPERATORS:
+        return (
+            PRICE_CALCULATION_OPERATORS[type(node.op)],
+            _compile_price_calculation_node(node.left),
+            _compile_price_calculation_node(node.right),
+        )
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+        operand = _compile_price_calculation_node(node.operand)
+        return ("neg", operand) if isinstance(node.op, ast.USub) else operand
+    elif _is_number_node(node):
+        return ("number", float(node.value))
+    elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and len(node.args) == 1 and not node.keywords:
+        name, arg = node.func.id, node.args[0]
+        if name == "property" and _is_number_node(arg) and type(arg.value) is int:
+            return ("property", arg.value)
+        elif name == "number" and _is_number_node(arg):
+            return ("number", float(arg.value))
+        elif name == "product" and isinstance(arg, ast.Name) and not arg.id.startswith("_"):
+            return ("product", arg.id)
+
+    raise ValueError("Invalid price calculation: %s" % ast.dump(node))
+
+
+def _is_number_node(node):
+    return isinstance(node, ast.Constant) and type(node.value) in (int, float)
+
+
+def evaluate_price_calculation(expression, product, property_values):
+    """
+    Evaluates the passed expression tree of a price calculation, see
+    compile_price_calculation.
+
+    **Parameters:**
+
+    expression
+        The expression tree of the price calculation.
+
+    product
+        The product for which the price is calculated.
+
+    property_values
+        A dictionary with property id to value. For select fields the value
+        is the price of the selected option.
+    """
+    kind = expression[0]
+    if kind == "number":
+        return expression[1]
+    elif kind == "property":
+        return float(property_values[expression[1]])
+    elif kind == "product":
+        return float(getattr(product, expression[1]))
+    elif kind == "neg":
+        return -evaluate_price_calculation(expression[1], product, property_values)
+
+    left = evaluate_price_calculation(expression[1], product, property_values)
+    right = evaluate_price_calculation(expression[2], product, property_values)
+    if kind == "+":
+        return left + right
+    elif kind == "-":
+        return left - right
+    elif kind == "*":
+        return left * right
+    else:
+        return left / right
+
+
+def get_variant_signature(options):
+    """
+    Returns the signature of the passed variant options, which is used as key
+    of ``Product.get_variant_index``. The options must be strings in the format
+    ``property_group_id|property_id|option_id``. Options without an option id
+    are ignored and the order of the options doesn't matter.
+    """
+    return "".join(sorted(option for option in options if option.find("|") != len(option) - 1))
+
+
+def create_variants(product, combinations, slug="", name="", price=0.0, batch_size=None):
+    """
+    Creates a variant of the passed product for every passed option
+    combination which doesn't exist yet and returns the new variants.
+
+    Every combination is a list of options in the format
+    ``property_group_id|property_id|option_id``. The new combinations are
+    calculated in memory, the variants, their property groups and property
+    values are inserted with ``bulk_create`` within one transaction.
+
+    **Parameters:**
+
+    product
+        The product with variants to which the variants are added.
+
+    combinations
+        The option combinations of the variants, see
+        ``lfs.manage.utils.cartesian_product``.
+
+    slug
+        Added to the slug of the product, followed by the names of the
+        options of the variant.
+
+    name, price
+        The name and the price of the variants.
+
+    batch_size
+        The amount of objects which are inserted per query.
+    """
+    from django.template.defaultfilters import slugify
+    from lfs.caching.utils import invalidate_cache_group_id
+    from lfs.core.signals import product_changed
+    from lfs.core.signals import products_changed
+
+    Product = lfs.catalog.models.Product
+    ProductPropertyValue = lfs.catalog.models.ProductPropertyValue
+
+    combinations = [list(options) for options in combinations]
+    option_ids = set(int(option.split("|")[2]) for options in combinations for option in options)
+    option_names = dict(lfs.catalog.models.PropertyOption.objects.filter(pk__in=option_ids).values_list("id", "name"))
+
+    # Calculate the new combinations and the base slugs of their variants
+    signatures = set(product.get_variant_index(only_active=False))
+    new_combinations = []
+    for i, options in enumerate(combinations):
+        signature = get_variant_signature(options)
+        if signature in signatures:
+            continue
+        signatures.add(signature)
+
+        variant_slug = slug
+        for option in options:
+            if variant_slug:
+                variant_slug += "-"
+            variant_slug += slugify(option_names[int(option.split("|")[2])])
+
+        product_slug = product.slug or ""
+        if product_slug + variant_slug.replace("-", "") == "":
+            variant_slug = ""
+        else:
+            variant_slug = ("%s-%s" % (product_slug, variant_slug)).rstrip("-")
+
+        new_combinations.append((i, options, variant_slug[:80]))
+
+    if not new_combinations:
+        return []
+
+    # Make the slugs unique with one query for all existing slugs
+    prefix = os.path.commonprefix([variant_slug for i, options, variant_slug in new_combinations])[:70]
+    existing_slugs = set(Product.objects.filter(slug__startswith=prefix).values_list("slug", flat=True))
+
+    price_calculator_class = product.get_price_calculator(None).__class__
+    variants_count = product.variants.count()
+
+    variants = []
+    for i, options, variant_slug in new_combinations:
+        new_slug = variant_slug
+        counter = 1
+        while new_slug in existing_slugs:
+            new_slug = "%s-%s" % (variant_slug[: (79 - len(str(counter)))], counter)
+            counter += 1
+        existing_slugs.add(new_slug)
+
+        variant = Product(
+            slug=new_slug,
+            name=name,
+            price=price,
+            sku="%s-%s" % (product.sku, i + 1),
+            parent=product,
+            variant_position=(variants_count + i + 1) * 10,
+            sub_type=VARIANT,
+        )
+        variant.effective_price = price_calculator_class(None, variant).get_effective_price()
+        variants.append(variant)
+
+    property_ids = set(int(option.split("|")[1]) for i, options, variant_slug in new_combinations for option in options)
+    filterable_ids = set(
+        lfs.catalog.models.Property.objects.filter(pk__in=property_ids, filterable=True).values_list("id", flat=True)
+    )
+    property_group_ids = list(product.property_groups.values_list("id", flat=True))
+    PropertyGroupProducts = lfs.catalog.models.PropertyGroup.products.through
+
+    with transaction.atomic():
+        Product.objects.bulk_create(variants, batch_size=batch_size)
+
+        # Not all databases return the ids of bulk created objects
+        if [variant for variant in variants if variant.pk is None]:
+            ids = dict(Product.objects.filter(parent=product).values_list("slug", "id"))
+            for variant in variants:
+                variant.pk = ids[variant.slug]
+
+        # By default we copy the property groups of the product to the variants
+        PropertyGroupProducts.objects.bulk_create(
+            [
+                PropertyGroupProducts(propertygroup_id=property_group_id, product_id=variant.pk)
+                for variant in variants
+                for property_group_id in property_group_ids
+            ],
+            batch_size=batch_size,
+        )
+
+        property_values = []
+        for variant, (i, options, variant_slug) in zip(variants, new_combinations):
+            for option in options:
+                property_group_id, property_id, option_id = option.split("|")
+                # local properties are not bound to property groups
+                property_group_id = None if property_group_id == "0" else int(property_group_id)
+                property_id = int(property_id)
+
+                # By default we create also the filter values as this most of
+                # the users would expect.
+                types = [PROPERTY_VALUE_TYPE_VARIANT]
+                if property_id in filterable_ids:
+                    types.append(PROPERTY_VALUE_TYPE_FILTER)
+
+                for value_type in types:
+                    property_values.append(
+                        ProductPropertyValue(
+                            product_id=variant.pk,
+                            parent_id=product.id,
+                            property_group_id=property_group_id,
+                            property_id=property_id,
+                            value=option_id,
+                            value_as_float=float(option_id),
+                            type=value_type,
+                        )
+                    )
+        ProductPropertyValue.objects.bulk_create(property_values, batch_size=batch_size)
+
+    # bulk_create doesn't send any signals
+    invalidate_cache_group_id("facet-index")
+    products_changed.send(Product, products=variants)
+    product_changed.send(product)
+
+    return variants
+
+
 def _calculate_steps(product_ids, property, min, max):
     """Calculates filter steps.
 
@@ -650,3 +1423,127 @@ class MappingCache(object):
         obj = klass.objects.get(pk=obj_id)
         klass_cache[obj_id] = obj
         return obj
+
+
+class FacetIndex(object):
+    """Precomputed filter values of the products of a category. Works as
+    follows:
+
+    facet_index = FacetIndex(category)  # loads products, variants and filter values once
+    ids = facet_index.get_option_ids(1, 2, "3")  # ids of products/variants with value "3" for property 2
+    ids &= facet_index.get_matching_ids(select_filter, number_filter)
+    product_ids = facet_index.get_parent_ids(ids)  # the products which are displayed within the category
+
+    All results are sets of ids, hence the amount of products for any filter
+    combination is calculated via set intersections without any further
+    database query. The index is stored within the cache by get_facet_index
+    and invalidated via the cache groups of the category whenever products or
+    their categories are changed and via the cache group "facet-index"
+    whenever property values are changed.
+
+    **Attributes:**
+
+    product_ids
+        The ids of the (active, non variant) products of the category.
+
+    parents
+        Maps the id of every product and variant to the id of the product
+        which is displayed within the category.
+
+    prices
+        Maps the id of every active product and variant to its effective price.
+
+    select_values
+        Maps (property_group_id, property_id) to a dictionary of value to the
+        ids of products and variants which have this value.
+
+    number_values
+        Maps (property_group_id, property_id) to a list of (id, value_as_float)
+        of products and variants.
+    """
+
+    def __init__(self, category):
+        from lfs.catalog.models import Product, ProductPropertyValue
+
+        products = category.get_all_products() if category.show_all_products else category.get_products()
+
+        self.product_ids = set()
+        self.parents = {}
+        self.prices = {}
+        self.select_values = {}
+        self.number_values = {}
+
+        for id, parent_id, active, effective_price in Product.objects.filter(
+            Q(pk__in=products) | Q(parent__in=products)
+        ).values_list("id", "parent_id", "active", "effective_price"):
+            if parent_id is None:
+                self.product_ids.add(id)
+                self.parents[id] = id
+            else:
+                self.parents[id] = parent_id
+            if active:
+                self.prices[id] = effective_price
+
+        for product_id, property_group_id, property_id, value, value_as_float in ProductPropertyValue.objects.filter(
+            product__in=list(self.parents.keys()), type=PROPERTY_VALUE_TYPE_FILTER
+        ).values_list("product_id", "property_group_id", "property_id", "value", "value_as_float"):
+            key = (property_group_id, property_id)
+            self.select_values.setdefault(key, {}).setdefault(value, set()).add(product_id)
+            if value_as_float is not None:
+                self.number_values.setdefault(key, []).append((product_id, value_as_float))
+
+    def _get_key(self, property_group_id, property_id):
+        try:
+            property_group_id = int(property_group_id)
+        except (TypeError, ValueError):
+            property_group_id = None
+        return (property_group_id, int(property_id))
+
+    def get_option_ids(self, property_group_id, property_id, value):
+        """Returns the ids of products and variants which have the passed value
+        for the passed property.
+        """
+        key = self._get_key(property_group_id, property_id)
+        return set(self.select_values.get(key, {}).get(value, ()))
+
+    def get_matching_ids(self, select_filter, number_filter):
+        """Returns the ids of products and variants which match all passed
+        filters or None if no filter is passed.
+        """
+        matching_ids = None
+
+        for filter_dict in select_filter.values():
+            key = self._get_key(filter_dict["property_group_id"], filter_dict["property_id"])
+            values = self.select_values.get(key, {})
+            ids = set()
+            for option in filter_dict["value"].split("|"):
+                ids.update(values.get(option, ()))
+            matching_ids = ids if matching_ids is None else matching_ids & ids
+
+        for filter_dict in number_filter.values():
+            key = self._get_key(filter_dict["property_group_id"], filter_dict["property_id"])
+            pmin, pmax = filter_dict["value"][0:2]
+            ids = set([id for (id, value) in self.number_values.get(key, ()) if pmin <= value <= pmax])
+            matching_ids = ids if matching_ids is None else matching_ids & ids
+
+        return matching_ids
+
+    def get_parent_ids(self, ids):
+        """Returns the ids of the products which are displayed within the
+        category for passed ids of products and variants.
+        """
+        parents = self.parents
+        return set([parents[id] for id in ids]) & self.product_ids
+
+    def get_price_filtered_ids(self, price_filter):
+        """Returns the ids of the products which are within passed price filter
+        (either themselves or one of their active variants) or None if no price
+        filter is passed.
+        """
+        if not price_filter:
+            return None
+
+        pmin = float(price_filter["min"])
+        pmax = float(price_filter["max"])
+        ids = [id for (id, price) in self.prices.items() if price is not None and pmin <= price <= pmax]
+        return self.get_parent_ids(ids)
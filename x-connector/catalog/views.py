@@ -3,7 +3,6 @@ import json
 
 from django.conf import settings
 from django.core.cache import cache
-from django.core.paginator import Paginator, EmptyPage, InvalidPage
 from django.urls import reverse
 from django.http import Http404
 from django.http import HttpResponse
@@ -26,9 +25,10 @@ from lfs.catalog.models import PropertyOption
 from lfs.catalog.settings import CONTENT_PRODUCTS
 from lfs.catalog.settings import PROPERTY_VALUE_TYPE_DEFAULT
 from lfs.catalog.settings import SELECT
-from lfs.core.utils import LazyEncoder, lfs_pagination
+from lfs.core.utils import LazyEncoder
 from lfs.core.templatetags import lfs_tags
 from lfs.manufacturer.models import Manufacturer
+from lfs.plugins import PriceCalculator
 
 
 def file_download(request, language=None, file_id=None):
@@ -421,14 +421,15 @@ def category_categories(request, slug, start=0, template_name="lfs/catalog/categ
 
     This view is called if the user chooses a template that is situated in settings.CATEGORY_PATH ".
     """
-    cache_key = "%s-category-categories-2-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, slug)
+    category = lfs_get_object_or_404(Category, slug=slug)
+
+    group_id = "%s-%s" % (get_cache_group_id("category-tree"), get_cache_group_id("category-%s" % category.id))
+    cache_key = "%s-%s-category-categories-2-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, group_id, slug)
 
     result = cache.get(cache_key)
     if result is not None:
         return result
 
-    category = lfs_get_object_or_404(Category, slug=slug)
-
     format_info = category.get_format_info()
     amount_of_cols = format_info["category_cols"]
 
@@ -491,37 +492,34 @@ def category_products(request, slug, start=1, template_name="lfs/catalog/categor
 
     product_filter = request.session.get("product-filter", {})
 
-    cache_key = "%s-category-products-2-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, slug)
-    sub_cache_key = "%s-2-start-%s-sorting-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, start, sorting)
+    category = lfs_get_object_or_404(Category, slug=slug)
+
+    # The cursors of the previous and next page, see lfs.catalog.utils.get_product_page
+    after = request.GET.get("after")
+    before = request.GET.get("before")
 
-    filter_key = ["%s-%s" % (i[0], i[1]) for i in product_filter.items()]
-    if filter_key:
-        sub_cache_key += "-%s" % "-".join(filter_key)
+    filter_key = "sorting-%s" % sorting
+    for i in sorted(product_filter.items()):
+        filter_key += "-%s-%s" % (i[0], i[1])
 
     price_filter = request.session.get("price-filter")
     if price_filter:
-        sub_cache_key += "-%s-%s" % (price_filter["min"], price_filter["max"])
+        filter_key += "-%s-%s" % (price_filter["min"], price_filter["max"])
 
     manufacturer_filter = request.session.get("manufacturer-filter")
     if manufacturer_filter:
-        sub_cache_key += "-%s" % ",".join(map(str, manufacturer_filter))
+        filter_key += "-%s" % ",".join(map(str, manufacturer_filter))
 
-    temp = cache.get(cache_key)
-    if temp is not None:
-        try:
-            return temp[sub_cache_key]
-        except KeyError:
-            pass
-    else:
-        temp = dict()
-
-    category = lfs_get_object_or_404(Category, slug=slug)
+    # Only the pages which are requested by their number are cached. The
+    # pages of cursors would fill the bounded cache with rarely reused entries.
+    cursor_page = after is not None or before is not None
+    sub_cache_key = "start-%s-%s" % (start, filter_key)
 
-    # Calculates parameters for display.
-    try:
-        start = int(start)
-    except (ValueError, TypeError):
-        start = 1
+    products_cache = lfs.catalog.utils.get_category_products_cache(category)
+    if not cursor_page:
+        result = products_cache.get(sub_cache_key)
+        if result is not None:
+            return result
 
     format_info = category.get_format_info()
     amount_of_rows = format_info["product_rows"]
@@ -533,37 +531,48 @@ def category_products(request, slug, start=1, template_name="lfs/catalog/categor
     )
     all_products = all_products.select_related("parent")
 
-    # prepare paginator
-    paginator = Paginator(all_products, amount)
+    # The amount of products is shared by all pages
+    count_key = "count-%s" % filter_key
+    amount_of_products = products_cache.get(count_key)
+    if amount_of_products is None:
+        amount_of_products = all_products.count()
+        products_cache.set(count_key, amount_of_products)
 
-    try:
-        current_page = paginator.page(start)
-    except (EmptyPage, InvalidPage):
-        current_page = paginator.page(paginator.num_pages)
+    current_page = lfs.catalog.utils.get_product_page(
+        all_products, sorting, amount, amount_of_products, start, after, before
+    )
 
     # Calculate products
-    row = []
-    products = []
-    for i, product in enumerate(current_page.object_list):
+    page_products = []
+    for product in current_page.object_list:
         if product.is_product_with_variants():
             default_variant = product.get_variant_for_category(request)
             if default_variant:
                 product = default_variant
+        page_products.append(product)
+
+    prices = PriceCalculator.get_prices_for(page_products, request)
 
+    row = []
+    products = []
+    # The price tags of the template take the prices of the rows, see
+    # lfs.core.templatetags.lfs_tags.category_product_prices
+    products_by_id = {}
+    for i, product in enumerate(page_products):
         image = None
         product_image = product.get_image()
         if product_image:
             image = product_image.image
-        row.append(
-            {
-                "obj": product,
-                "slug": product.slug,
-                "name": product.get_name(),
-                "image": image,
-                "price_unit": product.get_price_unit(),
-                "price_includes_tax": product.price_includes_tax(request),
-            }
-        )
+        products_by_id[product.id] = {
+            "obj": product,
+            "slug": product.slug,
+            "name": product.get_name(),
+            "image": image,
+            "price_unit": product.get_price_unit(),
+            "price_includes_tax": product.price_includes_tax(request),
+            "prices": prices[product.id],
+        }
+        row.append(products_by_id[product.id])
         if (i + 1) % amount_of_cols == 0:
             products.append(row)
             row = []
@@ -571,10 +580,8 @@ def category_products(request, slug, start=1, template_name="lfs/catalog/categor
     if len(row) > 0:
         products.append(row)
 
-    amount_of_products = all_products.count()
-
     # Calculate urls
-    pagination_data = lfs_pagination(request, current_page, url=category.get_absolute_url())
+    pagination_data = lfs.catalog.utils.get_product_pagination(request, current_page, url=category.get_absolute_url())
 
     pagination_data["total_text"] = __("%(count)d product", "%(count)d products", amount_of_products) % {
         "count": amount_of_products
@@ -587,6 +594,7 @@ def category_products(request, slug, start=1, template_name="lfs/catalog/categor
     template_data = {
         "category": category,
         "products": products,
+        "category_products_by_id": products_by_id,
         "amount_of_products": amount_of_products,
         "pagination": pagination_data,
     }
@@ -595,8 +603,8 @@ def category_products(request, slug, start=1, template_name="lfs/catalog/categor
 
     result = {"pagination_data": pagination_data, "html": result_html}
 
-    temp[sub_cache_key] = result
-    cache.set(cache_key, temp)
+    if not cursor_page:
+        products_cache.set(sub_cache_key, result)
 
     return result
 
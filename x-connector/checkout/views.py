@@ -176,7 +176,7 @@ def cart_inline(request, template_name="lfs/checkout/checkout_cart_inline.html")
 
     cart_items = []
     if cart:
-        for cart_item in cart.get_items():
+        for cart_item in cart.get_totals(request).items:
             product = cart_item.product
             quantity = product.get_clean_quantity(cart_item.amount)
             cart_items.append(
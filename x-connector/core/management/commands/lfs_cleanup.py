@@ -6,7 +6,25 @@ class Command(BaseCommand):
     args = ""
     help = "Call all lfs cleanup commands at once"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            action="store",
+            dest="batch_size",
+            type=int,
+            default=1000,
+            help="Amount of objects which are removed at once",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            dest="dry_run",
+            default=False,
+            help="Only count the objects which would be removed",
+        )
+
     def handle(self, *args, **options):
-        management.call_command("cleanup_carts")
-        management.call_command("cleanup_customers")
-        management.call_command("cleanup_addresses")
+        kwargs = {"batch_size": options["batch_size"], "dry_run": options["dry_run"]}
+        management.call_command("cleanup_carts", **kwargs)
+        management.call_command("cleanup_customers", **kwargs)
+        management.call_command("cleanup_addresses", **kwargs)
@@ -11,3 +11,8 @@ ACTION_PLACE_CHOICES = [
     (ACTION_PLACE_FOOTER, _("Footer")),
 ]
 POSTAL_ADDRESS_L10N = getattr(settings, "POSTAL_ADDRESS_L10N", True)
+
+# The directory the profiles of ProfileMiddleware are dumped into.
+PROFILE_DIR = getattr(settings, "LFS_PROFILE_DIR", None)
+# The seconds a token for ProfileMiddleware is valid.
+PROFILE_MAX_AGE = getattr(settings, "LFS_PROFILE_MAX_AGE", 3600)
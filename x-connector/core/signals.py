@@ -8,6 +8,8 @@ shop_changed = django.dispatch.Signal()
 cart_changed = django.dispatch.Signal()
 category_changed = django.dispatch.Signal()
 product_changed = django.dispatch.Signal()
+product_stock_changed = django.dispatch.Signal()
+products_changed = django.dispatch.Signal()
 lfs_sorting_changed = django.dispatch.Signal()
 
 # Marketing
@@ -17,7 +17,6 @@ import lfs.core.views
 import lfs.utils.misc
 from lfs.caching.utils import get_cache_group_id
 from lfs.catalog.models import Category
-from lfs.catalog.settings import VARIANT
 from lfs.catalog.settings import CATEGORY_VARIANT_CHEAPEST_PRICES
 from lfs.catalog.settings import SORTING_MAP
 from lfs.catalog.models import Product
@@ -105,7 +104,8 @@ def sorting(context):
 def breadcrumbs(context, obj, current_page=""):
     """ """
     if isinstance(obj, Category):
-        cache_key = "%s-category-breadcrumbs-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, obj.slug)
+        tree_version = get_cache_group_id("category-tree")
+        cache_key = "%s-%s-category-breadcrumbs-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, tree_version, obj.slug)
         objects = cache.get(cache_key)
         if objects is not None:
             return objects
@@ -208,73 +208,23 @@ def product_navigation(context, product):
         product = product.parent
         slug = product.slug
 
-    # prepare cache key for product_navigation group
-    # used to invalidate cache for all product_navigations at once
-    pn_cache_key = get_cache_group_id("product_navigation")
+    # This is necessary as we display non active products to superusers.
+    # So we have to take care for the product navigation too.
+    with_inactive = request.user.is_superuser
 
     # if there is last_manufacturer then product was visited from manufacturer view
     # as category view removes last_manufacturer from the session
     lm = request.session.get("last_manufacturer")
     if lm and product.manufacturer == lm:
-        cache_key = "%s-%s-product-navigation-manufacturer-%s" % (
-            settings.CACHE_MIDDLEWARE_KEY_PREFIX,
-            pn_cache_key,
-            slug,
-        )
-        res = cache.get(cache_key)
-        if res and sorting in res:
-            return res[sorting]
-
-        products = Product.objects.filter(manufacturer=lm)
+        result = lfs.catalog.utils.get_product_navigation(slug, sorting, manufacturer=lm, with_inactive=with_inactive)
     else:
         category = product.get_current_category(request)
         if category is None:
             return {"display": False}
-        else:
-            cache_key = "%s-%s-product-navigation-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, pn_cache_key, slug)
-            res = cache.get(cache_key)
-            if res and sorting in res:
-                return res[sorting]
-
-            # First we collect all sub categories. This and using the in operator makes
-            # batching more easier
-            categories = [category]
-
-            if category.show_all_products:
-                categories.extend(category.get_all_children())
-
-            products = Product.objects.filter(categories__in=categories)
-
-    # This is necessary as we display non active products to superusers.
-    # So we have to take care for the product navigation too.
-    if not request.user.is_superuser:
-        products = products.filter(active=True)
-    products = products.exclude(sub_type=VARIANT).distinct().order_by(sorting)
-
-    product_slugs = list(products.values_list("slug", flat=True))
-    product_index = product_slugs.index(slug)
-
-    if product_index > 0:
-        previous = product_slugs[product_index - 1]
-    else:
-        previous = None
-
-    total = len(product_slugs)
-    if product_index < total - 1:
-        next_product = product_slugs[product_index + 1]
-    else:
-        next_product = None
-
-    result = {
-        "display": True,
-        "previous": previous,
-        "next": next_product,
-        "current": product_index + 1,
-        "total": total,
-    }
-
-    cache.set(cache_key, {"sorting": result})
+        result = lfs.catalog.utils.get_product_navigation(slug, sorting, category=category, with_inactive=with_inactive)
 
+    if result is None:
+        return {"display": False}
     return result
 
 
@@ -672,6 +622,23 @@ def packages(cart_item):
     return 0
 
 
+def _get_category_product(context, product_id):
+    """
+    Returns the product with passed id and its prices. Both are taken from the
+    rows of the category_products view (``category_products_by_id``), which
+    calculates the prices of all products of a page at once, see
+    lfs.plugins.PriceCalculator.get_prices_for. Otherwise the product is
+    loaded and None is returned as prices.
+    """
+    try:
+        row = context.get("category_products_by_id", {}).get(int(product_id))
+    except (TypeError, ValueError):
+        row = None
+    if row is not None and row.get("prices") is not None:
+        return row["obj"], row["prices"]
+    return Product.objects.get(pk=product_id), None
+
+
 class CategoryProductPricesGrossNode(Node):
     def __init__(self, product_id):
         self.product_id = template.Variable(product_id)
@@ -680,7 +647,7 @@ class CategoryProductPricesGrossNode(Node):
         request = context.get("request")
 
         product_id = self.product_id.resolve(context)
-        product = Product.objects.get(pk=product_id)
+        product, prices = _get_category_product(context, product_id)
 
         if product.is_variant():
             parent = product.parent
@@ -701,16 +668,21 @@ class CategoryProductPricesGrossNode(Node):
             context["base_price"] = info["price"]
             context["base_price_starting_from"] = info["starting_from"]
         else:
+            if prices is None:
+                prices = product.get_price_calculator(request).get_prices()
             if product.get_for_sale():
-                context["standard_price"] = product.get_standard_price_gross(request)
-            context["price"] = product.get_price_gross(request)
+                context["standard_price"] = prices["standard_price_gross"]
+            context["price"] = prices["price_gross"]
             context["price_starting_from"] = False
 
-            context["base_price"] = product.get_base_price_gross(request)
+            context["base_price"] = prices["base_price_gross"]
             context["base_price_starting_from"] = False
 
         if product.get_active_packing_unit():
-            context["base_packing_price"] = product.get_base_packing_price_gross(request)
+            if prices is not None:
+                context["base_packing_price"] = prices["base_packing_price_gross"]
+            else:
+                context["base_packing_price"] = product.get_base_packing_price_gross(request)
 
         return ""
 
@@ -735,7 +707,7 @@ class CategoryProductPricesNetNode(Node):
         request = context.get("request")
 
         product_id = self.product_id.resolve(context)
-        product = Product.objects.get(pk=product_id)
+        product, prices = _get_category_product(context, product_id)
 
         if product.is_variant():
             parent = product.parent
@@ -756,16 +728,21 @@ class CategoryProductPricesNetNode(Node):
             context["base_price"] = info["price"]
             context["base_price_starting_from"] = info["starting_from"]
         else:
+            if prices is None:
+                prices = product.get_price_calculator(request).get_prices()
             if product.get_for_sale():
-                context["standard_price"] = product.get_standard_price_net(request)
-            context["price"] = product.get_price_net(request)
+                context["standard_price"] = prices["standard_price_net"]
+            context["price"] = prices["price_net"]
             context["price_starting_from"] = False
 
-            context["base_price"] = product.get_base_price_net(request)
+            context["base_price"] = prices["base_price_net"]
             context["base_price_starting_from"] = False
 
         if product.get_active_packing_unit():
-            context["base_packing_price"] = product.get_base_packing_price_net(request)
+            if prices is not None:
+                context["base_packing_price"] = prices["base_packing_price_net"]
+            else:
+                context["base_packing_price"] = product.get_base_packing_price_net(request)
 
         return ""
 
@@ -790,7 +767,7 @@ class CategoryProductPricesNode(Node):
         request = context.get("request")
 
         product_id = self.product_id.resolve(context)
-        product = Product.objects.get(pk=product_id)
+        product, prices = _get_category_product(context, product_id)
 
         if product.is_variant():
             parent = product.parent
@@ -811,16 +788,21 @@ class CategoryProductPricesNode(Node):
             context["base_price"] = info["price"]
             context["base_price_starting_from"] = info["starting_from"]
         else:
+            if prices is None:
+                prices = product.get_price_calculator(request).get_prices()
             if product.get_for_sale():
-                context["standard_price"] = product.get_standard_price(request)
-            context["price"] = product.get_price(request)
+                context["standard_price"] = prices["standard_price"]
+            context["price"] = prices["price"]
             context["price_starting_from"] = False
 
-            context["base_price"] = product.get_base_price(request)
+            context["base_price"] = prices["base_price"]
             context["base_price_starting_from"] = False
 
         if product.get_active_packing_unit():
-            context["base_packing_price"] = product.get_base_packing_price(request)
+            if prices is not None:
+                context["base_packing_price"] = prices["base_packing_price"]
+            else:
+                context["base_packing_price"] = product.get_base_packing_price(request)
 
         return ""
 
@@ -28,6 +28,7 @@ from lfs.checkout.tests import *  # NOQA
 from lfs.manage.tests import *  # NOQA
 from lfs.gross_price.tests import *  # NOQA
 from lfs.net_price.tests import *  # NOQA
+from lfs.utils.tests import *  # NOQA
 
 # from lfs.core.wmtests import *
 
@@ -9,6 +9,7 @@ import time
 
 from django.conf import settings
 from django.contrib.redirects.models import Redirect
+from django.db import connections
 from django.http import HttpResponseRedirect
 from django.http import HttpResponse
 from django.utils.functional import Promise
@@ -168,9 +169,9 @@ def get_current_categories(request, object):
     elif object and object.content_type == "product":
         current_categories = []
         category = object.get_current_category(request)
-        while category:
+        if category:
             current_categories.append(category)
-            category = category.parent
+            current_categories.extend(category.get_parents())
     else:
         current_categories = []
 
@@ -210,11 +211,9 @@ def remove_redirect_for(path):
 
 def set_category_levels():
     """Sets the category levels based on the position in hierarchy."""
-    from lfs.catalog.models import Category
+    import lfs.catalog.utils
 
-    for category in Category.objects.all():
-        category.level = len(category.get_parents()) + 1
-        category.save()
+    lfs.catalog.utils.rebuild_category_paths()
 
 
 def get_start_day(date):
@@ -270,8 +269,48 @@ class LazyEncoder(json.JSONEncoder):
         return obj
 
 
+def get_category_tree_skeleton():
+    """Returns the structure of all categories, which is loaded with one query
+    and cached with the "category-tree" cache group:
+
+    categories
+        category id -> category
+
+    children
+        parent id -> ids of the child categories (ordered by position)
+
+    levels
+        level -> ids of the categories of this level (ordered by position)
+    """
+    from django.core.cache import cache
+    from lfs.caching.utils import get_cache_group_id
+    from lfs.catalog.models import Category
+
+    cache_key = "%s-%s-category-tree-skeleton" % (
+        settings.CACHE_MIDDLEWARE_KEY_PREFIX,
+        get_cache_group_id("category-tree"),
+    )
+    skeleton = cache.get(cache_key)
+    if skeleton is not None:
+        return skeleton
+
+    skeleton = {"categories": {}, "children": {}, "levels": {}}
+    for category in Category.objects.defer("description", "short_description", "meta_keywords", "meta_description"):
+        skeleton["categories"][category.id] = category
+        skeleton["children"].setdefault(category.parent_id, []).append(category.id)
+        skeleton["levels"].setdefault(category.level, []).append(category.id)
+
+    cache.set(cache_key, skeleton)
+    return skeleton
+
+
 class CategoryTree(object):
-    """Represents a category tree."""
+    """Represents a category tree.
+
+    The tree is built from the cached category skeleton (see
+    get_category_tree_skeleton) without further queries; the current
+    categories just decide which branches are expanded.
+    """
 
     def __init__(self, currents, start_level, expand_level):
         self.currents = currents
@@ -280,7 +319,8 @@ class CategoryTree(object):
 
     def get_category_tree(self):
         """Returns a category tree"""
-        from lfs.catalog.models import Category
+        self.skeleton = get_category_tree_skeleton()
+        self.current_ids = set([category.id for category in self.currents or []])
 
         # NOTE: We don't use the level attribute of the category but calculate
         # actual position of a category based on the current tree. In this way
@@ -288,68 +328,40 @@ class CategoryTree(object):
         # category level 2) an the correct css is applied.
         level = 0
         categories = []
-        for category in Category.objects.filter(level=self.start_level):
+        for category_id in self.skeleton["levels"].get(self.start_level, []):
+            category = self.skeleton["categories"][category_id]
             if category.exclude_from_navigation:
                 continue
 
-            if self.currents and category in self.currents:
-                children = self._get_sub_tree(category, level + 1)
-                is_current = True
-            elif category.level <= self.expand_level:
-                children = self._get_sub_tree(category, level + 1)
-                is_current = False
-            else:
-                children = []
-                is_current = False
-
-            if self.start_level > 1:
-                if category.parent in self.currents:
-                    categories.append(
-                        {
-                            "category": category,
-                            "children": children,
-                            "level": level,
-                            "is_current": is_current,
-                        }
-                    )
-            else:
-                categories.append(
-                    {
-                        "category": category,
-                        "children": children,
-                        "level": level,
-                        "is_current": is_current,
-                    }
-                )
+            if self.start_level > 1 and category.parent_id not in self.current_ids:
+                continue
+
+            categories.append(self._get_node(category, level))
 
         return categories
 
-    def _get_sub_tree(self, category, level):
-        from lfs.catalog.models import Category
+    def _get_node(self, category, level):
+        is_current = category.id in self.current_ids
+        if is_current or category.level <= self.expand_level:
+            children = self._get_sub_tree(category, level + 1)
+        else:
+            children = []
 
+        return {
+            "category": category,
+            "children": children,
+            "level": level,
+            "is_current": is_current,
+        }
+
+    def _get_sub_tree(self, category, level):
         categories = []
-        for category in Category.objects.filter(parent=category):
+        for category_id in self.skeleton["children"].get(category.id, []):
+            category = self.skeleton["categories"][category_id]
             if category.exclude_from_navigation:
                 continue
 
-            if self.currents and category in self.currents:
-                children = self._get_sub_tree(category, level + 1)
-                is_current = True
-            elif category.level <= self.expand_level:
-                children = self._get_sub_tree(category, level + 1)
-                is_current = False
-            else:
-                children = []
-                is_current = False
-
-            categories.append(
-                {
-                    "category": category,
-                    "children": children,
-                    "level": level,
-                    "is_current": is_current,
-                }
-            )
+            categories.append(self._get_node(category, level))
 
         return categories
 
@@ -445,3 +457,55 @@ def lfs_pagination(request, current_page, url="", getparam="start"):
     if len(getvars.keys()) > 0:
         to_return["getvars"] = "&%s" % getvars.urlencode()
     return to_return
+
+
+def get_pk_batches(queryset, batch_size=1000):
+    """Yields the primary keys of the passed queryset in ascending lists of at
+    most batch_size entries. Every batch is loaded with its own query starting
+    after the last primary key of the previous batch, hence the objects may be
+    deleted meanwhile.
+    """
+    queryset = queryset.order_by("pk")
+    last_pk = None
+    while True:
+        if last_pk is not None:
+            pks = list(queryset.filter(pk__gt=last_pk).values_list("pk", flat=True)[:batch_size])
+        else:
+            pks = list(queryset.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            return
+        yield pks
+        last_pk = pks[-1]
+
+
+def delete_without_signals(queryset, batch_size=1000):
+    """Deletes the passed queryset with one DELETE statement per batch of
+    primary keys, i.e. without loading the objects and without sending
+    pre_delete and post_delete signals. Rows of multi-table inheritance
+    children are deleted as well. Other related rows have to be deleted and
+    caches have to be invalidated by the caller. Returns the amount of deleted
+    rows.
+    """
+    connection = connections[queryset.db]
+    amount = 0
+    with connection.cursor() as cursor:
+        for pks in get_pk_batches(queryset, batch_size):
+            amount += _delete_rows(cursor, connection, queryset.model, pks)
+    return amount
+
+
+def _delete_rows(cursor, connection, model, pks):
+    """Deletes the rows of passed model with passed primary keys and the rows
+    of its multi-table inheritance children, which share the primary keys.
+    """
+    for relation in model._meta.related_objects:
+        if relation.parent_link:
+            _delete_rows(cursor, connection, relation.related_model, pks)
+
+    qn = connection.ops.quote_name
+    cursor.execute(
+        "DELETE FROM %s WHERE %s IN (%s)"
+        % (qn(model._meta.db_table), qn(model._meta.pk.column), ", ".join(["%s"] * len(pks))),
+        pks,
+    )
+    return cursor.rowcount
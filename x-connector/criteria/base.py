@@ -4,6 +4,7 @@ from django.contrib.contenttypes.models import ContentType
 # lfs imports
 from django.core.cache import cache
 from lfs.core.utils import import_symbol
+from lfs.criteria.facts import get_facts
 
 
 class Criteria(object):
@@ -13,8 +14,22 @@ class Criteria(object):
 
     def is_valid(self, request, product=None):
         """
-        Returns ``True`` if the object is valid, otherwise ``False``.
+        Returns ``True`` if the object is valid, otherwise ``False``. The result
+        is kept within the facts of the current request, so that the object is
+        evaluated once per request and product.
         """
+        if request is None:
+            return self._is_valid(request, product)
+
+        results = get_facts(request).results
+        key = (self.__class__, self.pk, product.__class__, getattr(product, "pk", None))
+        try:
+            return results[key]
+        except KeyError:
+            result = results[key] = self._is_valid(request, product)
+            return result
+
+    def _is_valid(self, request, product=None):
         for criterion in self.get_criteria():
             criterion.request = request
             criterion.product = product
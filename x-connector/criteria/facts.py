@@ -0,0 +1,180 @@
+from lfs.caching.utils import get_cache_group_id
+from lfs.caching.utils import invalidate_cache_group_id
+
+
+class CriteriaFacts(object):
+    """
+    A snapshot of the facts criteria are checked against, e.g. the price,
+    weight and dimensions of the current cart or the selected shipping
+    country. Every fact is calculated lazily and at most once.
+
+    The snapshot is shared by all criteria of the current request, see
+    ``get_facts``, and keeps the results of already evaluated objects, see
+    ``lfs.criteria.base.Criteria.is_valid``.
+
+    **Attributes:**
+
+    request
+        The current request.
+
+    results
+        The results of already evaluated objects.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.results = {}
+        self._facts = {}
+
+    def _get(self, name, calculate):
+        try:
+            return self._facts[name]
+        except KeyError:
+            value = self._facts[name] = calculate()
+            return value
+
+    @property
+    def cart(self):
+        """
+        The cart of the current customer.
+        """
+        import lfs.cart.utils
+
+        return self._get("cart", lambda: lfs.cart.utils.get_cart(self.request))
+
+    @property
+    def cart_items(self):
+        """
+        The items of the current cart.
+        """
+        return self._get("cart_items", lambda: self.cart.get_totals(self.request).items if self.cart else [])
+
+    @property
+    def cart_price(self):
+        """
+        The total gross price of the current cart.
+        """
+        return self._get("cart_price", lambda: self.cart.get_price_gross(self.request) if self.cart else 0)
+
+    @property
+    def cart_weight(self):
+        """
+        The total weight of the current cart.
+        """
+        return self._get("cart_weight", lambda: sum([i.product.get_weight() * i.amount for i in self.cart_items]))
+
+    @property
+    def cart_height(self):
+        """
+        The total height of the current cart.
+        """
+        return self._get("cart_height", lambda: sum([i.product.get_height() * i.amount for i in self.cart_items]))
+
+    @property
+    def cart_max_length(self):
+        """
+        The max length of all products within the current cart.
+        """
+        return self._get("cart_max_length", lambda: max([i.product.get_length() for i in self.cart_items] or [0]))
+
+    @property
+    def cart_max_width(self):
+        """
+        The max width of all products within the current cart.
+        """
+        return self._get("cart_max_width", lambda: max([i.product.get_width() for i in self.cart_items] or [0]))
+
+    @property
+    def cart_clag(self):
+        """
+        The combined length and girth of the current cart.
+        """
+
+        def calculate():
+            total_height = sum([item.product.get_height() for item in self.cart_items])
+            return (2 * self.cart_max_width) + (2 * total_height) + self.cart_max_length
+
+        return self._get("cart_clag", calculate)
+
+    @property
+    def shipping_country(self):
+        """
+        The selected shipping country of the current customer.
+        """
+        import lfs.shipping.utils
+
+        return self._get("shipping_country", lambda: lfs.shipping.utils.get_selected_shipping_country(self.request))
+
+    @property
+    def shipping_method(self):
+        """
+        The selected shipping method of the current customer.
+        """
+        import lfs.shipping.utils
+
+        return self._get("shipping_method", lambda: lfs.shipping.utils.get_selected_shipping_method(self.request))
+
+    @property
+    def payment_method(self):
+        """
+        The selected payment method of the current customer.
+        """
+        import lfs.payment.utils
+
+        return self._get("payment_method", lambda: lfs.payment.utils.get_selected_payment_method(self.request))
+
+    def get_product_price(self, product):
+        """
+        Returns the price of passed product.
+        """
+        return self._get(("product_price", product.__class__, product.pk), lambda: product.get_price(self.request))
+
+
+def get_visitor_key(user_id=None, session=None):
+    """
+    Returns the key of the visitor with passed user id or session key, which
+    is used for the visitor's ``criteria-facts-<key>`` cache group.
+    """
+    if user_id:
+        return "user-%s" % user_id
+    return "session-%s" % session
+
+
+def invalidate_visitor_facts(user_id=None, session=None):
+    """
+    Invalidates the facts of the visitor with passed user id and/or session
+    key, e.g. after the cart or the customer of the visitor has been changed.
+
+    Changes of shop data like criteria, methods or products invalidate the
+    facts of all visitors via the ``criteria-facts`` cache group instead.
+    """
+    if user_id:
+        invalidate_cache_group_id("criteria-facts-%s" % get_visitor_key(user_id=user_id))
+    if session:
+        invalidate_cache_group_id("criteria-facts-%s" % get_visitor_key(session=session))
+
+
+def get_facts(request):
+    """
+    Returns the facts of passed request. They are created once per request
+    and recreated as soon as criteria or other shop data have been changed,
+    see the ``criteria-facts`` cache group, or the cart or the customer of
+    the current visitor, see ``invalidate_visitor_facts``.
+    """
+    if request is None:
+        return CriteriaFacts(request)
+
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        visitor_key = get_visitor_key(user_id=user.pk)
+    else:
+        visitor_key = get_visitor_key(session=getattr(getattr(request, "session", None), "session_key", None))
+
+    version = (get_cache_group_id("criteria-facts"), get_cache_group_id("criteria-facts-%s" % visitor_key))
+    cached = getattr(request, "cached_criteria_facts", None)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    facts = CriteriaFacts(request)
+    request.cached_criteria_facts = (version, facts)
+    return facts
@@ -8,10 +8,9 @@ from django.utils.encoding import force_str
 from django.utils.translation import gettext_lazy as _, gettext
 from django.template.loader import render_to_string
 
-import lfs.cart.utils
 import lfs.core.utils
-from lfs import shipping
 from lfs.core.models import Country
+from lfs.criteria.facts import get_facts
 from lfs.payment.models import PaymentMethod
 from lfs.shipping.models import ShippingMethod
 
@@ -174,7 +173,15 @@ class Criterion(models.Model):
         """
         Returns the current cart of the current customer.
         """
-        return lfs.cart.utils.get_cart(self.request)
+        return self.facts.cart
+
+    @property
+    def facts(self):
+        """
+        Returns the facts of the current request, see
+        ``lfs.criteria.facts.CriteriaFacts``.
+        """
+        return get_facts(self.request)
 
     def get_content_object(self):
         """
@@ -402,11 +409,9 @@ class CartPriceCriterion(Criterion):
         is the total price of all products within the cart.
         """
         if self.product:
-            price = self.product.get_price(self.request)
-        elif self.cart:
-            price = self.cart.get_price_gross(self.request)
+            price = self.facts.get_product_price(self.product)
         else:
-            price = 0
+            price = self.facts.cart_price
 
         if (self.operator == self.EQUAL) and (price == self.value):
             return True
@@ -446,22 +451,7 @@ class CombinedLengthAndGirthCriterion(Criterion):
         if self.product:
             clag = (2 * self.product.get_width()) + (2 * self.product.get_height()) + self.product.get_length()
         else:
-            if self.cart is None:
-                clag = 0
-            else:
-                max_width = 0
-                max_length = 0
-                total_height = 0
-                for item in self.cart.get_items():
-                    if max_length < item.product.get_length():
-                        max_length = item.product.get_length()
-
-                    if max_width < item.product.get_width():
-                        max_width = item.product.get_width()
-
-                    total_height += item.product.get_height()
-
-                clag = (2 * max_width) + (2 * total_height) + max_length
+            clag = self.facts.cart_clag
 
         if (self.operator == self.EQUAL) and (clag == self.value):
             return True
@@ -516,7 +506,7 @@ class CountryCriterion(Criterion):
         return self.MULTIPLE_SELECT
 
     def is_valid(self):
-        country = shipping.utils.get_selected_shipping_country(self.request)
+        country = self.facts.shipping_country
         cache_key = "country_values_{}".format(self.pk)
         countries = cache.get(cache_key)
         if countries is None:
@@ -551,10 +541,8 @@ class HeightCriterion(Criterion):
         """
         if self.product:
             height = self.product.get_height()
-        elif self.cart:
-            height = sum([item.product.get_height() * item.amount for item in self.cart.get_items()])
         else:
-            height = 0
+            height = self.facts.cart_height
 
         if (self.operator == self.EQUAL) and (height == self.value):
             return True
@@ -593,10 +581,8 @@ class LengthCriterion(Criterion):
         """
         if self.product:
             max_length = self.product.get_length()
-        elif self.cart and self.cart.get_items():
-            max_length = max([item.product.get_length() for item in self.cart.get_items()])
         else:
-            max_length = 0
+            max_length = self.facts.cart_max_length
 
         if (self.operator == self.LESS_THAN) and (max_length < self.value):
             return True
@@ -652,18 +638,16 @@ class PaymentMethodCriterion(Criterion):
 
     def is_valid(self):
         # see ShippingMethodCriterion for what's going on here
-        import lfs.payment.utils
-
         if isinstance(self.content, PaymentMethod):
             is_payment_method = True
         else:
             is_payment_method = False
 
         if (not is_payment_method) and (self.operator == self.IS_SELECTED):
-            payment_method = lfs.payment.utils.get_selected_payment_method(self.request)
+            payment_method = self.facts.payment_method
             return payment_method in self.value.all()
         elif (not is_payment_method) and (self.operator == self.IS_NOT_SELECTED):
-            payment_method = lfs.payment.utils.get_selected_payment_method(self.request)
+            payment_method = self.facts.payment_method
             return payment_method not in self.value.all()
         elif self.operator == self.IS_VALID:
             for pm in self.value.all():
@@ -724,18 +708,16 @@ class ShippingMethodCriterion(Criterion):
         # checks for valid shipping methods and call this method again, so that
         # we get an infinte recursion.
 
-        import lfs.shipping.utils
-
         if isinstance(self.content, ShippingMethod):
             is_shipping_method = True
         else:
             is_shipping_method = False
 
         if (not is_shipping_method) and (self.operator == self.IS_SELECTED):
-            shipping_method = lfs.shipping.utils.get_selected_shipping_method(self.request)
+            shipping_method = self.facts.shipping_method
             return shipping_method in self.value.all()
         elif (not is_shipping_method) and (self.operator == self.IS_NOT_SELECTED):
-            shipping_method = lfs.shipping.utils.get_selected_shipping_method(self.request)
+            shipping_method = self.facts.shipping_method
             return shipping_method not in self.value.all()
         elif self.operator == self.IS_VALID:
             for sm in self.value.all():
@@ -774,10 +756,8 @@ class WeightCriterion(Criterion):
         """
         if self.product:
             weight = self.product.get_weight()
-        elif self.cart:
-            weight = sum([item.product.get_weight() * item.amount for item in self.cart.get_items()])
         else:
-            weight = 0
+            weight = self.facts.cart_weight
 
         if (self.operator == self.LESS_THAN) and (weight < self.value):
             return True
@@ -816,10 +796,8 @@ class WidthCriterion(Criterion):
         """
         if self.product:
             max_width = self.product.get_width()
-        elif self.cart and self.cart.get_items():
-            max_width = max([item.product.get_width() for item in self.cart.get_items()])
         else:
-            max_width = 0
+            max_width = self.facts.cart_max_width
 
         if self.operator == self.LESS_THAN and (max_width < self.value):
             return True
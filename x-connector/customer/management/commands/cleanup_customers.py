@@ -5,19 +5,47 @@ class Command(BaseCommand):
     args = ""
     help = "Remove unregistered customers without carts and orders"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            action="store",
+            dest="batch_size",
+            type=int,
+            default=1000,
+            help="Amount of customers which are removed at once",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            dest="dry_run",
+            default=False,
+            help="Only count the customers which would be removed",
+        )
+
     def handle(self, *args, **options):
+        from django.db.models import Exists, OuterRef
+
+        from lfs.cart.models import Cart
+        from lfs.core.utils import get_pk_batches
         from lfs.customer.models import Customer
+        from lfs.customer.utils import delete_customers
         from lfs.order.models import Order
-        from lfs.cart.models import Cart
+
+        customers = Customer.objects.filter(
+            ~Exists(Cart.objects.filter(session=OuterRef("session"))),
+            ~Exists(Order.objects.filter(session=OuterRef("session"))),
+            user__isnull=True,
+        )
 
         cnt = 0
-        for customer in Customer.objects.filter(user__isnull=True):
-            has_cart = Cart.objects.filter(session=customer.session).exists()
-            has_orders = Order.objects.filter(session=customer.session).exists()
-            if not has_cart and not has_orders:
-                for address in customer.addresses.all():
-                    if not address.order:
-                        address.delete()
-                customer.delete()
-                cnt += 1
-        print("Removed %s customers" % cnt)
+        for pks in get_pk_batches(customers, options["batch_size"]):
+            if options["dry_run"]:
+                cnt += len(pks)
+            else:
+                cnt += delete_customers(pks)
+                print("Removed %s customers so far" % cnt)
+
+        if options["dry_run"]:
+            print("Would remove %s customers" % cnt)
+        else:
+            print("Removed %s customers" % cnt)
@@ -167,6 +167,100 @@ class Customer(models.Model):
         app_label = "customer"
 
 
+class SessionCustomer(object):
+    """
+    A lightweight stand-in for a customer, which is stored within the session
+    of an anonymous visitor. It holds the selected shipping method, payment
+    method and country until the customer is needed for the checkout, see
+    ``lfs.customer.utils.get_or_create_customer``. Hence visitors, which only
+    browse the shop and fill the cart, don't create any customer or address
+    rows.
+
+    It provides the attributes of Customer, which are used before the
+    checkout. It has no addresses, bank account or credit card.
+    """
+
+    SESSION_KEY = "lfs_customer"
+
+    id = pk = None
+    user = None
+    selected_bank_account = None
+    selected_credit_card = None
+    selected_shipping_address = None
+    selected_invoice_address = None
+    default_shipping_address = None
+    default_invoice_address = None
+
+    def __init__(self, session):
+        self.session = session
+        data = session.get(self.SESSION_KEY, {})
+        self.selected_shipping_method_id = data.get("selected_shipping_method_id")
+        self.selected_payment_method_id = data.get("selected_payment_method_id")
+        self.selected_country_id = data.get("selected_country_id")
+
+    def __str__(self):
+        return "None/%s" % self.session.session_key
+
+    def _get_object(self, model, name):
+        pk = getattr(self, "%s_id" % name)
+        if pk is None:
+            return None
+        cached = self.__dict__.get("_%s" % name)
+        if cached is None or cached.pk != pk:
+            cached = self.__dict__["_%s" % name] = model.objects.filter(pk=pk).first()
+        return cached
+
+    def _set_object(self, name, obj):
+        setattr(self, "%s_id" % name, obj.pk if obj is not None else None)
+        self.__dict__["_%s" % name] = obj
+
+    @property
+    def selected_shipping_method(self):
+        return self._get_object(ShippingMethod, "selected_shipping_method")
+
+    @selected_shipping_method.setter
+    def selected_shipping_method(self, shipping_method):
+        self._set_object("selected_shipping_method", shipping_method)
+
+    @property
+    def selected_payment_method(self):
+        return self._get_object(PaymentMethod, "selected_payment_method")
+
+    @selected_payment_method.setter
+    def selected_payment_method(self, payment_method):
+        self._set_object("selected_payment_method", payment_method)
+
+    @property
+    def selected_country(self):
+        return self._get_object(Country, "selected_country")
+
+    @selected_country.setter
+    def selected_country(self, country):
+        self._set_object("selected_country", country)
+
+    def get_email_address(self):
+        return None
+
+    def get_selected_shipping_address(self):
+        return None
+
+    def save(self):
+        """Stores the stand-in within the session."""
+        from lfs.criteria.facts import invalidate_visitor_facts
+
+        # The selections are facts of criteria, see lfs.criteria.facts.
+        invalidate_visitor_facts(session=self.session.session_key)
+        self.session[self.SESSION_KEY] = {
+            "selected_shipping_method_id": self.selected_shipping_method_id,
+            "selected_payment_method_id": self.selected_payment_method_id,
+            "selected_country_id": self.selected_country_id,
+        }
+
+    def delete(self):
+        """Removes the stand-in from the session."""
+        self.session.pop(self.SESSION_KEY, None)
+
+
 class BankAccount(models.Model):
     """
     Stores all shop relevant data of a credit card.
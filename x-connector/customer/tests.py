@@ -1,18 +1,24 @@
 from django.http import HttpRequest
 from django.test import TestCase, Client
-from django.contrib.auth.models import User
+from django.contrib.auth.models import AnonymousUser, User
 from django.urls import reverse
 from django.core import mail
+from django.core.management import call_command
 
 from django.test.utils import override_settings
 from lfs.addresses.models import Address
+from lfs.addresses.models import BaseAddress
 from lfs.addresses.utils import AddressManagement
+from lfs.cart.models import Cart
 from lfs.core.models import Country
 from lfs.core.models import Shop
 from lfs.customer.models import CreditCard
 from lfs.customer.models import Customer
+from lfs.customer.models import SessionCustomer
 from lfs.customer.utils import create_unique_username
 from lfs.customer.utils import create_customer
+from lfs.customer.utils import get_or_create_customer
+from lfs.customer.utils import get_or_create_session_customer
 from lfs.shipping.models import ShippingMethod
 from lfs.tax.models import Tax
 from lfs.payment.models import PaymentMethod
@@ -81,6 +87,50 @@ class CustomerTestCase(TestCase):
         create_customer(request)
         self.assertEquals(Address.objects.count(), 4)
 
+    def test_session_customer(self):
+        request = HttpRequest()
+        request.user = AnonymousUser()
+        middleware = SessionMiddleware(lambda request: None)
+        middleware.process_request(request)
+
+        shipping_method = ShippingMethod.objects.get(name="Standard")
+        customer = get_or_create_session_customer(request)
+        self.assertTrue(isinstance(customer, SessionCustomer))
+        customer.selected_shipping_method = shipping_method
+        customer.save()
+
+        # No rows are created for the stand-in
+        self.assertEquals(Customer.objects.count(), 0)
+        self.assertEquals(Address.objects.count(), 0)
+
+        # The stand-in is restored from the session
+        del request.customer
+        customer = get_or_create_session_customer(request)
+        self.assertTrue(isinstance(customer, SessionCustomer))
+        self.assertEquals(customer.selected_shipping_method, shipping_method)
+
+        # The customer is created with the selections of the stand-in
+        customer = get_or_create_customer(request)
+        self.assertTrue(isinstance(customer, Customer))
+        self.assertEquals(customer.selected_shipping_method, shipping_method)
+        self.assertEquals(Address.objects.filter(customer=customer).count(), 4)
+        self.assertFalse(SessionCustomer.SESSION_KEY in request.session)
+
+    def test_cleanup_customers(self):
+        de = Country.objects.get(code="de")
+        for session in ("with-cart", "without-cart"):
+            customer = Customer.objects.create(session=session)
+            Address.objects.create(customer=customer, country=de)
+        Cart.objects.create(session="with-cart")
+
+        call_command("cleanup_customers", dry_run=True)
+        self.assertEquals(Customer.objects.count(), 2)
+
+        call_command("cleanup_customers", batch_size=1)
+        self.assertEquals(list(Customer.objects.values_list("session", flat=True)), ["with-cart"])
+        self.assertEquals(Address.objects.count(), 1)
+        self.assertEquals(BaseAddress.objects.count(), 1)
+
 
 class AddressTestCase(TestCase):
     fixtures = ["lfs_shop.xml"]
@@ -1,25 +1,47 @@
 # django imports
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
+from django.db import connection
+from django.db import transaction
 
 # lfs imports
 from lfs.addresses.settings import ADDRESS_MODEL
 from lfs.customer.models import Customer
+from lfs.customer.models import SessionCustomer
+from lfs.core.utils import delete_without_signals
 import lfs.core.utils
 
 
 def get_or_create_customer(request):
-    """Get or creates the customer object."""
+    """Get or creates the customer object. A SessionCustomer is replaced by a
+    customer with its selections.
+    """
+    customer = get_customer(request)
+    if customer is None or isinstance(customer, SessionCustomer):
+        customer = request.customer = create_customer(request, customer)
+
+    return customer
+
+
+def get_or_create_session_customer(request):
+    """Returns the customer for the given request or a SessionCustomer if
+    there is none yet. It is used to store the selected shipping method,
+    payment method and country, which doesn't require a customer with
+    addresses.
+    """
     customer = get_customer(request)
     if customer is None:
-        customer = request.customer = create_customer(request)
+        if request.session.session_key is None:
+            request.session.save()
+        customer = request.customer = SessionCustomer(request.session)
 
     return customer
 
 
-def create_customer(request):
+def create_customer(request, session_customer=None):
     """Creates a customer for the given request (which means for the current
-    logged in user/or the session user).
+    logged in user/or the session user). The selections of the passed
+    session_customer are taken over.
 
     This shouldn't be called directly. Instead get_or_create_customer should be
     called.
@@ -27,27 +49,37 @@ def create_customer(request):
     if request.session.session_key is None:
         request.session.save()
 
-    customer = Customer.objects.create(session=request.session.session_key)
+    customer = Customer(session=request.session.session_key)
     if request.user.is_authenticated:
         customer.user = request.user
-    shop = lfs.core.utils.get_default_shop(request)
+    if session_customer is not None:
+        customer.selected_shipping_method_id = session_customer.selected_shipping_method_id
+        customer.selected_payment_method_id = session_customer.selected_payment_method_id
+        customer.selected_country_id = session_customer.selected_country_id
+    customer.save()
 
+    shop = lfs.core.utils.get_default_shop(request)
     address_model = lfs.core.utils.import_symbol(ADDRESS_MODEL)
-    customer.default_invoice_address = address_model.objects.create(customer=customer, country=shop.default_country)
-    customer.default_shipping_address = address_model.objects.create(customer=customer, country=shop.default_country)
-    customer.selected_invoice_address = address_model.objects.create(customer=customer, country=shop.default_country)
-    customer.selected_shipping_address = address_model.objects.create(customer=customer, country=shop.default_country)
-    customer.save()
+    addresses = [address_model(customer=customer, country=shop.default_country) for i in range(4)]
 
-    customer.default_invoice_address.customer = customer
-    customer.default_invoice_address.save()
-    customer.default_shipping_address.customer = customer
-    customer.default_shipping_address.save()
+    # Addresses with multi-table inheritance can't be created with one bulk
+    # insert.
+    if not address_model._meta.parents and connection.features.can_return_rows_from_bulk_insert:
+        addresses = address_model.objects.bulk_create(addresses)
+    else:
+        for address in addresses:
+            address.save()
+
+    (
+        customer.default_invoice_address,
+        customer.default_shipping_address,
+        customer.selected_invoice_address,
+        customer.selected_shipping_address,
+    ) = addresses
+    customer.save()
 
-    customer.selected_invoice_address.customer = customer
-    customer.selected_invoice_address.save()
-    customer.selected_shipping_address.customer = customer
-    customer.selected_shipping_address.save()
+    if session_customer is not None:
+        session_customer.delete()
 
     return customer
 
@@ -59,7 +91,10 @@ def get_customer(request):
     try:
         return request.customer
     except AttributeError:
-        customer = request.customer = _get_customer(request)
+        customer = _get_customer(request)
+        if customer is None and SessionCustomer.SESSION_KEY in request.session:
+            customer = SessionCustomer(request.session)
+        request.customer = customer
         return customer
 
 
@@ -104,7 +139,34 @@ def update_customer_after_login(request):
             user_customer.save()
             session_customer.delete()
     except ObjectDoesNotExist:
-        pass
+        # The selections of an anonymous visitor without customer are within
+        # the session.
+        if SessionCustomer.SESSION_KEY in request.session:
+            session_customer = SessionCustomer(request.session)
+            try:
+                user_customer = Customer.objects.get(user=request.user)
+            except ObjectDoesNotExist:
+                pass
+            else:
+                user_customer.selected_shipping_method_id = session_customer.selected_shipping_method_id
+                user_customer.save()
+                session_customer.delete()
+
+
+def delete_customers(pks):
+    """Deletes the customers with passed primary keys. Their addresses are
+    deleted with one DELETE statement, unless they belong to an order. Returns
+    the amount of deleted customers.
+    """
+    from lfs.addresses.models import BaseAddress
+
+    # This bypasses the post_delete receiver of Address, which invalidates the
+    # visitor facts of the address's customer. The customer is deleted as well.
+    with transaction.atomic():
+        delete_without_signals(BaseAddress.objects.filter(customer__in=pks, order__isnull=True))
+        deleted, rows = Customer.objects.filter(pk__in=pks).delete()
+
+    return rows.get(Customer._meta.label, 0)
 
 
 def create_unique_username(email):
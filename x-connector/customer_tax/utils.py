@@ -10,13 +10,7 @@ def get_customer_tax_rate(request, product):
     if request and hasattr(request, cache_key):
         return getattr(request, cache_key)
 
-    all_cache_key = "all_customer_taxes"
-    customer_taxes = cache.get(all_cache_key)
-    if customer_taxes is None:
-        customer_taxes = CustomerTax.objects.all()
-        cache.set(all_cache_key, customer_taxes)
-
-    customer_tax = get_first_valid(request, customer_taxes, product)
+    customer_tax = get_first_valid(request, get_customer_taxes(), product)
     if customer_tax:
         taxrate = customer_tax.rate
     else:
@@ -26,6 +20,16 @@ def get_customer_tax_rate(request, product):
     return taxrate
 
 
+def get_customer_taxes():
+    """Returns all customer taxes."""
+    all_cache_key = "all_customer_taxes"
+    customer_taxes = cache.get(all_cache_key)
+    if customer_taxes is None:
+        customer_taxes = CustomerTax.objects.all()
+        cache.set(all_cache_key, customer_taxes)
+    return customer_taxes
+
+
 def _calc_product_tax_rate(request, product):
     try:
         return product.get_product_tax_rate(request)
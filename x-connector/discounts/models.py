@@ -80,10 +80,10 @@ class Discount(models.Model, Criteria):
             cart = lfs.cart.utils.get_cart(request)
 
             if cart is not None:
-                items = cart.get_items()
+                product_ids = set(self.products.values_list("pk", flat=True))
                 total = 0.0
-                if items.exists():
-                    for item in items.filter(product__in=self.products.all()):
+                for item in cart.get_totals(request).items:
+                    if item.product_id in product_ids:
                         if self.type == DISCOUNT_TYPE_ABSOLUTE:
                             total += self.value
                         else:
@@ -110,7 +110,7 @@ class Discount(models.Model, Criteria):
     def is_valid(self, request, product=None):
         if self.products.exists():
             cart = lfs.cart.utils.get_cart(request)
-            items = cart.get_items()
-            if not items.filter(product__in=self.products.all()).exists():
+            product_ids = set(self.products.values_list("pk", flat=True))
+            if not any(item.product_id in product_ids for item in cart.get_totals(request).items):
                 return False
         return super(Discount, self).is_valid(request, product)
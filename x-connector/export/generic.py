@@ -1,13 +1,21 @@
 import csv
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+
+
+class Echo(object):
+    """A file-like object which returns the written value instead of storing
+    it. Used to stream the rows written by a csv writer.
+    """
+
+    def write(self, value):
+        return value
 
 
 def export(request, export):
     """Generic export method."""
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = "attachment; filename=%s.csv" % export.name
-    writer = csv.writer(response, delimiter=";", quotechar='"', quoting=csv.QUOTE_ALL)
+    writer = csv.writer(Echo(), delimiter=";", quotechar='"', quoting=csv.QUOTE_ALL)
+    rows = (writer.writerow((product.get_name(),)) for product in export.iter_products())
 
-    for product in export.get_products():
-        writer.writerow((product.get_name().encode("utf-8"),))
+    response = StreamingHttpResponse(rows, content_type="text/csv")
+    response["Content-Disposition"] = "attachment; filename=%s.csv" % export.name
     return response
@@ -0,0 +1,49 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Writes the feed of the export with the given slug into a file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("slug", help="The slug of the export")
+        parser.add_argument(
+            "--output",
+            action="store",
+            dest="output",
+            default=None,
+            help="The file the feed is written to. Defaults to <slug>.csv",
+        )
+
+    def handle(self, *args, **options):
+        """ """
+        import lfs.core.utils
+        from lfs.export.models import Export
+
+        try:
+            export = Export.objects.select_related("script").get(slug=options["slug"])
+        except Export.DoesNotExist:
+            raise CommandError("Export %s does not exist" % options["slug"])
+
+        if export.script is None:
+            raise CommandError("Export %s has no script" % options["slug"])
+
+        module = lfs.core.utils.import_module(export.script.module)
+        response = getattr(module, export.script.method)(None, export)
+
+        if response.streaming:
+            content = response.streaming_content
+        else:
+            content = [response.content]
+
+        # The feed is written into a temporary file first, hence a feed which
+        # is fetched in the meantime is never incomplete.
+        output = options["output"] or "%s.csv" % export.slug
+        temp = "%s.tmp" % output
+        with open(temp, "wb") as fh:
+            for chunk in content:
+                fh.write(chunk)
+        os.replace(temp, output)
+
+        print("Written export %s to %s" % (export.slug, output))
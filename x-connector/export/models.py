@@ -1,6 +1,7 @@
 # django imports
 from django.urls import reverse
 from django.db import models
+from django.db.models import Prefetch
 from django.utils.translation import gettext_lazy as _
 
 # lfs imports
@@ -8,6 +9,7 @@ from lfs.catalog.models import Category
 from lfs.catalog.models import Product
 from lfs.export.settings import CATEGORY_VARIANTS_CHOICES
 from lfs.export.settings import CATEGORY_VARIANTS_DEFAULT
+from lfs.export.settings import EXPORT_CHUNK_SIZE
 
 
 class Export(models.Model):
@@ -35,18 +37,28 @@ class Export(models.Model):
 
     def get_products(self):
         """Returns selected products. Takes variant options into account."""
+        return list(self.iter_products())
+
+    def iter_products(self, chunk_size=EXPORT_CHUNK_SIZE):
+        """Yields selected products. Takes variant options into account.
+
+        The products are loaded in chunks of chunk_size together with their
+        categories and variants, hence the memory usage doesn't depend on the
+        amount of selected products.
+        """
         import lfs.export.utils
 
-        products = []
+        category_options = lfs.export.utils.get_category_options(self)
+        variants = Product.objects.filter(active=True).order_by("variant_position")
+        products = self.products.select_related("default_variant").prefetch_related(
+            "categories", Prefetch("variants", queryset=variants, to_attr="export_variants")
+        )
 
-        for product in self.products.all():
-            products.append(product)
+        for product in products.iterator(chunk_size=chunk_size):
+            yield product
             if product.is_product_with_variants():
-                variants = lfs.export.utils.get_variants(product, self)
-                if variants:
-                    products.extend(variants)
-
-        return products
+                for variant in lfs.export.utils.get_variants(product, self, category_options):
+                    yield variant
 
 
 class Script(models.Model):
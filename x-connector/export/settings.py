@@ -1,4 +1,5 @@
 # django imports
+from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
 CATEGORY_VARIANTS_NONE = 0
@@ -12,3 +13,6 @@ CATEGORY_VARIANTS_CHOICES = (
     (CATEGORY_VARIANTS_CHEAPEST, _("Cheapest")),
     (CATEGORY_VARIANTS_ALL, _("All")),
 )
+
+# The amount of products which are loaded at once while exporting.
+EXPORT_CHUNK_SIZE = getattr(settings, "LFS_EXPORT_CHUNK_SIZE", 500)
@@ -0,0 +1,57 @@
+from django.test import TestCase
+
+from lfs.catalog.models import Category
+from lfs.catalog.models import Product
+from lfs.catalog.settings import PRODUCT_WITH_VARIANTS
+from lfs.catalog.settings import VARIANT
+from lfs.export.generic import export as generic_export
+from lfs.export.models import CategoryOption
+from lfs.export.models import Export
+from lfs.export.settings import CATEGORY_VARIANTS_ALL
+from lfs.export.settings import CATEGORY_VARIANTS_CHEAPEST
+from lfs.export.settings import CATEGORY_VARIANTS_DEFAULT
+
+
+class ExportTestCase(TestCase):
+    """Tests the export of products."""
+
+    def setUp(self):
+        """ """
+        self.c1 = Category.objects.create(name="Category 1", slug="category-1")
+        self.c2 = Category.objects.create(name="Category 2", slug="category-2", parent=self.c1)
+
+        self.p1 = Product.objects.create(name="Product 1", slug="product-1", sub_type=PRODUCT_WITH_VARIANTS)
+        self.p1.categories.add(self.c2)
+
+        self.v1 = Product.objects.create(
+            name="Variant 1", slug="variant-1", sub_type=VARIANT, parent=self.p1, active=True, active_price=True
+        )
+        self.v1.price = 20
+        self.v1.variant_position = 1
+        self.v1.save()
+
+        self.v2 = Product.objects.create(
+            name="Variant 2", slug="variant-2", sub_type=VARIANT, parent=self.p1, active=True, active_price=True
+        )
+        self.v2.price = 10
+        self.v2.variant_position = 2
+        self.v2.save()
+
+        self.export = Export.objects.create(name="Export", slug="export", variants_option=CATEGORY_VARIANTS_DEFAULT)
+        self.export.products.add(self.p1)
+
+    def test_get_products(self):
+        """ """
+        self.assertEqual(self.export.get_products(), [self.p1, self.v1])
+
+        # The option of the nearest category is taken
+        CategoryOption.objects.create(export=self.export, category=self.c1, variants_option=CATEGORY_VARIANTS_CHEAPEST)
+        self.assertEqual(self.export.get_products(), [self.p1, self.v2])
+
+        CategoryOption.objects.create(export=self.export, category=self.c2, variants_option=CATEGORY_VARIANTS_ALL)
+        self.assertEqual(self.export.get_products(), [self.p1, self.v1, self.v2])
+
+    def test_generic_export(self):
+        """ """
+        response = generic_export(None, self.export)
+        self.assertEqual(b"".join(response.streaming_content), b'"Product 1"\r\n"Product 1"\r\n')
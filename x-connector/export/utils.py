@@ -20,39 +20,74 @@ def register(method, name):
         pass
 
 
-def get_variants_option(export, product):
-    """Returns the variants option for given category or None."""
+def get_category_options(export):
+    """Returns a dict with the ids of all categories which have a variants
+    option for given export and the option.
+    """
+    return dict(CategoryOption.objects.filter(export=export).values_list("category_id", "variants_option"))
+
+
+def get_variants_option(export, product, category_options=None):
+    """Returns the variants option for given category or None.
+
+    The option of the first category of the product is taken. If it has none
+    the option of the nearest parent category is taken. If passed,
+    category_options (see ``get_category_options``) is used instead of
+    loading the options of the export.
+    """
     try:
-        category = product.get_categories()[0]
+        category = product.get_parent().categories.all()[0]
     except IndexError:
         return None
 
-    while category:
-        try:
-            category_option = CategoryOption.objects.get(export=export, category=category)
-        except:
-            category = category.parent
-        else:
-            return category_option.variants_option
+    if category_options is None:
+        category_options = get_category_options(export)
+
+    for category_id in reversed(category.get_path_ids() or [category.id]):
+        if category_id in category_options:
+            return category_options[category_id]
     return None
 
 
-def get_variants(product, export):
-    """Returns the variants for given product and export."""
-    variants_option = get_variants_option(export, product)
+def get_stored_price(variant):
+    """Returns the stored price of given variant, i.e. the price or the sale
+    price of the variant or its parent, without any tax calculations.
+    """
+    if variant.get_for_sale():
+        if variant.active_for_sale_price:
+            return variant.for_sale_price
+        return variant.parent.for_sale_price
+    elif variant.active_price:
+        return variant.price
+    return variant.parent.price
+
+
+def get_variants(product, export, category_options=None):
+    """Returns the variants for given product and export.
+
+    Uses the active variants of the product, which have been prefetched into
+    ``export_variants`` (see ``lfs.export.models.Export.iter_products``), if
+    available.
+    """
+    variants_option = get_variants_option(export, product, category_options)
     if variants_option is None:
         variants_option = export.variants_option
 
+    variants = getattr(product, "export_variants", None)
+    if variants is None:
+        variants = product.get_variants()
+
     if variants_option == CATEGORY_VARIANTS_DEFAULT:
-        if product.get_default_variant():
-            return [product.get_default_variant()]
+        if product.default_variant_id is not None:
+            return [product.default_variant]
+        elif variants:
+            return [variants[0]]
         else:
             return []
     elif variants_option == CATEGORY_VARIANTS_ALL:
-        return product.get_variants()
+        return variants
     elif variants_option == CATEGORY_VARIANTS_CHEAPEST:
-        variants = list(product.get_variants())
-        variants.sort(key=lambda k: k.get_price())
+        variants = sorted(variants, key=get_stored_price)
         try:
             return [variants[0]]
         except IndexError:
@@ -2,6 +2,7 @@ import json
 
 from django import forms
 from django.contrib.auth.decorators import permission_required
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator, EmptyPage
 from django.urls import reverse
 from django.db import IntegrityError
@@ -17,6 +18,7 @@ from django.views.decorators.http import require_POST
 from django.forms.widgets import HiddenInput
 from django.conf import settings
 
+import lfs.catalog.utils
 import lfs.core.utils
 from lfs.caching.utils import lfs_get_object_or_404
 from lfs.catalog.models import Category
@@ -629,63 +631,84 @@ def save_products(request):
     paginator = Paginator(products, request.session.get("product_filters", {}).get("amount", 25))
     page = paginator.page((request.POST if request.method == "POST" else request.GET).get("page", 1))
 
+    msg = ""
     if request.POST.get("action") == "delete":
-        for key, value in request.POST.items():
-            if key.startswith("delete-"):
-                id = key.split("-")[1]
-
-                try:
-                    product = Product.objects.get(pk=id)
-                except Product.DoesNotExist:
-                    continue
-                else:
-                    product.delete()
+        ids = [key.split("-")[1] for key in request.POST.keys() if key.startswith("delete-")]
+        Product.objects.filter(pk__in=ids).delete()
         msg = _("Products have been deleted.")
         # switch to the first page because after some products are removed current page might be out of range
         page = paginator.page(1)
 
     elif request.POST.get("action") == "save":
-        for key, value in request.POST.items():
-            if key.startswith("id-"):
-                id = value
-
-                try:
-                    product = Product.objects.get(pk=id)
-                except Product.DoesNotExist:
-                    continue
-
-                product.name = request.POST.get("name-%s" % id, "")
-                product.sku = request.POST.get("sku-%s" % id, "")
-                product.slug = request.POST.get("slug-%s" % id, "")
-                product.sub_type = request.POST.get("sub_type-%s" % id, 0)
-
-                try:
-                    price = request.POST.get("price-%s" % id, "0")
-                    product.price = atof(price)
-                except ValueError:
-                    product.price = 0
-                try:
-                    for_sale_price = request.POST.get("for_sale_price-%s" % id, "0")
-                    product.for_sale_price = atof(for_sale_price)
-                except ValueError:
-                    product.for_sale_price = 0
-
-                if request.POST.get("for_sale-%s" % id):
-                    product.for_sale = True
-                else:
-                    product.for_sale = False
-
-                if request.POST.get("active-%s" % id):
-                    product.active = True
-                else:
-                    product.active = False
-
-                # TODO: remove IntegrityError and apply some kind of form/formset validation
-                try:
-                    product.save()
-                except IntegrityError:
-                    pass
+        ids = [value for key, value in request.POST.items() if key.startswith("id-")]
+        saved_products = list(Product.objects.filter(pk__in=ids))
+        for product in saved_products:
+            id = product.id
+
+            product.name = request.POST.get("name-%s" % id, "")
+            product.sku = request.POST.get("sku-%s" % id, "")
+            product.slug = request.POST.get("slug-%s" % id, "")
+            product.sub_type = request.POST.get("sub_type-%s" % id, 0)
+
+            try:
+                price = request.POST.get("price-%s" % id, "0")
+                product.price = atof(price)
+            except ValueError:
+                product.price = 0
+            try:
+                for_sale_price = request.POST.get("for_sale_price-%s" % id, "0")
+                product.for_sale_price = atof(for_sale_price)
+            except ValueError:
+                product.for_sale_price = 0
+
+            if request.POST.get("for_sale-%s" % id):
+                product.for_sale = True
+            else:
+                product.for_sale = False
 
+            if request.POST.get("active-%s" % id):
+                product.active = True
+            else:
+                product.active = False
+
+        # Products with invalid values or with a slug which is already taken
+        # are not saved.
+        fields = ["name", "sku", "slug", "sub_type", "price", "for_sale_price", "for_sale", "active"]
+        valid_products = []
+        invalid_products = []
+        for product in saved_products:
+            try:
+                for field_name in fields:
+                    field = Product._meta.get_field(field_name)
+                    field.clean(getattr(product, field.attname), product)
+            except ValidationError:
+                invalid_products.append(product)
+            else:
+                valid_products.append(product)
+
+        # The slugs of the products which are not saved stay taken.
+        taken_slugs = set(
+            Product.objects.filter(slug__in=[product.slug for product in valid_products])
+            .exclude(pk__in=[product.id for product in valid_products])
+            .values_list("slug", flat=True)
+        )
+        for product in list(valid_products):
+            if product.slug in taken_slugs:
+                valid_products.remove(product)
+                invalid_products.append(product)
+            else:
+                taken_slugs.add(product.slug)
+
+        try:
+            lfs.catalog.utils.bulk_save_products(valid_products, fields, request)
+        except IntegrityError as e:
+            msg = _("Products couldn't be saved: %(error)s") % {"error": e}
+        else:
+            if invalid_products:
+                msg = _("Products have been saved, except for invalid ones: %(products)s") % {
+                    "products": ", ".join([product.name or str(product.id) for product in invalid_products])
+                }
+            else:
                 msg = _("Products have been saved")
 
     html = (
@@ -10,7 +10,6 @@ from django.db import IntegrityError
 from django.forms import ModelForm, ChoiceField
 from django.forms.widgets import Select
 from django.http import HttpResponse
-from django.template.defaultfilters import slugify
 from django.template.loader import render_to_string
 from django.utils.translation import gettext_lazy as _
 
@@ -25,7 +24,8 @@ from lfs.catalog.models import PropertyOption
 from lfs.catalog.settings import CATEGORY_VARIANT_CHOICES
 from lfs.catalog.settings import PROPERTY_VALUE_TYPE_FILTER
 from lfs.catalog.settings import PROPERTY_VALUE_TYPE_VARIANT
-from lfs.catalog.settings import VARIANT, PROPERTY_SELECT_FIELD
+from lfs.catalog.settings import PROPERTY_SELECT_FIELD
+from lfs.catalog.utils import create_variants
 from lfs.core.utils import LazyEncoder
 from lfs.core.utils import atof
 from lfs.manage import utils as manage_utils
@@ -75,59 +75,6 @@ class ProductVariantSimpleForm(ModelForm):
         )
 
 
-class ProductVariantCreateForm(ModelForm):
-    """Form used to create product variant for specific set of options"""
-
-    def __init__(self, options=None, product=None, *args, **kwargs):
-        super(ProductVariantCreateForm, self).__init__(*args, **kwargs)
-        self.fields["slug"].required = False
-        self.options = options
-        self.product = product
-
-    def prepare_slug(self, slug):
-        for option in self.options:
-            property_group_id, property_id, option_id = option.split("|")
-            o = PropertyOption.objects.get(pk=option_id)
-            if slug:
-                slug += "-"
-            slug += slugify(o.name)
-
-        product_slug = self.product.slug
-        if product_slug is None:
-            product_slug = ""
-        if product_slug + slug.replace("-", "") == "":
-            slug = ""
-        else:
-            slug = "%s-%s" % (product_slug, slug)
-            slug = slug.rstrip("-")
-
-        # create unique slug
-        slug = slug[:80]
-        new_slug = slug
-        counter = 1
-        while Product.objects.filter(slug=new_slug).exists():
-            new_slug = "%s-%s" % (slug[: (79 - len(str(counter)))], counter)
-            counter += 1
-        slug = new_slug
-
-        return slug
-
-    def clean(self):
-        cleaned_data = super(ProductVariantCreateForm, self).clean()
-        slug = self.prepare_slug(cleaned_data.get("slug", ""))
-        cleaned_data["slug"] = slug
-
-        return cleaned_data
-
-    class Meta:
-        model = Product
-        fields = (
-            "slug",
-            "name",
-            "price",
-        )
-
-
 class CategoryVariantForm(ModelForm):
     """ """
 
@@ -502,9 +449,6 @@ def add_variants(request, product_id):
     added_count = 0
 
     if variant_simple_form.is_valid():
-        # Add variant(s)
-        variants_count = product.variants.count()
-
         # First we need to prepare the requested properties for the use
         # with cartesian product. That means if the keyword "all" is
         # found we collect all options of this properties.
@@ -522,60 +466,31 @@ def add_variants(request, product_id):
                 else:
                     properties.append(["%s|%s|%s" % (property_group_id, property_id, value)])
 
-        # Create a variant for every requested option combination
-        for i, options in enumerate(manage_utils.cartesian_product(*properties)):
-            if product.has_variant(options, only_active=False):
-                continue
-
-            pvcf = ProductVariantCreateForm(options=options, product=product, data=request.POST)
-            if pvcf.is_valid():
-                variant = pvcf.save(commit=False)
-                variant.sku = "%s-%s" % (product.sku, i + 1)
-                variant.parent = product
-                variant.variant_position = (variants_count + i + 1) * 10
-                variant.sub_type = VARIANT
-
-                try:
-                    variant.save()
-                    added_count += 1
-                except IntegrityError:
-                    continue
-
-                # By default we copy the property groups of the product to
-                # the variants
-                for property_group in product.property_groups.all():
-                    variant.property_groups.add(property_group)
-
-                # Save the value for this product and property.
-                for option in options:
-                    property_group_id, property_id, option_id = option.split("|")
-                    # local properties are not bound to property groups
-                    property_group_id = None if property_group_id == "0" else property_group_id
-                    ProductPropertyValue.objects.create(
-                        product=variant,
-                        property_group_id=property_group_id,
-                        property_id=property_id,
-                        value=option_id,
-                        type=PROPERTY_VALUE_TYPE_VARIANT,
-                    )
-                    # By default we create also the filter values as this most of
-                    # the users would expect.
-                    if Property.objects.get(pk=property_id).filterable:
-                        ProductPropertyValue.objects.create(
-                            product=variant,
-                            property_group_id=property_group_id,
-                            property_id=property_id,
-                            value=option_id,
-                            type=PROPERTY_VALUE_TYPE_FILTER,
-                        )
-            else:
-                continue
+        # Create a variant for every requested option combination at once
+        combinations = list(manage_utils.cartesian_product(*properties))
+        kwargs = {
+            "slug": variant_simple_form.cleaned_data.get("slug") or "",
+            "name": variant_simple_form.cleaned_data.get("name") or "",
+            "price": variant_simple_form.cleaned_data.get("price") or 0.0,
+        }
+        try:
+            variants = create_variants(product, combinations, **kwargs)
+        except IntegrityError:
+            # A product with one of the slugs has been added meanwhile, hence
+            # the slugs are calculated once more.
+            try:
+                variants = create_variants(product, combinations, **kwargs)
+            except IntegrityError:
+                variants = None
+
+        if variants is None:
+            message = _("Variants couldn't be added. Please try again.")
         else:
+            added_count = len(variants)
             message = _("No variants have been added.")
-
             if added_count > 0:
                 message = _("Variants have been added.")
-        variant_simple_form = ProductVariantSimpleForm(all_properties=all_properties)
+            variant_simple_form = ProductVariantSimpleForm(all_properties=all_properties)
 
     html = (
         ("#selectable-products-inline", _selectable_products_inline(request, product)),
@@ -14,6 +14,7 @@ from lfs.catalog.models import (
     ProductPropertyValue,
 )
 from lfs.catalog.settings import PRODUCT_WITH_VARIANTS, PROPERTY_SELECT_FIELD, VARIANT, PROPERTY_VALUE_TYPE_VARIANT
+from lfs.catalog.settings import STANDARD_PRODUCT
 from lfs.core.models import Country
 from lfs.criteria.models import Criterion, CountryCriterion
 from lfs.shipping.models import ShippingMethod, ShippingMethodPrice
@@ -96,6 +97,39 @@ class ManageTestCase(TestCase):
         p = Product.objects.get(pk=p.pk)
         self.assertEqual(p.sub_type, PRODUCT_WITH_VARIANTS)
 
+    def test_save_products(self):
+        """Products with invalid values are not saved and reported."""
+        p1 = Product.objects.create(name="Product 1", slug="product-1")
+        p2 = Product.objects.create(name="Product 2", slug="product-2")
+        p3 = Product.objects.create(name="Product 3", slug="product-3")
+
+        data = {"action": "save"}
+        for product, slug, sub_type in (
+            (p1, "product-1-new", STANDARD_PRODUCT),
+            (p2, "product-3", STANDARD_PRODUCT),
+            (p3, "product-3", "unknown"),
+        ):
+            data.update(
+                {
+                    "id-%s" % product.pk: product.pk,
+                    "name-%s" % product.pk: "%s new" % product.name,
+                    "slug-%s" % product.pk: slug,
+                    "sub_type-%s" % product.pk: sub_type,
+                    "price-%s" % product.pk: "1",
+                }
+            )
+
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.post(reverse("lfs_manage_save_products"), data)
+        message = json.loads(response.content)["message"]
+        self.assertTrue("Product 2 new" in message)
+        self.assertTrue("Product 3 new" in message)
+        self.assertFalse("Product 1 new" in message)
+
+        self.assertEqual(Product.objects.get(pk=p1.pk).slug, "product-1-new")
+        self.assertEqual(Product.objects.get(pk=p2.pk).slug, "product-2")
+        self.assertEqual(Product.objects.get(pk=p3.pk).sub_type, STANDARD_PRODUCT)
+
     def test_manage_add_property(self):
         p = Product.objects.create(name="Product1", slug="product1", sub_type=PRODUCT_WITH_VARIANTS)
         self.client.login(username=self.username, password=self.password)
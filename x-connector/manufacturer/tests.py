@@ -2,6 +2,7 @@
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.test import TestCase
+import lfs.catalog.utils
 from lfs.catalog.models import Product, Category
 from lfs.manufacturer.models import Manufacturer
 
@@ -41,6 +42,29 @@ class ManufacturersTestCase(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
 
+    def test_manufacturer_product_pages(self):
+        """Pages are loaded via the cursors of the previous and next page."""
+        for product in (self.p1, self.p2, self.p3):
+            product.manufacturer = self.m1
+            product.save()
+
+        products = self.m1.get_filtered_products({}, None, "effective_price")
+
+        page = lfs.catalog.utils.get_product_page(products, "effective_price", 2, 3)
+        self.assertEqual(list(page.object_list), [self.p3, self.p2])
+        self.assertEqual(page.num_pages, 2)
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+        page = lfs.catalog.utils.get_product_page(products, "effective_price", 2, 3, 2, after=page.next_cursor)
+        self.assertEqual(list(page.object_list), [self.p1])
+        self.assertFalse(page.has_next())
+        self.assertTrue(page.has_previous())
+
+        page = lfs.catalog.utils.get_product_page(products, "effective_price", 2, 3, 1, before=page.previous_cursor)
+        self.assertEqual(list(page.object_list), [self.p3, self.p2])
+        self.assertFalse(page.has_previous())
+
     def test_manufacturer_breadcrumbs(self):
         """If the product is visited from the manufacturer page, then manufacturer should be visible in breadcrumbs.
         If the product is visited from the category page, then category should be visible in breadcrumbs.
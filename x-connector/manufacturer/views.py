@@ -1,11 +1,11 @@
 from django.conf import settings
 from django.urls import reverse
 from django.shortcuts import render
-from django.core.cache import cache
 from django.core.paginator import Paginator, EmptyPage, InvalidPage
 from django.template.loader import render_to_string
 
-from django.utils.translation import gettext
+from django.utils.translation import gettext, ngettext
+import lfs.catalog.utils
 from lfs.caching.utils import lfs_get_object_or_404
 from lfs.manufacturer.models import Manufacturer
 from lfs.core.utils import lfs_pagination
@@ -76,39 +76,35 @@ def manufacturer_products(request, slug, start=1, template_name="lfs/manufacture
     try:
         default_sorting = settings.LFS_PRODUCTS_SORTING
     except AttributeError:
-        default_sorting = "price"
+        default_sorting = "effective_price"
 
     sorting = request.session.get("sorting", default_sorting)
     product_filter = request.session.get("product-filter", {})
-    product_filter = product_filter.items()
 
-    cache_key = "%s-manufacturer-products-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, slug)
-    sub_cache_key = "%s-start-%s-sorting-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, start, sorting)
+    manufacturer = lfs_get_object_or_404(Manufacturer, slug=slug)
+
+    # The cursors of the previous and next page, see lfs.catalog.utils.get_product_page
+    after = request.GET.get("after")
+    before = request.GET.get("before")
 
-    filter_key = ["%s-%s" % (i[0], i[1]) for i in product_filter]
-    if filter_key:
-        sub_cache_key += "-%s" % "-".join(filter_key)
+    filter_key = "sorting-%s" % sorting
+    for i in sorted(product_filter.items()):
+        filter_key += "-%s-%s" % (i[0], i[1])
 
     price_filter = request.session.get("price-filter")
     if price_filter:
-        sub_cache_key += "-%s-%s" % (price_filter["min"], price_filter["max"])
+        filter_key += "-%s-%s" % (price_filter["min"], price_filter["max"])
 
-    temp = cache.get(cache_key)
-    if temp is not None:
-        try:
-            return temp[sub_cache_key]
-        except KeyError:
-            pass
-    else:
-        temp = dict()
-
-    manufacturer = lfs_get_object_or_404(Manufacturer, slug=slug)
+    # Only the pages which are requested by their number are cached. The
+    # pages of cursors would fill the bounded cache with rarely reused entries.
+    cursor_page = after is not None or before is not None
+    sub_cache_key = "start-%s-%s" % (start, filter_key)
 
-    # Calculates parameters for display.
-    try:
-        start = int(start)
-    except (ValueError, TypeError):
-        start = 1
+    products_cache = lfs.catalog.utils.get_manufacturer_products_cache(manufacturer)
+    if not cursor_page:
+        result = products_cache.get(sub_cache_key)
+        if result is not None:
+            return result
 
     format_info = manufacturer.get_format_info()
     amount_of_rows = format_info["product_rows"]
@@ -117,13 +113,16 @@ def manufacturer_products(request, slug, start=1, template_name="lfs/manufacture
 
     all_products = manufacturer.get_filtered_products(product_filter, price_filter, sorting)
 
-    # prepare paginator
-    paginator = Paginator(all_products, amount)
+    # The amount of products is shared by all pages
+    count_key = "count-%s" % filter_key
+    amount_of_products = products_cache.get(count_key)
+    if amount_of_products is None:
+        amount_of_products = all_products.count()
+        products_cache.set(count_key, amount_of_products)
 
-    try:
-        current_page = paginator.page(start)
-    except (EmptyPage, InvalidPage):
-        current_page = paginator.page(paginator.num_pages)
+    current_page = lfs.catalog.utils.get_product_page(
+        all_products, sorting, amount, amount_of_products, start, after, before
+    )
 
     # Calculate products
     row = []
@@ -155,12 +154,12 @@ def manufacturer_products(request, slug, start=1, template_name="lfs/manufacture
     if len(row) > 0:
         products.append(row)
 
-    amount_of_products = all_products.count()
-
     # Calculate urls
-    pagination_data = lfs_pagination(request, current_page, url=manufacturer.get_absolute_url())
+    pagination_data = lfs.catalog.utils.get_product_pagination(
+        request, current_page, url=manufacturer.get_absolute_url()
+    )
 
-    pagination_data["total_text"] = ungettext("%(count)d product", "%(count)d products", amount_of_products) % {
+    pagination_data["total_text"] = ngettext("%(count)d product", "%(count)d products", amount_of_products) % {
         "count": amount_of_products
     }
 
@@ -176,6 +175,6 @@ def manufacturer_products(request, slug, start=1, template_name="lfs/manufacture
         },
     )
 
-    temp[sub_cache_key] = result
-    cache.set(cache_key, temp)
+    if not cursor_page:
+        products_cache.set(sub_cache_key, result)
     return result
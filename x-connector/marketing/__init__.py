@@ -0,0 +1 @@
+default_app_config = "lfs.marketing.apps.LfsMarketingAppConfig"
@@ -0,0 +1,28 @@
+from django.dispatch import receiver
+
+from lfs.core.signals import order_created
+from lfs.core.signals import order_state_changed
+from lfs.marketing.utils import EXCLUDED_ORDER_STATES
+from lfs.marketing.utils import get_order_sales
+from lfs.marketing.utils import update_product_sales
+
+
+@receiver(order_created)
+def order_created_listener(sender, **kwargs):
+    """Adds the sales of the new order to the product sales."""
+    if sender.state not in EXCLUDED_ORDER_STATES:
+        update_product_sales(get_order_sales(sender))
+
+
+@receiver(order_state_changed)
+def order_state_changed_listener(sender, **kwargs):
+    """Adds or removes the sales of the order to or from the product sales if
+    the order has been canceled or reopened.
+    """
+    old_excluded = kwargs.get("old_state") in EXCLUDED_ORDER_STATES
+    new_excluded = sender.state in EXCLUDED_ORDER_STATES
+
+    if old_excluded and not new_excluded:
+        update_product_sales(get_order_sales(sender))
+    elif new_excluded and not old_excluded:
+        update_product_sales(get_order_sales(sender), factor=-1)
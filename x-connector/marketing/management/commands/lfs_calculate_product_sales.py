@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Recalculates the sales of all products, which are used for the topsellers"
+
+    def handle(self, *args, **options):
+        """ """
+        import lfs.marketing.utils
+        from lfs.marketing.models import ProductSales
+
+        lfs.marketing.utils.calculate_product_sales()
+        print("Calculated sales of %s products" % ProductSales.objects.count())
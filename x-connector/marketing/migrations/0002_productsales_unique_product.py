@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+def merge_product_sales(apps, schema_editor):
+    ProductSales = apps.get_model("marketing", "ProductSales")
+    duplicates = (
+        ProductSales.objects.values("product_id")
+        .annotate(count=models.Count("id"), sales=models.Sum("sales"))
+        .filter(count__gt=1)
+        .order_by()
+    )
+    for duplicate in list(duplicates):
+        product_sales = ProductSales.objects.filter(product_id=duplicate["product_id"]).order_by("id")
+        first = product_sales[0]
+        product_sales.exclude(pk=first.pk).delete()
+        ProductSales.objects.filter(pk=first.pk).update(sales=duplicate["sales"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("marketing", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_product_sales, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="productsales",
+            constraint=models.UniqueConstraint(fields=("product",), name="marketing_productsales_product_unique"),
+        ),
+    ]
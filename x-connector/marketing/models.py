@@ -29,6 +29,9 @@ class ProductSales(models.Model):
 
     class Meta:
         app_label = "marketing"
+        constraints = [
+            models.UniqueConstraint(fields=["product"], name="marketing_productsales_product_unique"),
+        ]
 
 
 class FeaturedProduct(models.Model):
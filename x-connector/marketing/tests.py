@@ -6,12 +6,19 @@ from django.utils import timezone
 from lfs.addresses.models import Address
 from lfs.catalog.models import Category
 from lfs.catalog.models import Product
+from lfs.catalog.settings import PRODUCT_WITH_VARIANTS
+from lfs.catalog.settings import VARIANT
+from lfs.core.signals import order_created
+from lfs.core.signals import order_state_changed
 import lfs.marketing.utils
+from lfs.marketing.models import ProductSales
 from lfs.marketing.models import Topseller
 from lfs.marketing.utils import calculate_product_sales
 from lfs.order.models import Order
 from lfs.order.models import OrderItem
+from lfs.order.settings import CANCELED
 from lfs.order.settings import CLOSED
+from lfs.order.settings import SUBMITTED
 
 
 class RatingMailTestCase(TestCase):
@@ -112,6 +119,36 @@ class TopsellerUtilsTestCase(TestCase):
 
         calculate_product_sales()
 
+    def test_update_product_sales(self):
+        """Tests the incremental update of the product sales."""
+        self.p1.sub_type = PRODUCT_WITH_VARIANTS
+        self.p1.save()
+        v1 = Product.objects.create(name="Variant 1", slug="variant-1", sub_type=VARIANT, parent=self.p1, active=True)
+
+        address = Address.objects.create()
+        order = Order.objects.create(invoice_address=address, shipping_address=address)
+        OrderItem.objects.create(order=order, product_amount=5, product=v1)
+        with self.captureOnCommitCallbacks(execute=True):
+            order_created.send(order)
+
+        # The sales of variants are counted for the parent product
+        self.assertEqual(ProductSales.objects.get(product=self.p1).sales, 6)
+        self.assertEqual(ProductSales.objects.filter(product=self.p1).count(), 1)
+        self.assertFalse(ProductSales.objects.filter(product=v1).exists())
+        self.assertEqual(lfs.marketing.utils.get_topseller(2), [self.p1, self.p4])
+
+        # Canceled orders don't count
+        order.state = CANCELED
+        order.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            order_state_changed.send(sender=order, order=order, request=None, old_state=SUBMITTED)
+        self.assertEqual(ProductSales.objects.get(product=self.p1).sales, 1)
+        self.assertEqual(lfs.marketing.utils.get_topseller(2), [self.p4, self.p3])
+
+        # The reconciliation gets the same result
+        calculate_product_sales()
+        self.assertEqual(ProductSales.objects.get(product=self.p1).sales, 1)
+
     def test_topseller_1(self):
         """Tests general topsellers."""
         ts = lfs.marketing.utils.get_topseller(2)
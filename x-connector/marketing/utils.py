@@ -2,38 +2,93 @@ from datetime import timedelta
 
 from django.conf import settings
 from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
 from django.utils import timezone
 
-from lfs.catalog.models import Product
+from lfs.caching.utils import get_cache_group_id
+from lfs.caching.utils import invalidate_cache_group_id
+from lfs.catalog.settings import VARIANT
 from lfs.marketing.models import Topseller
 from lfs.marketing.models import ProductSales
 from lfs.order.models import Order
+from lfs.order.settings import CANCELED
 from lfs.order.settings import CLOSED
 from lfs.order.models import OrderItem
-from django.db import connection
+
+# Orders in these states don't count as sales.
+EXCLUDED_ORDER_STATES = (CANCELED,)
+
+
+def get_sales(order_items):
+    """Returns the sales of passed order items as dict (product id -> amount).
+    The sales of variants are counted for their parent products. The sales
+    are aggregated within the database.
+    """
+    order_items = (
+        order_items.filter(product__isnull=False)
+        .annotate(
+            sales_product_id=Case(
+                When(product__sub_type=VARIANT, then=F("product__parent_id")), default=F("product_id")
+            )
+        )
+        .filter(sales_product_id__isnull=False)
+        .values("sales_product_id")
+        .annotate(amount=Sum("product_amount"))
+        .order_by()
+    )
+    return dict((item["sales_product_id"], item["amount"] or 0) for item in order_items)
+
+
+def get_order_sales(order):
+    """Returns the sales of passed order, see ``get_sales``."""
+    return get_sales(OrderItem.objects.filter(order=order))
 
 
 def calculate_product_sales():
-    """Calculates and saves total product sales."""
-    ProductSales.objects.all().delete()
+    """Calculates and saves total product sales.
+
+    This reconciles the sales, which are updated incrementally with every
+    order (see ``update_product_sales``), with all orders.
+    """
+    sales = get_sales(OrderItem.objects.exclude(order__state__in=EXCLUDED_ORDER_STATES))
 
-    products = {}
-    for order_item in OrderItem.objects.filter(product__isnull=False):
-        if order_item.product.is_variant():
-            product = order_item.product.parent
-            if product is None:
-                continue
-        else:
-            product = order_item.product
+    with transaction.atomic():
+        ProductSales.objects.all().delete()
+        ProductSales.objects.bulk_create(
+            [ProductSales(product_id=product_id, sales=amount) for product_id, amount in sales.items()],
+            batch_size=500,
+        )
+        transaction.on_commit(lambda: invalidate_cache_group_id("topseller"))
 
-        if product.id not in products:
-            products[product.id] = [product, 0]
-        products[product.id][1] += order_item.product_amount
 
-    for product_id, data in products.items():
-        product, created = ProductSales.objects.get_or_create(product=data[0])
-        product.sales = data[1]
-        product.save()
+def update_product_sales(sales, factor=1):
+    """Adds passed sales (see ``get_sales``) multiplied by factor to the
+    saved product sales. A factor of -1 removes passed sales.
+
+    Missing rows are inserted first, ignoring rows which exist already or
+    have been inserted concurrently. Then all sales are added with one
+    UPDATE, hence concurrent orders don't overwrite each other's sales.
+    """
+    if not sales:
+        return
+
+    with transaction.atomic():
+        ProductSales.objects.bulk_create(
+            [ProductSales(product_id=product_id, sales=0) for product_id in sales.keys()], ignore_conflicts=True
+        )
+        ProductSales.objects.filter(product_id__in=list(sales.keys())).update(
+            sales=F("sales")
+            + Case(
+                *[
+                    When(product_id=product_id, then=Value(int(amount * factor)))
+                    for product_id, amount in sales.items()
+                ],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+        transaction.on_commit(lambda: invalidate_cache_group_id("topseller"))
 
 
 def get_orders(days=14):
@@ -46,43 +101,18 @@ def get_orders(days=14):
 
 def get_topseller(limit=5):
     """Returns products with the most sales. Limited by given limit."""
-    cache_key = "%s-topseller" % settings.CACHE_MIDDLEWARE_KEY_PREFIX
+    topseller_version = get_cache_group_id("topseller")
+    cache_key = "%s-%s-topseller-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, topseller_version, limit)
     topseller = cache.get(cache_key)
     if topseller is not None:
         return topseller
 
-    # TODO: Check Django 1.1's aggregation
-    cursor = connection.cursor()
-    cursor.execute(
-        """SELECT product_id, sum(product_amount) as sum
-                      FROM order_orderitem
-                      where product_id is not null
-                      GROUP BY product_id
-                      ORDER BY sum DESC limit %s"""
-        % (limit * 2)
+    pss = ProductSales.objects.filter(product__active=True).select_related("product").order_by("-sales", "product_id")
+    products = _add_explicit_topseller(
+        [ps.product for ps in pss[: limit * 2]],
+        Topseller.objects.select_related("product__parent"),
     )
 
-    products = []
-    for topseller in cursor.fetchall():
-        product = Product.objects.get(pk=topseller[0])
-        if product.is_active():
-            try:
-                products.append(product)
-            except Product.DoesNotExist:
-                pass
-
-    for explicit_ts in Topseller.objects.all():
-        if explicit_ts.product.is_active():
-            # Remove explicit_ts if it's already in the object list
-            if explicit_ts.product in products:
-                products.pop(products.index(explicit_ts.product))
-
-            # Then reinsert the explicit_ts on the given position
-            position = explicit_ts.position - 1
-            if position < 0:
-                position = 0
-            products.insert(position, explicit_ts.product)
-
     products = products[:limit]
     cache.set(cache_key, products)
     return products
@@ -92,33 +122,53 @@ def get_topseller_for_category(category, limit=5):
     """Returns products with the most sales withing given category. Limited by
     given limit.
     """
-    # TODO: Check Django 1.1's aggregation
-
-    cache_key = "%s-topseller-%s" % (settings.CACHE_MIDDLEWARE_KEY_PREFIX, category.id)
+    topseller_version = get_cache_group_id("topseller")
+    tree_version = get_cache_group_id("category-tree")
+    category_version = get_cache_group_id("category-%s" % category.id)
+    cache_key = "%s-%s-%s-%s-topseller-%s-%s" % (
+        settings.CACHE_MIDDLEWARE_KEY_PREFIX,
+        topseller_version,
+        tree_version,
+        category_version,
+        category.id,
+        limit,
+    )
     topseller = cache.get(cache_key)
     if topseller is not None:
         return topseller
 
-    # 1. Get all sub catgegories of passed category
-    categories = [category]
-    categories.extend(category.get_all_children())
-    category_ids = [c.id for c in categories]
+    # The products of the category and all sub categories, which share the
+    # path of the category.
+    pss = (
+        ProductSales.objects.filter(product__active=True, product__categories__path__startswith=category.path)
+        .select_related("product")
+        .order_by("-sales", "product_id")
+        .distinct()
+    )
+    explicit_ts = Topseller.objects.filter(product__categories__path__startswith=category.path).distinct()
+    objects = _add_explicit_topseller(
+        [ps.product for ps in pss[:limit]],
+        explicit_ts.select_related("product__parent"),
+    )
+
+    objects = objects[:limit]
+    cache.set(cache_key, objects)
+    return objects
 
-    # Get all the most saled products for this categories
-    pss = ProductSales.objects.filter(product__categories__in=category_ids).order_by("-sales")[:limit]
 
-    objects = [ps.product for ps in pss]
-    for explicit_ts in Topseller.objects.filter(product__categories__in=category_ids):
+def _add_explicit_topseller(products, topsellers):
+    """Inserts the products of passed explicit topsellers into passed products
+    on their given positions.
+    """
+    for explicit_ts in topsellers:
         if explicit_ts.product.is_active():
             # Remove explicit_ts if it's already in the object list
-            if explicit_ts.product in objects:
-                objects.pop(objects.index(explicit_ts.product))
+            if explicit_ts.product in products:
+                products.pop(products.index(explicit_ts.product))
 
             # Then reinsert the explicit_ts on the given position
             position = explicit_ts.position - 1
             if position < 0:
                 position = 0
-            objects.insert(position, explicit_ts.product)
-
-    cache.set(cache_key, objects)
-    return objects[:limit]
+            products.insert(position, explicit_ts.product)
+    return products
@@ -28,5 +28,20 @@ class NetPriceCalculator(PriceCalculator):
     def get_for_sale_price_gross(self, with_properties=True, amount=1):
         return self.get_for_sale_price_net(with_properties, amount) * self._calc_customer_tax_rate()
 
+    def get_prices(self, with_properties=True, amount=1):
+        customer_tax_rate = self._calc_customer_tax_rate()
+
+        prices = {}
+        for name, price in (
+            ("price", self.get_price(with_properties, amount)),
+            ("standard_price", self.get_standard_price(with_properties, amount)),
+            ("for_sale_price", self.get_for_sale_price(with_properties, amount)),
+        ):
+            prices[name] = price
+            prices[name + "_net"] = price
+            prices[name + "_gross"] = price * customer_tax_rate
+
+        return self._add_base_prices(prices)
+
     def price_includes_tax(self):
         return False
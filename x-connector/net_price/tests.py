@@ -11,6 +11,7 @@ from lfs.catalog.settings import STANDARD_PRODUCT
 from lfs.catalog.settings import LIST
 
 from lfs.catalog.models import Product
+from lfs.plugins import PriceCalculator
 from lfs.tax.models import Tax
 from lfs.tests.utils import RequestFactory
 
@@ -366,3 +367,25 @@ class NetPriceTestCase(TestCase):
         # Product 2 doesn't have a assigned tax rate, hence the tax should 0.0
         tax = self.p2.get_tax(self.request)
         self.assertEqual("%.2f" % tax, "0.00")
+
+    def test_get_prices_for(self):
+        """Tests that the prices of several products calculated at once are the
+        same as the prices calculated product by product.
+        """
+        self.v1.active_price = True
+        self.v1.save()
+
+        products = Product.objects.filter(pk__in=(self.p1.id, self.v1.id, self.p2.id))
+        prices = PriceCalculator.get_prices_for(products, self.request)
+        self.assertEqual(len(prices), 3)
+
+        for product in products:
+            self.assertEqual(prices[product.id]["price"], product.get_price(self.request))
+            self.assertEqual(prices[product.id]["price_net"], product.get_price_net(self.request))
+            self.assertEqual(prices[product.id]["price_gross"], product.get_price_gross(self.request))
+            self.assertEqual(prices[product.id]["standard_price_net"], product.get_standard_price_net(self.request))
+            self.assertEqual(prices[product.id]["for_sale_price_gross"], product.get_for_sale_price_gross(self.request))
+            self.assertEqual(prices[product.id]["base_price_gross"], product.get_base_price_gross(self.request))
+            self.assertEqual(
+                prices[product.id]["base_packing_price_net"], product.get_base_packing_price_net(self.request)
+            )
@@ -1,30 +1,52 @@
 import locale
 import datetime
 
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth.models import AnonymousUser
 from django.contrib.sessions.backends.file import SessionStore
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
 
 from lfs.catalog.models import Product, DeliveryTime
 from lfs.cart.models import Cart
 from lfs.cart.models import CartItem
 from lfs.cart import utils as cart_utils
 from lfs.core.models import Country
+from lfs.core.utils import import_symbol
 from lfs.addresses.models import Address
 from lfs.customer.models import Customer
 from lfs.discounts.settings import DISCOUNT_TYPE_ABSOLUTE
 from lfs.order.models import Order
 from lfs.order.models import OrderItem
 from lfs.order.utils import add_order
+from lfs.order.utils import get_next_order_number
+from lfs.order.utils import OutOfStockError
 from lfs.order.settings import SUBMITTED
 from lfs.payment.models import PaymentMethod
+from lfs.payment.settings import PM_ORDER_ACCEPTED
+from lfs.payment.utils import process_payment
+from lfs.plugins import PaymentMethodProcessor
 from lfs.shipping.models import ShippingMethod
 from lfs.tax.models import Tax
 from lfs.tests.utils import RequestFactory
 from lfs.discounts.models import Discount
 
 
+class AcceptingPaymentProcessor(PaymentMethodProcessor):
+    """Accepts every payment, before the order is added."""
+
+    processed = []
+
+    def process(self):
+        self.processed.append(self.cart)
+        return {"accepted": True, "next_url": "/"}
+
+    def get_create_order_time(self):
+        return PM_ORDER_ACCEPTED
+
+
 class OrderTestCase(TestCase):
     """ """
 
@@ -187,6 +209,14 @@ class OrderTestCase(TestCase):
         self.assertEqual(order.invoice_address.phone, "666-111111")
         self.assertEqual(order.invoice_address.company_name, "Doe Ltd.")
 
+        # The addresses are saved with the order
+        saved_order = Order.objects.get(pk=order.pk)
+        self.assertEqual(saved_order.invoice_address.pk, order.invoice_address.pk)
+        self.assertEqual(saved_order.invoice_address.firstname, "Jane")
+        self.assertEqual(saved_order.shipping_address.pk, order.shipping_address.pk)
+        self.assertEqual(saved_order.shipping_address.firstname, "John")
+        self.assertTrue(saved_order.number)
+
         # Items
         self.assertEqual(len(order.items.all()), 2)
 
@@ -213,6 +243,96 @@ class OrderTestCase(TestCase):
         # delivery time should of the selected shipping method should be saved with order
         self.assertTrue(order.delivery_time is not None)
 
+    def test_add_order_stock_amount(self):
+        """Tests the writing of the order and the stock amounts"""
+        self.p1.manage_stock_amount = True
+        self.p1.stock_amount = 5
+        self.p1.save()
+
+        order = add_order(self.request)
+
+        # The copied addresses belong to the order
+        self.assertEqual(order.addresses.count(), 2)
+        self.assertTrue(order.number)
+
+        # The stock amount is only decreased for managed products
+        self.p1.refresh_from_db()
+        self.p2.refresh_from_db()
+        self.assertEqual(self.p1.stock_amount, 3)
+        self.assertEqual(self.p2.stock_amount, 0)
+
+    def test_add_order_expired_reservation(self):
+        """Tests that an order isn't added if the reservation of the cart has
+        been expired and the products have been taken by another cart.
+        """
+        self.p1.manage_stock_amount = True
+        self.p1.stock_amount = 2
+        self.p1.save()
+
+        cart = cart_utils.get_cart(self.request)
+        CartItem.objects.filter(cart=cart).update(reserved_until=timezone.now() - datetime.timedelta(minutes=1))
+
+        # Another cart reserves the product after the reservation has been expired
+        other_cart = Cart.objects.create(session="other")
+        CartItem.objects.create(cart=other_cart, product=self.p1, amount=1)
+
+        with self.assertRaises(OutOfStockError):
+            add_order(self.request)
+
+        # Nothing has been written
+        self.assertEqual(Order.objects.count(), 0)
+        self.p1.refresh_from_db()
+        self.assertEqual(self.p1.stock_amount, 2)
+        self.assertTrue(cart_utils.get_cart(self.request) is not None)
+
+        # Another order has been finished in the meantime
+        other_cart.delete()
+        Product.objects.filter(pk=self.p1.pk).update(stock_amount=1)
+
+        with self.assertRaises(OutOfStockError):
+            add_order(self.request)
+
+        self.p1.refresh_from_db()
+        self.assertEqual(self.p1.stock_amount, 1)
+
+    def test_process_payment_out_of_stock(self):
+        """Tests that the payment isn't processed if a product isn't available
+        anymore, if the order is added after the payment has been accepted.
+        """
+        self.p1.manage_stock_amount = True
+        self.p1.stock_amount = 1
+        self.p1.save()
+        PaymentMethod.objects.update(module="lfs.order.tests.AcceptingPaymentProcessor")
+        AcceptingPaymentProcessor.processed = []
+
+        result = process_payment(self.request)
+        self.assertFalse(result["accepted"])
+        self.assertEqual(AcceptingPaymentProcessor.processed, [])
+        self.assertEqual(Order.objects.count(), 0)
+
+        self.p1.stock_amount = 2
+        self.p1.save()
+        cache.clear()
+
+        result = process_payment(self.request)
+        self.assertTrue(result["accepted"])
+        self.assertEqual(len(AcceptingPaymentProcessor.processed), 1)
+        self.assertEqual(Order.objects.count(), 1)
+        self.p1.refresh_from_db()
+        self.assertEqual(self.p1.stock_amount, 0)
+
+    def test_get_next_order_number(self):
+        """Tests that the order numbers are distinct, also if the order number
+        generator doesn't exist yet.
+        """
+        ong = import_symbol(settings.LFS_ORDER_NUMBER_GENERATOR)
+        ong.objects.filter(id="order_number").delete()
+
+        number_1 = get_next_order_number(self.request, Order())
+        number_2 = get_next_order_number(self.request, Order())
+        self.assertNotEqual(number_1, number_2)
+        self.assertEqual(ong.objects.filter(id="order_number").count(), 1)
+
     def test_pay_link(self):
         """Tests empty pay link."""
         locale.setlocale(locale.LC_ALL, "en_US.UTF-8")
@@ -3,11 +3,19 @@ from copy import deepcopy
 
 # django imports
 from django.conf import settings
+from django.db import IntegrityError
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
 
 # lfs imports
+import lfs.catalog.utils
 import lfs.discounts.utils
 import lfs.voucher.utils
+from lfs.addresses.models import BaseAddress
 from lfs.cart import utils as cart_utils
+from lfs.cart.models import CartItem
+from lfs.catalog.models import Product
 from lfs.core.signals import order_created
 from lfs.core.utils import import_symbol
 from lfs.customer import utils as customer_utils
@@ -19,11 +27,24 @@ from lfs.shipping import utils as shipping_utils
 from lfs.voucher.utils import get_voucher_data
 
 
+class OutOfStockError(Exception):
+    """Raised by ``add_order`` if a product of the cart is not available
+    anymore. The order is rolled back in this case.
+    """
+
+    def __init__(self, product):
+        super().__init__(product)
+        self.product = product
+
+
 def add_order(request):
     """Adds an order based on current cart for the current customer.
 
     It assumes that the customer is prepared with all needed information. This
     is within the responsibility of the checkout form.
+
+    The order number is drawn first, see ``get_next_order_number``. Then the
+    order is written within one transaction.
     """
     customer = customer_utils.get_customer(request)
     order = None
@@ -108,18 +129,17 @@ def add_order(request):
     if tax < 0:
         tax = 0
 
-    # Copy addresses
+    # Copy addresses. They are assigned to the order unsaved, hence the order
+    # number generator can access them, and saved below.
     invoice_address = deepcopy(invoice_address)
     invoice_address.id = None
     invoice_address.pk = None
-    invoice_address.save()
 
     shipping_address = deepcopy(shipping_address)
     shipping_address.id = None
     shipping_address.pk = None
-    shipping_address.save()
 
-    order = Order.objects.create(
+    order = Order(
         user=user,
         session=request.session.session_key,
         price=price,
@@ -138,29 +158,14 @@ def add_order(request):
         message=request.POST.get("message", ""),
     )
 
-    delivery_time = cart.get_delivery_time(request)
-    if delivery_time:
-        OrderDeliveryTime.objects.create(
-            order=order, min=delivery_time.min, max=delivery_time.max, unit=delivery_time.unit
-        )
-
-    invoice_address.order = order
-    invoice_address.save()
-
-    shipping_address.order = order
-    shipping_address.save()
-
     requested_delivery_date = request.POST.get("requested_delivery_date", None)
     if requested_delivery_date is not None:
         order.requested_delivery_date = requested_delivery_date
-        order.save()
 
     if use_voucher:
-        voucher_data["voucher"].mark_as_used()
         order.voucher_number = voucher_data["voucher_number"]
         order.voucher_price = voucher_data["voucher_value"]
         order.voucher_tax = voucher_data["voucher_tax"]
-        order.save()
 
     # Copy bank account if one exists
     if customer.selected_bank_account:
@@ -170,72 +175,187 @@ def add_order(request):
         order.bank_name = bank_account.bank_name
         order.depositor = bank_account.depositor
 
-    order.save()
-
-    # Copy cart items
-    for cart_item in cart.get_items():
-        if cart_item.amount == 0:
-            continue
-        order_item = OrderItem.objects.create(
-            order=order,
-            price_net=cart_item.get_price_net(request),
-            price_gross=cart_item.get_price_gross(request),
-            tax=cart_item.get_tax(request),
-            product=cart_item.product,
-            product_sku=cart_item.product.sku,
-            product_name=cart_item.product.get_name(),
-            product_amount=cart_item.amount,
-            product_price_net=cart_item.product.get_price_net(request),
-            product_price_gross=cart_item.get_product_price_gross(request),
-            product_tax=cart_item.product.get_tax(request),
-        )
-
-        cart_item.product.decrease_stock_amount(cart_item.amount)
+    # The order isn't saved yet, see lfs.plugins.OrderNumberGenerator.init
+    order.created = timezone.now()
+    order.number = get_next_order_number(request, order)
+
+    with transaction.atomic():
+        invoice_address.save()
+        shipping_address.save()
+
+        # The generic foreign keys take the ids of the addresses on assignment
+        order.invoice_address = invoice_address
+        order.shipping_address = shipping_address
+
+        if use_voucher:
+            voucher_data["voucher"].mark_as_used()
+
+        order.save()
+
+        BaseAddress.objects.filter(pk__in=[invoice_address.pk, shipping_address.pk]).update(order=order)
+        invoice_address.order = order
+        shipping_address.order = order
+
+        delivery_time = cart.get_delivery_time(request)
+        if delivery_time:
+            OrderDeliveryTime.objects.create(
+                order=order, min=delivery_time.min, max=delivery_time.max, unit=delivery_time.unit
+            )
+
+        # Lock the products with managed stock amounts until the order has been
+        # created, hence concurrent orders decrease their stock amounts one by one.
+        cart_items = [cart_item for cart_item in cart.get_totals(request).items if cart_item.amount != 0]
+        product_ids = [cart_item.product_id for cart_item in cart_items if cart_item.product.manage_stock_amount]
+        if product_ids:
+            _check_stock_amounts(cart, cart_items, product_ids)
+
+        # Copy cart items
+        order_items = []
+        for cart_item in cart_items:
+            order_items.append(
+                OrderItem(
+                    order=order,
+                    price_net=cart_item.get_price_net(request),
+                    price_gross=cart_item.get_price_gross(request),
+                    tax=cart_item.get_tax(request),
+                    product=cart_item.product,
+                    product_sku=cart_item.product.sku,
+                    product_name=cart_item.product.get_name(),
+                    product_amount=cart_item.amount,
+                    product_price_net=cart_item.product.get_price_net(request),
+                    product_price_gross=cart_item.get_product_price_gross(request),
+                    product_tax=cart_item.product.get_tax(request),
+                )
+            )
+
+        for discount in discounts:
+            order_items.append(
+                OrderItem(
+                    order=order,
+                    price_net=-discount["price_net"],
+                    price_gross=-discount["price_gross"],
+                    tax=-discount["tax"],
+                    product_sku=discount["sku"],
+                    product_name=discount["name"],
+                    product_amount=1,
+                    product_price_net=-discount["price_net"],
+                    product_price_gross=-discount["price_gross"],
+                    product_tax=-discount["tax"],
+                )
+            )
+
+        order_items = OrderItem.objects.bulk_create(order_items)
+        if order_items and order_items[0].pk is None:
+            # The database doesn't return the ids of bulk inserted rows.
+            order_items = list(OrderItem.objects.filter(order=order).order_by("id"))
 
         # Copy properties to order
-        if cart_item.product.is_configurable_product():
-            for cpv in cart_item.properties.all():
-                OrderItemPropertyValue.objects.create(order_item=order_item, property=cpv.property, value=cpv.value)
+        property_values = []
+        for cart_item, order_item in zip(cart_items, order_items):
+            if cart_item.product.is_configurable_product():
+                for cpv in cart_item.properties.all():
+                    property_values.append(
+                        OrderItemPropertyValue(order_item=order_item, property_id=cpv.property_id, value=cpv.value)
+                    )
+        OrderItemPropertyValue.objects.bulk_create(property_values)
 
-    for discount in discounts:
-        OrderItem.objects.create(
-            order=order,
-            price_net=-discount["price_net"],
-            price_gross=-discount["price_gross"],
-            tax=-discount["tax"],
-            product_sku=discount["sku"],
-            product_name=discount["name"],
-            product_amount=1,
-            product_price_net=-discount["price_net"],
-            product_price_gross=-discount["price_gross"],
-            product_tax=-discount["tax"],
-        )
-
-    # Re-initialize selected addresses to be equal to default addresses for next order
-    customer.sync_default_to_selected_addresses()
-    customer.save()
-
-    # Send signal before cart is deleted.
-    order_created.send(order, cart=cart, request=request)
-
-    cart.delete()
+        lfs.catalog.utils.decrease_stock_amounts([(cart_item.product, cart_item.amount) for cart_item in cart_items])
+
+        # Re-initialize selected addresses to be equal to default addresses for next order
+        customer.sync_default_to_selected_addresses()
+        customer.save()
+
+        # Send signal before cart is deleted.
+        order_created.send(order, cart=cart, request=request)
+
+        cart.delete()
 
     # Note: Save order for later use in thank you page. The order will be
     # removed from the session if the thank you page has been called.
     request.session["order"] = order
 
+    return order
+
+
+def get_next_order_number(request, order):
+    """Returns the next order number for the passed order, see
+    ``LFS_ORDER_NUMBER_GENERATOR``. The order isn't saved yet, see
+    ``lfs.plugins.OrderNumberGenerator.init``.
+
+    The number is drawn within its own short transaction, hence the generator
+    is only locked while the number is drawn and not until the order has been
+    written. If the order can't be written afterwards, the number is skipped.
+    """
     ong = import_symbol(settings.LFS_ORDER_NUMBER_GENERATOR)
-    try:
-        order_numbers = ong.objects.get(id="order_number")
-    except ong.DoesNotExist:
-        order_numbers = ong.objects.create(id="order_number")
 
-    try:
-        order_numbers.init(request, order)
-    except AttributeError:
-        pass
+    with transaction.atomic():
+        try:
+            order_numbers = ong.objects.select_for_update().get(id="order_number")
+        except ong.DoesNotExist:
+            # Concurrent orders might create the generator at the same time.
+            try:
+                with transaction.atomic():
+                    ong.objects.create(id="order_number")
+            except IntegrityError:
+                pass
+            order_numbers = ong.objects.select_for_update().get(id="order_number")
+
+        try:
+            order_numbers.init(request, order)
+        except AttributeError:
+            pass
+
+        return order_numbers.get_next()
+
+
+def lock_stock_amounts(request):
+    """Locks the products with managed stock amounts of the current cart until
+    the end of the current transaction. Raises ``OutOfStockError`` if one of
+    them is not available anymore.
+
+    This is used to keep the stock amounts of an order from the start of the
+    payment until the order has been added, see
+    ``lfs.payment.utils.process_payment``.
+    """
+    cart = cart_utils.get_cart(request)
+    if cart is None:
+        return
 
-    order.number = order_numbers.get_next()
-    order.save()
+    cart_items = [cart_item for cart_item in cart.get_totals(request).items if cart_item.amount != 0]
+    product_ids = [cart_item.product_id for cart_item in cart_items if cart_item.product.manage_stock_amount]
+    if product_ids:
+        _check_stock_amounts(cart, cart_items, product_ids)
 
-    return order
+
+def _check_stock_amounts(cart, cart_items, product_ids):
+    """Locks the passed products and raises ``OutOfStockError`` if the amount
+    of the cart exceeds the stock amount, which is not reserved by other carts.
+
+    The stock amounts are re-read while the rows are locked, as other orders
+    might have been finished since the cart has been checked.
+    """
+    stock_amounts = {}
+    products = Product.objects.select_for_update().filter(pk__in=product_ids).order_by("pk")
+    for pk, stock_amount, order_time_id in products.values_list("pk", "stock_amount", "order_time_id"):
+        if order_time_id is None:
+            stock_amounts[pk] = stock_amount
+
+    reserved_amounts = dict(
+        CartItem.objects.filter(product__in=list(stock_amounts), reserved_until__gt=timezone.now())
+        .exclude(cart=cart)
+        .values("product")
+        .annotate(amount=Sum("amount"))
+        .values_list("product", "amount")
+    )
+
+    amounts = {}
+    for cart_item in cart_items:
+        if cart_item.product_id in stock_amounts:
+            amounts[cart_item.product_id] = amounts.get(cart_item.product_id, 0) + cart_item.amount
+
+    for cart_item in cart_items:
+        amount = amounts.get(cart_item.product_id)
+        if amount is not None:
+            available_amount = stock_amounts[cart_item.product_id] - reserved_amounts.get(cart_item.product_id, 0)
+            if amount > available_amount:
+                raise OutOfStockError(cart_item.product)
@@ -1,4 +1,8 @@
+from django.db import transaction
+from django.forms.forms import NON_FIELD_ERRORS
+from django.forms.utils import ErrorList
 from django.urls import reverse
+from django.utils.translation import gettext as _
 
 from lfs.core.signals import order_submitted
 from lfs.criteria import utils as criteria_utils
@@ -91,8 +95,17 @@ def process_payment(request):
     """
     from lfs.core.utils import import_symbol
     from lfs.order.utils import add_order
+    from lfs.order.utils import OutOfStockError
+    from lfs.order.utils import lock_stock_amounts
     from lfs.cart.utils import get_cart
 
+    # The stock amounts are checked once more, as the reservations of the
+    # cart might have been expired in the meantime.
+    cart = get_cart(request)
+    out_of_stock_items = cart.get_out_of_stock_items() if cart is not None else []
+    if out_of_stock_items:
+        return _get_out_of_stock_result(out_of_stock_items[0].product)
+
     payment_method = get_selected_payment_method(request)
 
     if payment_method.module:
@@ -101,7 +114,10 @@ def process_payment(request):
 
         create_order_time = payment_instance.get_create_order_time()
         if create_order_time == PM_ORDER_IMMEDIATELY:
-            order = add_order(request)
+            try:
+                order = add_order(request)
+            except OutOfStockError as e:
+                return _get_out_of_stock_result(e.product)
             if order is None:
                 return {"accepted": True, "next_url": reverse("lfs_shop_view")}
             payment_instance.order = order
@@ -110,21 +126,34 @@ def process_payment(request):
                 order.state = result.get("order_state")
                 order.save()
             order_submitted.send(sender=order, request=request)
-        else:
-            cart = get_cart(request)
-            payment_instance.cart = cart
-            result = payment_instance.process()
-
-        if result["accepted"]:
-            if create_order_time == PM_ORDER_ACCEPTED:
-                order = add_order(request)
+        elif create_order_time == PM_ORDER_ACCEPTED:
+            # The products are locked before the payment is processed, hence
+            # the order of an accepted payment can't run out of stock.
+            with transaction.atomic():
+                try:
+                    lock_stock_amounts(request)
+                except OutOfStockError as e:
+                    return _get_out_of_stock_result(e.product)
+                payment_instance.cart = cart
+                result = payment_instance.process()
+                if result["accepted"]:
+                    order = add_order(request)
+
+            if result["accepted"]:
                 if result.get("order_state"):
                     order.state = result.get("order_state")
                     order.save()
                 order_submitted.send(sender=order, request=request)
+        else:
+            payment_instance.cart = cart
+            result = payment_instance.process()
+
         return result
     else:
-        order = add_order(request)
+        try:
+            order = add_order(request)
+        except OutOfStockError as e:
+            return _get_out_of_stock_result(e.product)
         order_submitted.send(sender=order, request=request)
         return {
             "accepted": True,
@@ -132,6 +161,20 @@ def process_payment(request):
         }
 
 
+def _get_out_of_stock_result(product):
+    """
+    Returns the result of ``process_payment`` if the passed product is not
+    available anymore.
+    """
+    return {
+        "accepted": False,
+        "message": ErrorList(
+            [_("Sorry, but '%(product)s' is not available anymore.") % {"product": product.get_name()}]
+        ),
+        "message_location": NON_FIELD_ERRORS,
+    }
+
+
 # DEPRECATED 0.8
 def get_pay_link(request, payment_method, order):
     """
@@ -33,6 +33,10 @@ class OrderNumberGenerator(models.Model):
         """
         Initializes the order number generator. This method is called
         automatically from LFS.
+
+        The number is drawn before the order is saved, hence the passed order
+        has no id yet. Its creation date, prices, methods and (unsaved)
+        addresses are set.
         """
         self.request = request
         self.order = order
@@ -166,11 +170,147 @@ class PriceCalculator(object):
 
     request
         The current request.
+
+    All further keyword arguments are taken as values which have already been
+    loaded for the product, see ``get_prices_for``.
     """
 
     def __init__(self, request, product, **kwargs):
         self.request = request
         self.product = product
+        self._prefetched = kwargs
+
+    @classmethod
+    def get_prices_for(cls, products, request, with_properties=True, amount=1):
+        """
+        Returns the prices of all passed products as dictionary with the ids of
+        the products as keys and the result of ``get_prices`` as values.
+
+        Parents, default variants, tax rates and customer tax rates of the
+        products are loaded at once before the prices are calculated. Every
+        product is calculated by its own price calculator, see
+        ``Product.get_price_calculator``.
+
+        **Parameters:**
+
+        products
+            The products for which the prices are calculated.
+
+        request
+            The current request.
+
+        with_properties
+            If a product is a configurable product and with_properties is
+            True the prices of the default properties are added to the price.
+
+        amount
+            The amount of products for which the price is calculated.
+        """
+        products = list(products)
+        prefetched = cls.prefetch(products, request)
+
+        prices = {}
+        for product in products:
+            price_calculator = product.get_price_calculator(request, **prefetched[product.id])
+            prices[product.id] = price_calculator.get_prices(with_properties, amount)
+
+        return prices
+
+    @classmethod
+    def prefetch(cls, products, request):
+        """
+        Loads the parents, default variants, tax rates and customer tax rates
+        of the passed products with as few queries as possible. Returns a
+        dictionary with the ids of the products as keys and the keyword
+        arguments for their price calculators as values.
+        """
+        from django.db.models import Q
+        from lfs.catalog.models import Product
+        from lfs.customer_tax.utils import get_customer_taxes
+        from lfs.tax.models import Tax
+
+        products = list(products)
+
+        # Parents of variants
+        parent_ids = set(p.parent_id for p in products if p.parent_id and not Product.parent.is_cached(p))
+        if parent_ids:
+            parents = Product.objects.in_bulk(parent_ids)
+            for product in products:
+                if product.parent_id in parents and not Product.parent.is_cached(product):
+                    product.parent = parents[product.parent_id]
+
+        # Default variants, which are either selected or the first active variant
+        products_with_variants = dict((p.id, p) for p in products if p.is_product_with_variants())
+        default_variant_ids = set(p.default_variant_id for p in products_with_variants.values() if p.default_variant_id)
+        default_variants = {}
+        if products_with_variants:
+            variants = list(
+                Product.objects.filter(
+                    Q(pk__in=default_variant_ids)
+                    | Q(
+                        parent__in=[p.id for p in products_with_variants.values() if not p.default_variant_id],
+                        active=True,
+                    )
+                )
+            )
+            variants_by_id = dict((v.id, v) for v in variants)
+            for product in products_with_variants.values():
+                if product.default_variant_id:
+                    default_variants[product.id] = variants_by_id.get(product.default_variant_id)
+            for variant in variants:
+                if variant.active and variant.parent_id in products_with_variants:
+                    default_variants.setdefault(variant.parent_id, variant)
+
+            for product_id, variant in default_variants.items():
+                if variant is not None and variant.parent_id == product_id:
+                    variant.parent = products_with_variants[product_id]
+
+        # Tax rates, variants use the tax rate of their parents
+        def get_tax_object(product):
+            if product.is_variant() and product.parent_id:
+                return product.parent
+            return product
+
+        tax_ids = set(get_tax_object(p).tax_id for p in products if get_tax_object(p).tax_id)
+        tax_rates = dict(Tax.objects.filter(pk__in=tax_ids).values_list("id", "rate")) if tax_ids else {}
+
+        # Without any customer tax the customer tax rate is the product tax rate
+        customer_taxes = get_customer_taxes()
+
+        prefetched = {}
+        for product in products:
+            kwargs = {"product_tax_rate": tax_rates.get(get_tax_object(product).tax_id, 0.0)}
+            if not customer_taxes:
+                kwargs["customer_tax_rate"] = kwargs["product_tax_rate"]
+            if product.id in products_with_variants:
+                kwargs["default_variant"] = default_variants.get(product.id)
+            prefetched[product.id] = kwargs
+
+        return prefetched
+
+    def get_prices(self, with_properties=True, amount=1):
+        """
+        Returns all prices of the product as dictionary with the names of the
+        price methods without the leading ``get_`` as keys, e.g. ``price``,
+        ``price_net`` or ``base_packing_price_gross``.
+
+        Derived classes may overwrite this method to calculate the prices more
+        efficiently.
+
+        **Parameters:**
+
+        with_properties
+            If the instance is a configurable product and with_properties is
+            True the prices of the default properties are added to the price.
+
+        amount
+            The amount of products for which the price is calculated.
+        """
+        prices = {}
+        for name in ("price", "standard_price", "for_sale_price", "base_price", "base_packing_price"):
+            for suffix in ("", "_net", "_gross"):
+                prices[name + suffix] = getattr(self, "get_" + name + suffix)(with_properties, amount)
+        return prices
 
     def get_effective_price(self, amount=1):
         """Effective price is used for sorting and filtering.
@@ -200,12 +340,16 @@ class PriceCalculator(object):
         """
         object = self.product
 
-        if object.is_product_with_variants() and object.get_default_variant():
-            object = object.get_default_variant()
+        if object.is_product_with_variants() and self._get_default_variant():
+            object = self._get_default_variant()
 
         if object.get_for_sale():
             if object.is_variant() and not object.active_for_sale_price:
-                price = object.parent.get_for_sale_price(self.request, with_properties)
+                if object.parent_id == self.product.id:
+                    # The default variant of the product; no need for another price calculator.
+                    price = self.get_for_sale_price(with_properties)
+                else:
+                    price = object.parent.get_for_sale_price(self.request, with_properties)
             else:
                 price = object.get_for_sale_price(self.request, with_properties)
         else:
@@ -264,8 +408,8 @@ class PriceCalculator(object):
         """
         object = self.product
 
-        if object.is_product_with_variants() and object.get_default_variant():
-            object = object.get_default_variant()
+        if object.is_product_with_variants() and self._get_default_variant():
+            object = self._get_default_variant()
 
         if object.is_variant() and not object.active_price:
             object = object.parent
@@ -325,8 +469,8 @@ class PriceCalculator(object):
         """
         object = self.product
 
-        if object.is_product_with_variants() and object.get_default_variant():
-            object = object.get_default_variant()
+        if object.is_product_with_variants() and self._get_default_variant():
+            object = self._get_default_variant()
 
         if object.is_variant() and not object.active_for_sale_price:
             object = object.parent
@@ -470,6 +614,9 @@ class PriceCalculator(object):
         """
         Returns the tax rate for the current customer and product.
         """
+        if "customer_tax_rate" in self._prefetched:
+            return self._prefetched["customer_tax_rate"]
+
         from lfs.customer_tax.utils import get_customer_tax_rate
 
         return get_customer_tax_rate(self.request, self.product)
@@ -494,6 +641,9 @@ class PriceCalculator(object):
         Returns the stored tax rate of the product. If the product is a variant
         it returns the parent's tax rate.
         """
+        if "product_tax_rate" in self._prefetched:
+            return self._prefetched["product_tax_rate"]
+
         from django.core.cache import cache
 
         if self.product.is_variant():
@@ -523,6 +673,30 @@ class PriceCalculator(object):
         """
         raise NotImplementedError
 
+    def _get_default_variant(self):
+        """
+        Returns the default variant of the product. Takes a prefetched default
+        variant into account, see ``get_prices_for``.
+        """
+        if "default_variant" in self._prefetched:
+            return self._prefetched["default_variant"]
+        return self.product.get_default_variant()
+
+    def _add_base_prices(self, prices):
+        """
+        Adds the base prices and base packing prices to the passed dictionary,
+        which must contain ``price``, ``price_net`` and ``price_gross``.
+        """
+        base_price_amount = self.product.get_base_price_amount()
+        packing_amount = self._calc_packing_amount()
+        for name in ("price", "price_net", "price_gross"):
+            try:
+                prices["base_" + name] = prices[name] / base_price_amount
+            except (TypeError, ZeroDivisionError):
+                prices["base_" + name] = 0.0
+            prices["base_packing_" + name] = prices[name] * packing_amount
+        return prices
+
     def _calc_product_tax_rate(self):
         """
         Returns the default tax rate for the product.
@@ -10,6 +10,7 @@ from portlets.models import Portlet
 
 # lfs imports
 import lfs.core.utils
+from lfs.caching.utils import get_cache_group_id
 
 
 class CategoriesPortlet(Portlet):
@@ -33,22 +34,20 @@ class CategoriesPortlet(Portlet):
         category = context.get("category")
         object = category or product
 
-        if object is None:
-            object_id = None
-        else:
-            object_id = object.id
+        # The rendered tree depends only on the current categories, hence it
+        # is shared by all objects with the same current categories.
+        current_categories = lfs.core.utils.get_current_categories(request, object)
 
-        cache_key = "%s-categories-portlet-%s-%s" % (
+        cache_key = "%s-%s-categories-portlet-%s-%s" % (
             settings.CACHE_MIDDLEWARE_KEY_PREFIX,
-            object.__class__.__name__,
-            object_id,
+            get_cache_group_id("category-tree"),
+            self.id,
+            "-".join([str(c.id) for c in current_categories]),
         )
         result = cache.get(cache_key)
         if result is not None:
             return result
 
-        current_categories = lfs.core.utils.get_current_categories(request, object)
-
         ct = lfs.core.utils.CategoryTree(current_categories, self.start_level, self.expand_level)
         category_tree = ct.get_category_tree()
 
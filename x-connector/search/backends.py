@@ -0,0 +1,199 @@
+import re
+
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils.html import strip_tags
+
+from lfs.catalog.models import Product
+from lfs.catalog.models import Property
+from lfs.catalog.models import PropertyOption
+from lfs.catalog.settings import PROPERTY_SELECT_FIELD
+from lfs.search.models import SearchTerm
+
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+# The weights of the indexed fields of a product. The weights of all fields a
+# term occurs in are summed up and used to rank the search results.
+NAME_WEIGHT = 10
+SKU_WEIGHT = 8
+MANUFACTURER_WEIGHT = 5
+SHORT_DESCRIPTION_WEIGHT = 2
+PROPERTY_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+
+
+def get_terms(text):
+    """
+    Returns the lower case terms of passed text.
+    """
+    return [term[:50] for term in TERM_RE.findall(strip_tags(text or "").lower())]
+
+
+class SearchBackend(object):
+    """
+    Base class for all search backends. The backend which is used is defined
+    by the LFS_SEARCH_BACKEND setting, see lfs.search.utils.get_search_backend.
+    """
+
+    def search(self, q, prefix=True):
+        """
+        Returns all active products which match all terms of passed query,
+        ordered by relevance. If prefix is True every term is matched as
+        prefix, e.g. "shirt" finds "shirts", otherwise only exact terms match.
+        """
+        raise NotImplementedError
+
+    def update_product(self, product):
+        """
+        Updates the index for passed product.
+        """
+        raise NotImplementedError
+
+    def update_products(self, products):
+        """
+        Updates the index for passed products.
+        """
+        for product in products:
+            self.update_product(product)
+
+    def rebuild(self):
+        """
+        Rebuilds the complete index and returns the amount of indexed
+        products.
+        """
+        raise NotImplementedError
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """
+    Search backend, which stores an inverted index (term -> product, weight)
+    within the database, see lfs.search.models.SearchTerm. It runs on every
+    database which is supported by Django. Terms are looked up via an index,
+    i.e. exact or prefix matches only.
+    """
+
+    def search(self, q, prefix=True):
+        terms = get_terms(q)
+        if not terms:
+            return Product.objects.none()
+
+        products = Product.objects.filter(active=True)
+        matches = Q()
+        for term in terms:
+            if prefix:
+                lookup = {"term__startswith": term}
+            else:
+                lookup = {"term": term}
+
+            products = products.filter(pk__in=SearchTerm.objects.filter(**lookup).values("product_id"))
+            matches |= Q(**dict(("search_terms__%s" % key, value) for key, value in lookup.items()))
+
+        return products.annotate(search_rank=Sum("search_terms__weight", filter=matches)).order_by(
+            "-search_rank", "name"
+        )
+
+    def get_product_terms(self, product, select_property_ids=None, options=None):
+        """
+        Returns a dictionary with all terms of passed product and their
+        weights. The values of select fields are resolved to the names of the
+        options. If passed, select_property_ids (ids of all select field
+        properties) and options (option id -> name) are used instead of
+        loading them.
+
+        Variants are indexed with their own fields only, hence the terms of
+        their parent don't match them twice.
+        """
+        if product.is_variant():
+            fields = [
+                (product.name, NAME_WEIGHT),
+                ("%s %s" % (product.sku, product.sku_manufacturer), SKU_WEIGHT),
+                (product.short_description, SHORT_DESCRIPTION_WEIGHT),
+                (product.description, DESCRIPTION_WEIGHT),
+            ]
+            manufacturer = product.manufacturer
+        else:
+            fields = [
+                (product.get_name(), NAME_WEIGHT),
+                ("%s %s" % (product.get_sku(), product.sku_manufacturer), SKU_WEIGHT),
+                (product.get_short_description(), SHORT_DESCRIPTION_WEIGHT),
+                (product.get_description(), DESCRIPTION_WEIGHT),
+            ]
+            manufacturer = product.get_manufacturer()
+
+        if manufacturer:
+            fields.append((manufacturer.name, MANUFACTURER_WEIGHT))
+
+        if select_property_ids is None:
+            select_property_ids = set(Property.objects.filter(type=PROPERTY_SELECT_FIELD).values_list("id", flat=True))
+
+        values = set()
+        option_ids = set()
+        for ppv in product.property_values.all():
+            if ppv.property_id not in select_property_ids:
+                values.add(ppv.value)
+            elif ppv.value.isdigit():
+                option_ids.add(int(ppv.value))
+
+        if options is None:
+            options = dict(PropertyOption.objects.filter(pk__in=option_ids).values_list("id", "name"))
+        values.update([options[option_id] for option_id in option_ids if option_id in options])
+        fields.append((" ".join(values), PROPERTY_WEIGHT))
+
+        result = {}
+        for text, weight in fields:
+            for term in set(get_terms(text)):
+                result[term] = result.get(term, 0) + weight
+        return result
+
+    def update_product(self, product):
+        search_terms = [
+            SearchTerm(term=term, product=product, weight=weight)
+            for term, weight in self.get_product_terms(product).items()
+        ]
+        with transaction.atomic():
+            SearchTerm.objects.filter(product=product).delete()
+            SearchTerm.objects.bulk_create(search_terms)
+
+    def update_products(self, products, batch_size=500):
+        select_property_ids = set(Property.objects.filter(type=PROPERTY_SELECT_FIELD).values_list("id", flat=True))
+        product_ids = [product.pk for product in products]
+        products = (
+            Product.objects.filter(pk__in=product_ids)
+            .select_related("parent", "manufacturer")
+            .prefetch_related("property_values")
+        )
+
+        option_ids = set()
+        for product in products:
+            for ppv in product.property_values.all():
+                if ppv.property_id in select_property_ids and ppv.value.isdigit():
+                    option_ids.add(int(ppv.value))
+        options = dict(PropertyOption.objects.filter(pk__in=option_ids).values_list("id", "name"))
+
+        search_terms = []
+        for product in products:
+            for term, weight in self.get_product_terms(product, select_property_ids, options).items():
+                search_terms.append(SearchTerm(term=term, product=product, weight=weight))
+
+        with transaction.atomic():
+            SearchTerm.objects.filter(product__in=product_ids).delete()
+            SearchTerm.objects.bulk_create(search_terms, batch_size=batch_size)
+
+    def rebuild(self, batch_size=500):
+        select_property_ids = set(Property.objects.filter(type=PROPERTY_SELECT_FIELD).values_list("id", flat=True))
+        options = dict(PropertyOption.objects.values_list("id", "name"))
+        products = Product.objects.select_related("parent", "manufacturer").prefetch_related("property_values")
+
+        amount = 0
+        with transaction.atomic():
+            SearchTerm.objects.all().delete()
+            search_terms = []
+            for product in products.iterator(chunk_size=batch_size):
+                for term, weight in self.get_product_terms(product, select_property_ids, options).items():
+                    search_terms.append(SearchTerm(term=term, product=product, weight=weight))
+                amount += 1
+                if len(search_terms) >= batch_size:
+                    SearchTerm.objects.bulk_create(search_terms)
+                    search_terms = []
+            SearchTerm.objects.bulk_create(search_terms)
+        return amount
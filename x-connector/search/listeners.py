@@ -0,0 +1,104 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from lfs.caching.utils import invalidate_cache_group_id
+from lfs.catalog.models import Product
+from lfs.catalog.models import ProductPropertyValue
+from lfs.core.signals import products_changed
+from lfs.manufacturer.models import Manufacturer
+from lfs.search.utils import get_search_backend
+
+BATCH_SIZE = 500
+
+# Ids of products whose property values have been changed within the current
+# transaction, see product_property_value_changed_listener.
+_pending = threading.local()
+
+
+def update_search_index(products):
+    """
+    Updates the search index for passed products together with the variants
+    of the passed products with variants.
+    """
+    products = list(products)
+    parent_ids = [product.pk for product in products if product.is_product_with_variants()]
+    if parent_ids:
+        product_ids = set(product.pk for product in products)
+        products.extend(
+            variant for variant in Product.objects.filter(parent__in=parent_ids) if variant.pk not in product_ids
+        )
+
+    get_search_backend().update_products(products)
+    invalidate_cache_group_id("search")
+
+
+def update_search_index_in_batches(products):
+    """
+    Updates the search index for passed products in batches of BATCH_SIZE
+    products, in order to keep the memory usage low for large querysets.
+    """
+    backend = get_search_backend()
+    batch = []
+    for product in products.iterator(chunk_size=BATCH_SIZE):
+        batch.append(product)
+        if len(batch) >= BATCH_SIZE:
+            backend.update_products(batch)
+            batch = []
+    if batch:
+        backend.update_products(batch)
+    invalidate_cache_group_id("search")
+
+
+def update_pending_search_index():
+    """
+    Updates the search index for all products whose property values have been
+    changed since the last call.
+    """
+    product_ids = getattr(_pending, "product_ids", None)
+    if product_ids:
+        _pending.product_ids = set()
+        update_search_index_in_batches(Product.objects.filter(pk__in=product_ids))
+
+
+@receiver(post_save, sender=Product)
+def product_saved_listener(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_search_index([instance])
+
+
+@receiver(products_changed)
+def products_changed_listener(sender, products, **kwargs):
+    update_search_index(products)
+
+
+@receiver(post_save, sender=ProductPropertyValue)
+@receiver(post_delete, sender=ProductPropertyValue)
+def product_property_value_changed_listener(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # The product is indexed once after the transaction has been committed
+    # instead of once per changed value. Outside of a transaction this happens
+    # immediately.
+    if not hasattr(_pending, "product_ids"):
+        _pending.product_ids = set()
+    _pending.product_ids.add(instance.product_id)
+    transaction.on_commit(update_pending_search_index)
+
+
+@receiver(pre_save, sender=Manufacturer)
+def manufacturer_pre_saved_listener(sender, instance, raw=False, **kwargs):
+    # Only the name of a manufacturer is indexed
+    if raw or instance.pk is None:
+        instance._search_name_changed = False
+    else:
+        instance._search_name_changed = not Manufacturer.objects.filter(pk=instance.pk, name=instance.name).exists()
+
+
+@receiver(post_save, sender=Manufacturer)
+def manufacturer_saved_listener(sender, instance, raw=False, **kwargs):
+    if raw or not getattr(instance, "_search_name_changed", True):
+        return
+    update_search_index_in_batches(Product.objects.filter(manufacturer=instance))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the search index of all products"
+
+    def handle(self, *args, **options):
+        """ """
+        from lfs.caching.utils import invalidate_cache_group_id
+        from lfs.search.utils import get_search_backend
+
+        amount = get_search_backend().rebuild()
+        invalidate_cache_group_id("search")
+        print("Indexed %s products" % amount)
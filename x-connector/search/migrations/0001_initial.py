@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0005_category_path"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchTerm",
+            fields=[
+                ("id", models.AutoField(verbose_name="ID", serialize=False, auto_created=True, primary_key=True)),
+                ("term", models.CharField(max_length=50, verbose_name="Term", db_index=True)),
+                ("weight", models.PositiveSmallIntegerField(default=1, verbose_name="Weight")),
+                (
+                    "product",
+                    models.ForeignKey(
+                        related_name="search_terms",
+                        verbose_name="Product",
+                        to="catalog.Product",
+                        on_delete=models.CASCADE,
+                    ),
+                ),
+            ],
+            options={},
+        ),
+        migrations.AlterUniqueTogether(
+            name="searchterm",
+            unique_together=set([("term", "product")]),
+        ),
+    ]
@@ -1 +1,36 @@
-# just for manage.py test
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from lfs.catalog.models import Product
+
+
+class SearchTerm(models.Model):
+    """
+    An entry of the search index of the DatabaseSearchBackend, see
+    lfs.search.backends.
+
+    **Attributes:**
+
+    term
+        A lower case word of the product's name, SKU, manufacturer,
+        descriptions or property values.
+
+    product
+        The product the term belongs to.
+
+    weight
+        The weight of the term for the product, which is used to rank the
+        search results. Terms of the name weigh more than terms of the
+        description, for instance.
+    """
+
+    term = models.CharField(_("Term"), max_length=50, db_index=True)
+    product = models.ForeignKey(Product, models.CASCADE, verbose_name=_("Product"), related_name="search_terms")
+    weight = models.PositiveSmallIntegerField(_("Weight"), default=1)
+
+    class Meta:
+        app_label = "search"
+        unique_together = ("term", "product")
+
+    def __str__(self):
+        return "%s: %s (%s)" % (self.product_id, self.term, self.weight)
@@ -0,0 +1,3 @@
+from django.conf import settings
+
+SEARCH_BACKEND = getattr(settings, "LFS_SEARCH_BACKEND", "lfs.search.backends.DatabaseSearchBackend")
@@ -4,6 +4,15 @@ from django.test import TestCase
 
 # test imports
 from lfs.catalog.models import Product
+from lfs.catalog.models import ProductPropertyValue
+from lfs.catalog.models import Property
+from lfs.catalog.settings import PRODUCT_WITH_VARIANTS
+from lfs.catalog.settings import PROPERTY_TEXT_FIELD
+from lfs.catalog.settings import PROPERTY_VALUE_TYPE_DEFAULT
+from lfs.catalog.settings import VARIANT
+from lfs.core.signals import products_changed
+from lfs.manufacturer.models import Manufacturer
+from lfs.search.utils import get_search_backend
 
 
 class SearchTestCase(TestCase):
@@ -36,3 +45,96 @@ class SearchTestCase(TestCase):
         # Must not be found
         response = self.client.get(url, {"q": "Product"})
         self.failIf(response.content.find(b"Product 3") != -1)
+
+    def test_search_backend(self):
+        """ """
+        backend = get_search_backend()
+
+        # Only active products are found
+        self.assertEqual(set(backend.search("product")), set([self.p1, self.p2]))
+        self.assertEqual(list(backend.search("product 2")), [self.p2])
+        self.assertEqual(list(backend.search("prod", prefix=False)), [])
+        self.assertEqual(set(backend.search("prod")), set([self.p1, self.p2]))
+        self.assertEqual(list(backend.search("prod 2")), [self.p2])
+
+        # Every term is matched as prefix, e.g. singular finds plural
+        shirts = Product.objects.create(name="Shirts", slug="shirts", sku="SH-4711", active=True)
+        self.assertEqual(list(backend.search("shirt")), [shirts])
+        self.assertEqual(list(backend.search("shirt", prefix=False)), [])
+        self.assertEqual(list(backend.search("sh 471")), [shirts])
+
+        # Products are ranked by the fields which match
+        self.p2.description = "Product"
+        self.p2.save()
+        self.assertEqual(list(backend.search("product")), [self.p2, self.p1])
+
+        # Changes of the manufacturer are indexed
+        manufacturer = Manufacturer.objects.create(name="Hurz", slug="hurz")
+        self.p1.manufacturer = manufacturer
+        self.p1.save()
+        self.assertEqual(list(backend.search("hurz")), [self.p1])
+
+        manufacturer.name = "Schnurz"
+        manufacturer.save()
+        self.assertEqual(list(backend.search("hurz")), [])
+        self.assertEqual(list(backend.search("schnurz")), [self.p1])
+
+        # The index can be rebuilt
+        self.assertEqual(backend.rebuild(), Product.objects.count())
+        self.assertEqual(list(backend.search("schnurz")), [self.p1])
+
+    def test_search_variants(self):
+        """Variants are indexed with their own fields only."""
+        backend = get_search_backend()
+
+        self.p1.sub_type = PRODUCT_WITH_VARIANTS
+        self.p1.save()
+        variant = Product.objects.create(name="Blue", slug="p1-blue", sub_type=VARIANT, parent=self.p1, active=True)
+        self.assertEqual(list(backend.search("product 1")), [self.p1])
+        self.assertEqual(list(backend.search("blue")), [variant])
+
+        # Bulk changes are indexed
+        Product.objects.filter(pk=variant.pk).update(name="Green")
+        products_changed.send(Product, products=[self.p1])
+        self.assertEqual(list(backend.search("blue")), [])
+        self.assertEqual(list(backend.search("green")), [variant])
+
+    def test_search_property_values(self):
+        """Changed property values are indexed once the transaction is committed."""
+        backend = get_search_backend()
+        prop = Property.objects.create(name="Material", type=PROPERTY_TEXT_FIELD)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            ProductPropertyValue.objects.create(
+                product=self.p1, property=prop, value="Cotton", type=PROPERTY_VALUE_TYPE_DEFAULT
+            )
+            ProductPropertyValue.objects.create(
+                product=self.p1, property=prop, value="Wool", type=PROPERTY_VALUE_TYPE_DEFAULT
+            )
+            self.assertEqual(list(backend.search("cotton")), [])
+
+        self.assertEqual(len(callbacks), 2)
+        self.assertEqual(list(backend.search("cotton wool")), [self.p1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductPropertyValue.objects.filter(value="Wool").delete()
+        self.assertEqual(list(backend.search("wool")), [])
+
+    def test_search_pages(self):
+        """Sorted results are paged with the cursors of the next and previous page."""
+        for i in range(12):
+            Product.objects.create(name="Hurz %s" % i, slug="hurz-%s" % i, price=i, active=True)
+
+        session = self.client.session
+        session["sorting"] = "-effective_price"
+        session.save()
+
+        url = reverse("lfs_search")
+        response = self.client.get(url, {"q": "Hurz"})
+        self.assertEqual(response.context["total"], 12)
+        self.assertEqual([p.name for p in response.context["products"]][:2], ["Hurz 11", "Hurz 10"])
+
+        next_url = response.context["pagination"]["next_url"]
+        response = self.client.get(next_url)
+        self.assertEqual([p.name for p in response.context["products"]], ["Hurz 1", "Hurz 0"])
+        self.assertFalse("next_url" in response.context["pagination"])
@@ -0,0 +1,34 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+import lfs.core.utils
+from lfs.caching.utils import get_cache_group_id
+from lfs.search.settings import SEARCH_BACKEND
+
+
+def get_search_backend():
+    """
+    Returns the search backend, which is defined by the LFS_SEARCH_BACKEND
+    setting.
+    """
+    return lfs.core.utils.import_symbol(SEARCH_BACKEND)()
+
+
+def get_search_count(q, products):
+    """
+    Returns the (cached) amount of passed search results for query q. The
+    amounts are invalidated via the "search" cache group as soon as the index
+    has been changed.
+    """
+    cache_key = "%s-%s-search-count-%s" % (
+        settings.CACHE_MIDDLEWARE_KEY_PREFIX,
+        get_cache_group_id("search"),
+        hashlib.md5(q.encode("utf-8")).hexdigest(),
+    )
+    count = cache.get(cache_key)
+    if count is None:
+        count = products.count()
+        cache.set(cache_key, count)
+    return count
@@ -1,17 +1,14 @@
 import json
 
-from django.core.paginator import EmptyPage
-from django.core.paginator import InvalidPage
-from django.core.paginator import Paginator
 from django.urls import reverse
-from django.db.models import Q
 from django.http import HttpResponse
 from django.shortcuts import render
 from django.template.loader import render_to_string
-from django.utils.translation import gettext
+from django.utils.translation import ngettext
 
-from lfs.catalog.models import Product
-from lfs.core.utils import lfs_pagination
+import lfs.catalog.utils
+from lfs.search.utils import get_search_backend
+from lfs.search.utils import get_search_count
 
 
 def livesearch(request, template_name="lfs/search/livesearch_results.html"):
@@ -26,11 +23,7 @@ def livesearch(request, template_name="lfs/search/livesearch_results.html"):
         )
     else:
         # Products
-        query = Q(active=True) & (
-            Q(name__icontains=q) | Q(manufacturer__name__icontains=q) | Q(sku_manufacturer__icontains=q)
-        )
-
-        temp = Product.objects.filter(query)
+        temp = get_search_backend().search(q)
         total = temp.count()
         products = temp[0:5]
 
@@ -61,29 +54,20 @@ def search(request, template_name="lfs/search/search_results.html"):
     start = request.GET.get("start", 1)
 
     # Products
-    query = Q(active=True) & (
-        Q(name__icontains=q) | Q(manufacturer__name__icontains=q) | Q(sku_manufacturer__icontains=q)
-    )
+    products = get_search_backend().search(q)
 
-    products = Product.objects.filter(query)
-    amount_of_products = products.count()
-
-    # Sorting
+    # Sorting. Products which are sorted by a field are paged with the cursors
+    # of the previous and next page, see lfs.catalog.utils.get_product_page.
     sorting = request.session.get("sorting")
-    if sorting:
-        products = products.order_by(sorting)
-
-    # prepare paginator
-    paginator = Paginator(products, 10)
 
-    try:
-        current_page = paginator.page(start)
-    except (EmptyPage, InvalidPage):
-        current_page = paginator.page(paginator.num_pages)
+    amount_of_products = get_search_count(q, products)
+    current_page = lfs.catalog.utils.get_product_page(
+        products, sorting, 10, amount_of_products, start, request.GET.get("after"), request.GET.get("before")
+    )
 
     # Calculate urls
-    pagination_data = lfs_pagination(request, current_page, url=reverse("lfs_search"))
-    pagination_data["total_text"] = gettext("%(count)d product", "%(count)d products", amount_of_products) % {
+    pagination_data = lfs.catalog.utils.get_product_pagination(request, current_page, url=reverse("lfs_search"))
+    pagination_data["total_text"] = ngettext("%(count)d product", "%(count)d products", amount_of_products) % {
         "count": amount_of_products
     }
 
@@ -94,6 +78,6 @@ def search(request, template_name="lfs/search/search_results.html"):
             "products": current_page,
             "pagination": pagination_data,
             "q": q,
-            "total": products.count(),
+            "total": amount_of_products,
         },
     )
@@ -16,6 +16,7 @@ from lfs.customer import utils as customer_utils
 from lfs.shipping.models import ShippingMethod
 from lfs.shipping.models import ShippingMethodPrice
 from lfs.shipping import utils
+from lfs.criteria.facts import get_facts
 from lfs.criteria.models import CartPriceCriterion
 from lfs.criteria.models import CountryCriterion
 from lfs.criteria.models import Criterion
@@ -248,6 +249,40 @@ class ShippingMethodTestCase(TestCase):
         result = c.is_valid()
         self.assertEqual(result, True)
 
+    def test_criteria_results(self):
+        """Tests that the results of criteria are kept per request."""
+        user = User.objects.get(username="admin")
+        request = DummyRequest(user=user)
+
+        c = WeightCriterion.objects.create(content=self.sm1, value=10.0, operator=GREATER_THAN)
+        self.assertEqual(self.sm1.is_valid(request, self.p1), False)
+
+        # The facts are shared and the result is taken from them
+        facts = get_facts(request)
+        self.assertTrue(get_facts(request) is facts)
+        self.assertEqual(facts.results[(ShippingMethod, self.sm1.pk, Product, self.p1.pk)], False)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.sm1.is_valid(request, self.p1), False)
+
+        # Changing the criterion invalidates the facts
+        c.value = 5.0
+        c.save()
+        self.assertFalse(get_facts(request) is facts)
+        self.assertEqual(self.sm1.is_valid(request, self.p1), True)
+
+    def test_visitor_facts(self):
+        """Tests that changes of a visitor invalidate only the facts of this visitor."""
+        user = User.objects.get(username="admin")
+        request = DummyRequest(user=user)
+        other_request = DummyRequest()
+
+        facts = get_facts(request)
+        other_facts = get_facts(other_request)
+
+        Cart.objects.create(user=user)
+        self.assertFalse(get_facts(request) is facts)
+        self.assertTrue(get_facts(other_request) is other_facts)
+
     def test_shipping_methods_criterion_for_empty_cart(self):
         """Test with a given product."""
         # Prepare request
@@ -0,0 +1,12 @@
+# django imports
+from django.core.management.base import BaseCommand
+
+from lfs.utils.middleware import get_profile_token
+
+
+class Command(BaseCommand):
+    help = "Prints a token to profile requests with lfs.utils.middleware.ProfileMiddleware"
+
+    def handle(self, *args, **options):
+        """ """
+        print(get_profile_token())
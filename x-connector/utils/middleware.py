@@ -1,63 +1,198 @@
 # python imports
-import hotshot
-import hotshot.stats
-import sys
-import tempfile
-from cStringIO import StringIO
+import cProfile
+import io
+import logging
+import os
+import pstats
+import time
+import uuid
+from contextlib import ExitStack
 
 # django imports
 from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.db import connections
 from django.http import HttpResponseServerError
 
+# lfs imports
+from lfs.core.settings import PROFILE_DIR
+from lfs.core.settings import PROFILE_MAX_AGE
 
-class ProfileMiddleware(object):
+logger = logging.getLogger(__name__)
+
+PROFILE_PARAMETER = "prof"
+PROFILE_HEADER = "HTTP_X_LFS_PROFILE"
+PROFILE_SALT = "lfs.utils.middleware.ProfileMiddleware"
+
+
+def get_profile_token():
     """
-    Displays hotshot profiling for any view.
-    http://yoursite.com/yourview/?prof
-
-    Add the "prof" key to query string by appending ?prof (or &prof=)
-    and you'll see the profiling results in your browser.
-    It's set up to only be available in django's debug mode,
-    but you really shouldn't add this middleware to any production configuration.
-    * Only tested on Linux
+    Returns a signed token, which enables the profiling of requests, see
+    ProfileMiddleware. It is valid for LFS_PROFILE_MAX_AGE seconds.
     """
+    return signing.TimestampSigner(salt=PROFILE_SALT).sign("profile")
 
-    def __init__(self, get_response):
-        self.get_response = get_response
 
-    def __call__(self, request):
-        if "prof" in request.GET:
-            self.tmpfile = tempfile.NamedTemporaryFile()
-            self.prof = hotshot.Profile(self.tmpfile.name)
+def get_cache_key_group(key):
+    """
+    Returns the group of passed cache key, which is the key without the
+    CACHE_MIDDLEWARE_KEY_PREFIX, versions and ids, e.g. "category-products"
+    for "<prefix>-3-category-products-12".
+    """
+    prefix = "%s-" % settings.CACHE_MIDDLEWARE_KEY_PREFIX
+    if key.startswith(prefix):
+        key = key[len(prefix) :]
+
+    parts = []
+    for part in key.split("-"):
+        if part.isdigit():
+            if parts:
+                break
+        else:
+            parts.append(part)
+    return "-".join(parts) or key
 
-        response = self.get_response(request)
 
-        if "prof" in request.GET:
-            self.prof.close()
+class RequestStatistics(object):
+    """
+    Collects the SQL queries and cache gets of a request.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.cache = {}
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_time += time.perf_counter() - start
+
+    def count_cache_get(self, key, hit):
+        stats = self.cache.setdefault(get_cache_key_group(key), {"gets": 0, "hits": 0, "misses": 0})
+        stats["gets"] += 1
+        stats["hits" if hit else "misses"] += 1
+
+    def wrap_cache(self, backend):
+        """
+        Counts the gets of passed cache backend until the returned callback is
+        called. Cache backends are per thread, hence only the gets of the
+        current request are counted.
+        """
+        get = backend.get
+        get_many = backend.get_many
+
+        def counting_get(key, default=None, version=None):
+            value = get(key, default, version)
+            self.count_cache_get(key, value is not default)
+            return value
+
+        def counting_get_many(keys, version=None):
+            values = get_many(keys, version)
+            for key in keys:
+                self.count_cache_get(key, key in values)
+            return values
+
+        backend.get = counting_get
+        backend.get_many = counting_get_many
+
+        def restore():
+            del backend.get
+            del backend.get_many
+
+        return restore
+
+    def get_cache_totals(self):
+        totals = {"gets": 0, "hits": 0, "misses": 0}
+        for stats in self.cache.values():
+            for name in totals:
+                totals[name] += stats[name]
+        return totals
 
-            out = StringIO()
-            old_stdout = sys.stdout
-            sys.stdout = out
 
-            stats = hotshot.stats.load(self.tmpfile.name)
-            # stats.strip_dirs()
-            stats.sort_stats(
-                "cumulative",
-            )
-            # stats.sort_stats('time', )
-            stats.print_stats()
+class ProfileMiddleware(object):
+    """
+    Profiles a request with cProfile and counts its SQL queries and cache
+    gets, the latter per cache key group (see get_cache_key_group).
 
-            sys.stdout = old_stdout
-            stats_str = out.getvalue()
+    Profiling is opt-in per request. Pass a token (see get_profile_token) as
+    ``prof`` parameter or ``X-LFS-Profile`` header. In debug mode any value
+    is accepted, e.g. ``?prof``.
 
-            if response and response.content and stats_str:
-                response.content = "<pre>" + stats_str + "</pre>"
+    The statistics are returned within the ``X-LFS-Profile`` response header
+    and logged together with the most expensive functions. If LFS_PROFILE_DIR
+    is set, the profile is dumped as ``.prof`` file into it, which can be
+    inspected with pstats or snakeviz.
+    """
 
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.is_enabled(request):
+            return self.get_response(request)
+
+        statistics = RequestStatistics()
+        profile = cProfile.Profile()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(statistics.execute_wrapper))
+            for alias in settings.CACHES:
+                stack.callback(statistics.wrap_cache(caches[alias]))
+
+            start = time.perf_counter()
+            profile.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profile.disable()
+            duration = time.perf_counter() - start
+
+        self.report(request, response, profile, statistics, duration)
         return response
 
-    def process_view(self, request, callback, callback_args, callback_kwargs):
-        if "prof" in request.GET:
-            return self.prof.runcall(callback, request, *callback_args, **callback_kwargs)
+    def is_enabled(self, request):
+        token = request.GET.get(PROFILE_PARAMETER, request.META.get(PROFILE_HEADER))
+        if token is None:
+            return False
+        if settings.DEBUG:
+            return True
+        try:
+            signing.TimestampSigner(salt=PROFILE_SALT).unsign(token, max_age=PROFILE_MAX_AGE)
+        except signing.BadSignature:
+            return False
+        return True
+
+    def report(self, request, response, profile, statistics, duration):
+        cache_totals = statistics.get_cache_totals()
+        summary = "time=%.3f sql=%s sql_time=%.3f cache_gets=%s cache_hits=%s cache_misses=%s" % (
+            duration,
+            statistics.queries,
+            statistics.query_time,
+            cache_totals["gets"],
+            cache_totals["hits"],
+            cache_totals["misses"],
+        )
+        response["X-LFS-Profile"] = summary
+
+        cache_lines = [
+            "%s: gets=%s hits=%s misses=%s" % (group, stats["gets"], stats["hits"], stats["misses"])
+            for group, stats in sorted(statistics.cache.items(), key=lambda item: -item[1]["gets"])
+        ]
+
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(30)
+
+        logger.info("Profile of %s: %s\n%s\n%s", request.path, summary, "\n".join(cache_lines), out.getvalue())
+
+        if PROFILE_DIR:
+            filename = os.path.join(PROFILE_DIR, "%s-%s.prof" % (time.strftime("%Y%m%d-%H%M%S"), uuid.uuid4().hex[:8]))
+            profile.dump_stats(filename)
+            response["X-LFS-Profile-File"] = os.path.basename(filename)
 
 
 class AJAXSimpleExceptionResponse(object):
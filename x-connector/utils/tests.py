@@ -0,0 +1,98 @@
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import TestCase
+from django.test import override_settings
+
+from lfs.catalog.models import Product
+from lfs.core.settings import PROFILE_MAX_AGE
+from lfs.tests.utils import RequestFactory
+from lfs.utils.middleware import PROFILE_SALT
+from lfs.utils.middleware import ProfileMiddleware
+from lfs.utils.middleware import get_cache_key_group
+from lfs.utils.middleware import get_profile_token
+
+
+class ExpiredSigner(signing.TimestampSigner):
+    """Signs tokens which are expired already."""
+
+    def timestamp(self):
+        return signing.b62_encode(int(time.time()) - PROFILE_MAX_AGE - 60)
+
+
+def get_response(request):
+    Product.objects.count()
+    caches["default"].get("%s-product-hurz" % settings.CACHE_MIDDLEWARE_KEY_PREFIX)
+    return HttpResponse("ok")
+
+
+def get_error(request):
+    raise ValueError("Hurz")
+
+
+@override_settings(DEBUG=False)
+class ProfileMiddlewareTestCase(TestCase):
+    """Tests lfs.utils.middleware.ProfileMiddleware"""
+
+    def setUp(self):
+        self.rf = RequestFactory()
+        self.middleware = ProfileMiddleware(get_response)
+
+    def test_is_enabled(self):
+        # Without token
+        self.assertFalse(self.middleware.is_enabled(self.rf.get("/")))
+
+        # Valid token as parameter or header
+        self.assertTrue(self.middleware.is_enabled(self.rf.get("/", {"prof": get_profile_token()})))
+        self.assertTrue(self.middleware.is_enabled(self.rf.get("/", HTTP_X_LFS_PROFILE=get_profile_token())))
+
+        # Expired token
+        token = ExpiredSigner(salt=PROFILE_SALT).sign("profile")
+        self.assertFalse(self.middleware.is_enabled(self.rf.get("/", {"prof": token})))
+
+        # Forged tokens
+        self.assertFalse(self.middleware.is_enabled(self.rf.get("/", {"prof": "profile:hurz:hurz"})))
+        token = signing.TimestampSigner(salt="hurz").sign("profile")
+        self.assertFalse(self.middleware.is_enabled(self.rf.get("/", {"prof": token})))
+
+    def test_is_enabled_debug(self):
+        with override_settings(DEBUG=True):
+            self.assertTrue(self.middleware.is_enabled(self.rf.get("/", {"prof": ""})))
+            self.assertFalse(self.middleware.is_enabled(self.rf.get("/")))
+
+    def test_get_cache_key_group(self):
+        prefix = settings.CACHE_MIDDLEWARE_KEY_PREFIX
+        self.assertEqual(get_cache_key_group("%s-product-42" % prefix), "product")
+        self.assertEqual(get_cache_key_group("%s-cart-items-7" % prefix), "cart-items")
+        self.assertEqual(get_cache_key_group("%s-3-category-products-12" % prefix), "category-products")
+        self.assertEqual(
+            get_cache_key_group("%s-category-products-12-3-1-d41d8cd98f00b204e9800998ecf8427e" % prefix),
+            "category-products",
+        )
+        self.assertEqual(get_cache_key_group("all_active_shipping_methods"), "all_active_shipping_methods")
+
+    def test_profile_header(self):
+        response = self.middleware(self.rf.get("/", {"prof": get_profile_token()}))
+        self.assertEqual(response.content, b"ok")
+        self.assertTrue("sql=1 " in response["X-LFS-Profile"])
+        self.assertTrue("cache_gets=1 cache_hits=0 cache_misses=1" in response["X-LFS-Profile"])
+
+        # Requests without token are not profiled
+        response = self.middleware(self.rf.get("/"))
+        self.assertFalse(response.has_header("X-LFS-Profile"))
+
+    def test_cache_restored(self):
+        self.middleware(self.rf.get("/", {"prof": get_profile_token()}))
+        for alias in settings.CACHES:
+            self.assertFalse("get" in caches[alias].__dict__)
+            self.assertFalse("get_many" in caches[alias].__dict__)
+
+        # Also if the request fails
+        middleware = ProfileMiddleware(get_error)
+        self.assertRaises(ValueError, middleware, self.rf.get("/", {"prof": get_profile_token()}))
+        for alias in settings.CACHES:
+            self.assertFalse("get" in caches[alias].__dict__)
+            self.assertFalse("get_many" in caches[alias].__dict__)